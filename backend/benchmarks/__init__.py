@@ -0,0 +1,4 @@
+"""
+规则引擎性能基准
+运行方式见 benchmarks/run_benchmarks.py
+"""
@@ -0,0 +1,334 @@
+"""
+合成病历与规则语料生成器
+用于压测、基准与批量模式测试，不含任何真实患者数据
+
+病历逐条生成、逐行写入 JSONL（{"medical_id": ..., "medical_record": {...}}，与
+rule_dev_tool.py batch 的输入格式一致），内存占用与总条数无关，可生成数 GB 的语料；
+规则按已注册函数组合生成，每行一个可直接导入的 rule_config。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.corpus records --count 100000 --output records.jsonl
+    python -m benchmarks.corpus records --count 1000 --size huge --empty-ratio 0.2 --output huge.jsonl
+    python -m benchmarks.corpus rules --count 50 --output rules.jsonl
+"""
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+import argparse
+import json
+import math
+import random
+import sys
+import time
+
+
+# 病历结构：section -> [(字段名, 中位长度（字符）)]；中位长度决定该字段的典型篇幅
+SECTIONS: Dict[str, List[Tuple[str, int]]] = {
+    "入院记录": [
+        ("主诉", 15), ("现病史", 300), ("既往史", 80), ("个人史", 60), ("婚育史", 30),
+        ("家族史", 30), ("体格检查", 250), ("专科检查", 120), ("辅助检查", 150), ("初步诊断", 30),
+    ],
+    "首次病程记录": [
+        ("病例特点", 250), ("诊断依据", 150), ("鉴别诊断", 150), ("诊疗计划", 120),
+    ],
+    "出院记录": [
+        ("入院情况", 150), ("诊疗经过", 400), ("出院情况", 100), ("出院诊断", 30), ("出院医嘱", 80),
+    ],
+}
+
+# 数值型字段：section -> [(字段名, 最小值, 最大值, 小数位)]，模拟结构化录入的生命体征
+NUMERIC_FIELDS: Dict[str, List[Tuple[str, float, float, int]]] = {
+    "入院记录": [("体温", 36.0, 39.5, 1), ("脉搏", 55, 120, 0), ("呼吸", 12, 28, 0)],
+}
+
+PHRASES = [
+    "患者因头痛3天入院", "无明显诱因出现胸闷、气短", "伴恶心，无呕吐", "体温36.8℃，脉搏82次/分",
+    "血压128/76mmHg", "神志清楚，精神可", "双肺呼吸音清，未闻及干湿性啰音", "心律齐，各瓣膜听诊区未闻及杂音",
+    "腹软，无压痛及反跳痛", "既往体健，否认高血压、糖尿病病史", "否认药物过敏史", "血常规：白细胞6.2×10^9/L",
+    "头颅CT未见明显异常", "予以营养神经、改善循环治疗", "症状较前明显好转", "嘱出院后规律服药，定期复查",
+    "咳嗽、咳痰1周，加重2天", "活动后心悸，休息后可缓解", "饮食睡眠可，大小便正常", "近期体重无明显变化",
+    "生于原籍，无疫区居住史", "吸烟20年，每日约10支", "适龄结婚，育有1子1女", "父母健在，否认家族遗传病史",
+    "双下肢无水肿", "四肢肌力5级，病理征未引出", "心电图：窦性心律，大致正常", "胸部CT示右下肺斑片影",
+    "予以抗感染、化痰对症治疗", "监测血压、血糖变化", "完善相关检查，明确诊断", "注意休息，避免劳累",
+]
+
+PARAGRAPH_CHARS = 150  # 长字段的平均段落长度（字符）
+LENGTH_DISTRIBUTIONS = ("lognormal", "uniform", "fixed")
+RECORD_SIZES = {"small": 0.2, "typical": 1.0, "large": 4.0, "huge": 40.0}  # 各规模相对中位长度的倍数
+
+# 生成规则时可用的规则类型及其依赖的已注册函数
+RULE_KINDS: Dict[str, Tuple[str, ...]] = {
+    "not_empty": ("extract_field_content",),
+    "length_range": ("extract_field_content", "count_characters", "is_number_in_range"),
+    "chinese_length_range": ("extract_field_content", "count_chinese_characters", "is_number_in_range"),
+    "line_count": ("extract_field_content", "text_statistics", "is_number_in_range"),
+}
+
+
+class RecordGenerator:
+    """
+    合成病历生成器
+
+    设计思路：
+    1. 每个字段的目标长度按分布抽样：lognormal（以字段中位长度为中位数，右偏长尾，贴近真实病历）、
+       uniform（0 ~ 2 倍中位长度）或 fixed（恒为中位长度），再乘以规模倍数
+    2. 文本由医学短语随机拼接到不少于目标长度，含中文、数字、标点与单位，长字段分段换行，
+       计数类函数的分支都能覆盖
+    3. 每个字段以 empty_ratio 的概率为空字符串（另有一半概率整段缺失该字段），覆盖跳过 / 不通过分支
+    4. 单一 random.Random 实例 + 固定种子，同参数生成的语料逐字节一致
+    """
+
+    def __init__(
+        self,
+        size: str = "typical",
+        empty_ratio: float = 0.05,
+        length_distribution: str = "lognormal",
+        sigma: float = 0.6,
+        max_length: int = 200_000,
+        seed: int = 0,
+    ):
+        """
+        Args:
+            size: 病历规模（small / typical / large / huge），按倍数缩放各字段中位长度
+            empty_ratio: 字段为空或缺失的概率
+            length_distribution: 字段长度分布（lognormal / uniform / fixed）
+            sigma: lognormal 分布的形状参数，越大长尾越明显
+            max_length: 单个字段的最大长度
+            seed: 随机种子
+        """
+        if size not in RECORD_SIZES:
+            raise ValueError(f"未知的病历规模: {size}，可选: {', '.join(RECORD_SIZES)}")
+        if length_distribution not in LENGTH_DISTRIBUTIONS:
+            raise ValueError(f"未知的长度分布: {length_distribution}，可选: {', '.join(LENGTH_DISTRIBUTIONS)}")
+        if not 0 <= empty_ratio <= 1:
+            raise ValueError("empty_ratio 必须在 0 到 1 之间")
+        self.scale = RECORD_SIZES[size]
+        self.empty_ratio = empty_ratio
+        self.length_distribution = length_distribution
+        self.sigma = sigma
+        self.max_length = max_length
+        self._rng = random.Random(seed)
+
+    def _target_length(self, median: int) -> int:
+        median = median * self.scale
+        if self.length_distribution == "lognormal":
+            length = self._rng.lognormvariate(math.log(median), self.sigma)
+        elif self.length_distribution == "uniform":
+            length = self._rng.uniform(0, 2 * median)
+        else:
+            length = median
+        return max(1, min(self.max_length, int(length)))
+
+    def _text(self, length: int) -> str:
+        # 按短语追加到不少于目标长度为止（不在短语中间截断）；短语平均约 12 个字符，成批抽取。
+        # 长字段约每 PARAGRAPH_CHARS 个字符分段换行，模拟多段落的病程文本
+        rng = self._rng
+        paragraphs = length >= PARAGRAPH_CHARS
+        parts: List[str] = []
+        total = 0
+        while total < length:
+            for phrase in rng.choices(PHRASES, k=length // 12 + 1):
+                if parts:
+                    parts.append("。\n" if paragraphs and rng.random() < 12 / PARAGRAPH_CHARS else "，")
+                parts.append(phrase)
+                total += len(phrase) + 1
+                if total >= length:
+                    break
+        parts.append("。")
+        return "".join(parts)
+
+    def generate(self) -> Dict[str, Any]:
+        """生成一份病历"""
+        rng = self._rng
+        record: Dict[str, Any] = {}
+        for section, fields in SECTIONS.items():
+            content: Dict[str, Any] = {}
+            for field, median in fields:
+                if rng.random() < self.empty_ratio:
+                    if rng.random() < 0.5:
+                        content[field] = ""
+                    continue
+                content[field] = self._text(self._target_length(median))
+            for field, low, high, digits in NUMERIC_FIELDS.get(section, []):
+                value = round(rng.uniform(low, high), digits)
+                content[field] = value if digits else int(value)
+            record[section] = content
+        return record
+
+    def iter_records(self, count: int, id_prefix: str = "SYN") -> Iterator[Dict[str, Any]]:
+        """逐条生成 {"medical_id", "medical_record"}"""
+        for i in range(count):
+            yield {"medical_id": f"{id_prefix}{i:09d}", "medical_record": self.generate()}
+
+
+def generate_rule(index: int, rng: random.Random, kinds: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    生成一条使用已注册函数的规则配置
+
+    字段从 SECTIONS 中抽取，长度范围围绕该字段的中位长度设置，生成的规则在合成病历上通过、不通过、跳过均会出现
+
+    Args:
+        index: 规则序号（用于 rule_id）
+        rng: 随机数生成器
+        kinds: 可选的规则类型（默认全部可用类型，见 RULE_KINDS）
+    """
+    kind = rng.choice(kinds or list(RULE_KINDS))
+    section = rng.choice(list(SECTIONS))
+    field, median = rng.choice(SECTIONS[section])
+    rule_id = f"gen_{index:05d}"
+    extract = {
+        "id": 1,
+        "function": "extract_field_content",
+        "params": {"field_name": [section, field]},
+        "outputs": {"text": "result", "is_empty": "is_empty"},
+    }
+    skipped = {"skipped_1": {"source": 1, "output": "is_empty", "expect": True}}
+
+    if kind == "not_empty":
+        nodes = [extract]
+        result_rule = {"pass": {"source": 1, "output": "is_empty", "expect": False}}
+        templates = {"pass": f"{field}已填写", "fail": f"{field}未填写"}
+        name = f"{section}-{field}不能为空"
+    else:
+        if kind == "line_count":
+            measure_node = {
+                "id": 2, "function": "text_statistics",
+                "params": {"text": {"source": 1, "output": "text"}},
+                "outputs": {"count": "line_count"},
+            }
+            # extract_field_content 的输出末尾带换行，行数 = 段落数 + 1
+            low, high, unit = 2, max(2, median // PARAGRAPH_CHARS) + 2, "行"
+        else:
+            function = "count_characters" if kind == "length_range" else "count_chinese_characters"
+            measure_node = {
+                "id": 2, "function": function,
+                "params": {"text": {"source": 1, "output": "text"}},
+                "outputs": {"count": "result"},
+            }
+            low, high, unit = max(1, median // 3), median * 2, "字"
+        nodes = [
+            extract,
+            measure_node,
+            {
+                "id": 3, "function": "is_number_in_range",
+                "params": {"value": {"source": 2, "output": "count"}, "min_value": low, "max_value": high},
+                "outputs": {"ok": "result"},
+            },
+        ]
+        result_rule = {"pass": {"source": 3, "output": "ok", "expect": True}, **skipped}
+        templates = {
+            "pass": f"{field}共{{{{node_2.count}}}}{unit}，符合要求",
+            "fail": f"{field}共{{{{node_2.count}}}}{unit}，应在{low}-{high}{unit}之间",
+            "skipped_1": f"{field}为空，不检查",
+        }
+        name = f"{section}-{field}{'行数' if kind == 'line_count' else '长度'}{low}-{high}{unit}"
+
+    return {
+        "rule_id": rule_id,
+        "rule_name": name,
+        "module": section,
+        "description": f"合成规则（{kind}）",
+        "type": kind,
+        "fields_name": [[section, field]],
+        "function_list": {
+            "nodes": nodes,
+            "result_rule": result_rule,
+            "explanation_template": templates,
+        },
+        "deduct": rng.choice([1, 2, 5, 10]),
+    }
+
+
+def available_rule_kinds() -> List[str]:
+    """依赖函数均已注册的规则类型"""
+    from ruleengine import functions  # noqa: F401  确保函数注册
+    from ruleengine.registry import get_registered_functions
+
+    registered = get_registered_functions()
+    return [kind for kind, required in RULE_KINDS.items() if all(name in registered for name in required)]
+
+
+def iter_rules(count: int, seed: int = 0) -> Iterator[Dict[str, Any]]:
+    """逐条生成规则配置（只使用依赖函数均已注册的规则类型）"""
+    kinds = available_rule_kinds()
+    if not kinds:
+        raise RuntimeError("没有可用的规则类型：所需函数均未注册")
+    rng = random.Random(seed)
+    for i in range(1, count + 1):
+        yield generate_rule(i, rng, kinds)
+
+
+def write_jsonl(items: Iterator[Dict[str, Any]], out: TextIO, progress_every: int = 0) -> Tuple[int, int]:
+    """
+    逐行写出 JSONL
+
+    Returns:
+        (条数, 字节数)
+    """
+    count = 0
+    written = 0
+    start = time.time()
+    for item in items:
+        line = json.dumps(item, ensure_ascii=False, separators=(",", ":")) + "\n"
+        out.write(line)
+        written += len(line.encode("utf-8"))
+        count += 1
+        if progress_every and count % progress_every == 0:
+            elapsed = time.time() - start
+            print(f"  已生成 {count} 条，{written / 1e6:.1f} MB，{count / elapsed:.0f} 条/秒", file=sys.stderr)
+    return count, written
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="合成病历与规则语料生成器")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    records = sub.add_parser("records", help="生成病历 JSONL")
+    records.add_argument("--count", type=int, required=True, help="病历数量")
+    records.add_argument("--output", "-o", help="输出路径（默认标准输出）")
+    records.add_argument("--size", default="typical", choices=list(RECORD_SIZES), help="病历规模")
+    records.add_argument("--empty-ratio", type=float, default=0.05, help="字段为空或缺失的概率")
+    records.add_argument("--length-distribution", default="lognormal", choices=LENGTH_DISTRIBUTIONS,
+                         help="字段长度分布")
+    records.add_argument("--sigma", type=float, default=0.6, help="lognormal 分布形状参数")
+    records.add_argument("--max-length", type=int, default=200_000, help="单个字段最大长度")
+    records.add_argument("--id-prefix", default="SYN", help="medical_id 前缀")
+    records.add_argument("--seed", type=int, default=0, help="随机种子")
+
+    rules = sub.add_parser("rules", help="生成规则配置 JSONL（每行一个 rule_config）")
+    rules.add_argument("--count", type=int, required=True, help="规则数量")
+    rules.add_argument("--output", "-o", help="输出路径（默认标准输出）")
+    rules.add_argument("--seed", type=int, default=0, help="随机种子")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "records":
+        generator = RecordGenerator(
+            size=args.size,
+            empty_ratio=args.empty_ratio,
+            length_distribution=args.length_distribution,
+            sigma=args.sigma,
+            max_length=args.max_length,
+            seed=args.seed,
+        )
+        items = generator.iter_records(args.count, args.id_prefix)
+        progress_every = 10_000
+    else:
+        items = iter_rules(args.count, args.seed)
+        progress_every = 0
+
+    start = time.time()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", buffering=1 << 20) as out:
+            count, written = write_jsonl(items, out, progress_every)
+        print(f"✅ 已生成 {count} 条，{written / 1e6:.1f} MB，耗时 {time.time() - start:.1f}s: {args.output}",
+              file=sys.stderr)
+    else:
+        try:
+            write_jsonl(items, sys.stdout)
+        except BrokenPipeError:
+            # 输出被 head 等提前关闭
+            sys.stderr.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,397 @@
+"""
+端到端 HTTP 压测
+按目标速率（开环）向 FastAPI 应用发送 /api/qc/execute、/api/rules/、/api/rule-dev/test 混合流量，
+统计吞吐与 p50/p95/p99 延迟，用于评估 worker 数量、在上线前发现延迟回退。
+
+三种运行方式（在 backend 目录下）：
+    # 1. 进程内：httpx ASGITransport 直接调用 app，无网络开销（压测端与服务端共享 CPU）
+    python -m benchmarks.loadtest --rate 100 --duration 30
+    # 2. 启动本地 uvicorn 子进程（--workers 评估多 worker 扩展性）
+    python -m benchmarks.loadtest --spawn --workers 4 --rate 400 --duration 60
+    # 3. 指向已运行的服务
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 --rate 200
+
+进程内与 --spawn 两种方式使用临时 SQLite 数据库（无需 MySQL），压测前自动创建并发布合成规则
+（见 benchmarks/corpus.py）；环境中已有的 DATABASE_URL 会被忽略，避免合成规则写入开发 / 生产库，
+确需压测其他数据库时用 --database-url 显式指定。--url 方式使用目标服务自身的数据库。
+"""
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.corpus import RECORD_SIZES, RecordGenerator, iter_rules
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 流量类型 -> (方法, 路径)
+ENDPOINTS = {
+    "execute": ("POST", "/api/qc/execute"),
+    "execute-all": ("POST", "/api/qc/execute-all"),
+    "rules": ("GET", "/api/rules/"),
+    "rule-dev": ("POST", "/api/rule-dev/test"),
+}
+DEFAULT_MIX = "execute=8,rules=1,rule-dev=1"
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """解析 "execute=8,rules=1" 形式的流量配比"""
+    weights: Dict[str, float] = {}
+    for item in mix.split(","):
+        if not item.strip():
+            continue
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"未知的流量类型: {name}，可选: {', '.join(ENDPOINTS)}")
+        weights[name] = float(weight or 1)
+    if not weights or sum(weights.values()) <= 0:
+        raise ValueError("流量配比不能为空")
+    return weights
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """已排序序列的分位数（最近秩）"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LatencyStats:
+    """单一流量类型的延迟与错误统计"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.status_codes: Dict[str, int] = {}
+
+    def add(self, latency: float, status: str, ok: bool):
+        self.latencies.append(latency)
+        self.status_codes[status] = self.status_codes.get(status, 0) + 1
+        if not ok:
+            self.errors += 1
+
+    def merge(self, other: "LatencyStats"):
+        self.latencies.extend(other.latencies)
+        self.errors += other.errors
+        for status, count in other.status_codes.items():
+            self.status_codes[status] = self.status_codes.get(status, 0) + count
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+        return {
+            "requests": len(ordered),
+            "errors": self.errors,
+            "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed > 0 else 0.0,
+            "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+            "status_codes": dict(sorted(self.status_codes.items())),
+        }
+
+
+# ---------- 被测服务 ----------
+
+def _service_env(db_dir: str, database_url: Optional[str] = None) -> Dict[str, str]:
+    """
+    被测服务的环境变量：LLM 缓存只用内存；数据库为 database_url，未指定时为临时 SQLite 数据库
+
+    始终覆盖环境中已有的 DATABASE_URL / LLM_CACHE_PATH：压测会创建并发布合成规则，
+    不能因为 shell 里留有配置就写进开发 / 生产库
+    """
+    env = dict(os.environ)
+    env["DATABASE_URL"] = database_url or f"sqlite:///{os.path.join(db_dir, 'loadtest.sqlite3')}"
+    env["LLM_CACHE_PATH"] = ""
+    return env
+
+
+@asynccontextmanager
+async def inprocess_client(db_dir: str, database_url: Optional[str] = None) -> AsyncIterator[httpx.AsyncClient]:
+    """进程内客户端：配置在导入 main 之前写入环境变量，并执行应用的 lifespan"""
+    os.environ.update(_service_env(db_dir, database_url))
+    import main
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+            yield client
+
+
+@asynccontextmanager
+async def spawned_client(
+    db_dir: str, workers: int, port: int, database_url: Optional[str] = None
+) -> AsyncIterator[httpx.AsyncClient]:
+    """启动本地 uvicorn 子进程，健康检查通过后返回客户端，结束时终止子进程"""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=_service_env(db_dir, database_url),
+    )
+    try:
+        async with remote_client(f"http://127.0.0.1:{port}") as client:
+            deadline = time.monotonic() + 30
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(f"uvicorn 启动失败，退出码 {process.returncode}")
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError("等待 uvicorn 启动超时")
+                await asyncio.sleep(0.2)
+            yield client
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+@asynccontextmanager
+async def remote_client(url: str, max_connections: int = 512) -> AsyncIterator[httpx.AsyncClient]:
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=httpx.Timeout(60.0)) as client:
+        yield client
+
+
+# ---------- 压测 ----------
+
+async def prepare(client: httpx.AsyncClient, rule_count: int, seed: int) -> Tuple[List[int], List[Dict[str, Any]]]:
+    """创建并发布合成规则，返回 (规则ID, 规则配置)"""
+    rule_ids = []
+    configs = []
+    for config in iter_rules(rule_count, seed):
+        config["rule_id"] = f"loadtest_{seed}_{config['rule_id']}"
+        resp = await client.post("/api/rules/", json={
+            "name": config["rule_name"],
+            "module": config["module"],
+            "description": config["description"],
+            "type": config["type"],
+            "deduct": config["deduct"],
+            "fields_name": config["fields_name"],
+            "config": config,
+            "auto_publish": True,
+        })
+        resp.raise_for_status()
+        rule_ids.append(resp.json()["id"])
+        configs.append(config)
+    return rule_ids, configs
+
+
+class LoadTest:
+    """
+    开环压测
+
+    设计思路：
+    1. 按目标速率在固定时刻发出请求（不等待上一个请求完成），服务变慢时在途请求堆积，
+       而不是压测端自动降速掩盖问题
+    2. 延迟从计划发出时刻算起，压测端自身调度延迟也计入，避免协同遗漏（coordinated omission）
+    3. 预热阶段的请求照常发送但不计入统计
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        mix: Dict[str, float],
+        rule_ids: List[int],
+        rule_configs: List[Dict[str, Any]],
+        records: List[Dict[str, Any]],
+        seed: int = 0,
+    ):
+        self.client = client
+        self.kinds = list(mix)
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.rule_ids = rule_ids
+        self.rule_configs = rule_configs
+        self.records = records
+        self.rng = random.Random(seed)
+        self.stats: Dict[str, LatencyStats] = {kind: LatencyStats() for kind in self.kinds}
+        self.max_in_flight = 0
+        self._in_flight = 0
+
+    def _request(self, kind: str) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+        method, path = ENDPOINTS[kind]
+        rng = self.rng
+        record = rng.choice(self.records)
+        if kind == "execute":
+            body = {"rule_id": rng.choice(self.rule_ids), "medical_record": record["medical_record"],
+                    "medical_id": record["medical_id"]}
+        elif kind == "execute-all":
+            body = {"medical_record": record["medical_record"], "medical_id": record["medical_id"]}
+        elif kind == "rule-dev":
+            body = {"rule_config": rng.choice(self.rule_configs), "medical_record": record["medical_record"]}
+        else:
+            body = None
+        return method, path, body
+
+    async def _send(self, kind: str, scheduled: float, measured: bool):
+        method, path, body = self._request(kind)
+        self._in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        try:
+            resp = await self.client.request(method, path, json=body)
+            status, ok = str(resp.status_code), resp.status_code < 400
+        except Exception as e:
+            status, ok = type(e).__name__, False
+        finally:
+            self._in_flight -= 1
+        if measured:
+            self.stats[kind].add(time.perf_counter() - scheduled, status, ok)
+
+    async def run(self, rate: float, duration: float, warmup: float = 0.0) -> float:
+        """
+        按 rate（请求/秒）持续发送 warmup + duration 秒
+
+        Returns:
+            统计窗口的实际时长（秒，含等待在途请求完成）
+        """
+        interval = 1.0 / rate
+        start = time.perf_counter()
+        measure_from = start + warmup
+        end = measure_from + duration
+        tasks = set()
+        i = 0
+        while True:
+            scheduled = start + i * interval
+            if scheduled >= end:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            kind = self.rng.choices(self.kinds, self.weights)[0]
+            task = asyncio.create_task(self._send(kind, scheduled, scheduled >= measure_from))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            i += 1
+        if tasks:
+            await asyncio.gather(*tasks)
+        return max(duration, time.perf_counter() - measure_from)
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        total = LatencyStats()
+        for stats in self.stats.values():
+            total.merge(stats)
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "max_in_flight": self.max_in_flight,
+            "total": total.summary(elapsed),
+            "endpoints": {kind: stats.summary(elapsed) for kind, stats in self.stats.items()},
+        }
+
+
+def print_report(report: Dict[str, Any], rate: float):
+    print(f"\n目标速率 {rate:.0f} req/s，统计时长 {report['elapsed_s']}s，最大在途请求 {report['max_in_flight']}")
+    print(f"{'流量':<14}{'请求数':>8}{'错误':>7}{'吞吐(rps)':>11}{'p50(ms)':>10}{'p95(ms)':>10}"
+          f"{'p99(ms)':>10}{'max(ms)':>10}")
+    rows = list(report["endpoints"].items()) + [("total", report["total"])]
+    for name, row in rows:
+        print(f"{name:<14}{row['requests']:>8}{row['errors']:>7}{row['throughput_rps']:>11}"
+              f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}{row['max_ms']:>10}")
+
+
+async def run_loadtest(args: argparse.Namespace) -> Dict[str, Any]:
+    mix = parse_mix(args.mix)
+    db_dir = tempfile.mkdtemp(prefix="qc_loadtest_")
+    try:
+        if args.url:
+            client_cm = remote_client(args.url)
+        elif args.spawn:
+            client_cm = spawned_client(db_dir, args.workers, args.port, args.database_url)
+        else:
+            client_cm = inprocess_client(db_dir, args.database_url)
+
+        async with client_cm as client:
+            rule_ids, rule_configs = await prepare(client, args.rules, args.seed)
+            generator = RecordGenerator(size=args.record_size, empty_ratio=args.empty_ratio, seed=args.seed)
+            records = list(generator.iter_records(args.records, id_prefix="LOAD"))
+            print(f"已发布 {len(rule_ids)} 条合成规则，病历池 {len(records)} 份（{args.record_size}）")
+
+            load = LoadTest(client, mix, rule_ids, rule_configs, records, args.seed)
+            elapsed = await load.run(args.rate, args.duration, args.warmup)
+            return load.report(elapsed)
+    finally:
+        if args.keep_db:
+            print(f"数据库目录: {db_dir}")
+        else:
+            shutil.rmtree(db_dir, ignore_errors=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="端到端 HTTP 压测")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="压测已运行的服务（如 http://127.0.0.1:8000）")
+    target.add_argument("--spawn", action="store_true", help="启动本地 uvicorn 子进程（临时 SQLite 数据库）")
+    parser.add_argument("--workers", type=int, default=1, help="--spawn 时的 uvicorn worker 数")
+    parser.add_argument("--port", type=int, default=8765, help="--spawn 时的端口")
+    parser.add_argument("--rate", type=float, default=50, help="目标速率（请求/秒）")
+    parser.add_argument("--duration", type=float, default=20, help="统计时长（秒）")
+    parser.add_argument("--warmup", type=float, default=3, help="预热时长（秒，不计入统计）")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"流量配比，默认 {DEFAULT_MIX}")
+    parser.add_argument("--rules", type=int, default=20, help="压测前创建的合成规则数")
+    parser.add_argument("--records", type=int, default=200, help="病历池大小")
+    parser.add_argument("--record-size", default="typical", choices=list(RECORD_SIZES), help="病历规模")
+    parser.add_argument("--empty-ratio", type=float, default=0.05, help="病历字段为空的概率")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument(
+        "--database-url",
+        help="进程内 / --spawn 时被测服务使用的数据库（默认临时 SQLite；环境变量 DATABASE_URL 不生效）",
+    )
+    parser.add_argument("--keep-db", action="store_true", help="保留临时 SQLite 数据库")
+    parser.add_argument("--output", help="结果 JSON 输出路径")
+    parser.add_argument("--max-p99-ms", type=float, help="总体 p99 超过该值时以非零状态退出")
+    parser.add_argument("--max-error-rate", type=float, default=0.0, help="允许的错误比例，超过时以非零状态退出")
+    args = parser.parse_args(argv)
+
+    try:
+        parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.url and args.database_url:
+        parser.error("--url 方式使用目标服务自身的数据库，不能同时指定 --database-url")
+    if args.rate <= 0 or args.duration <= 0:
+        parser.error("--rate 与 --duration 必须大于 0")
+
+    report = asyncio.run(run_loadtest(args))
+    report["config"] = {
+        "target": args.url or ("uvicorn" if args.spawn else "in-process"),
+        "workers": args.workers if args.spawn else None,
+        "rate": args.rate,
+        "duration": args.duration,
+        "mix": parse_mix(args.mix),
+        "record_size": args.record_size,
+    }
+    print_report(report, args.rate)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    total = report["total"]
+    failed = False
+    error_rate = total["errors"] / total["requests"] if total["requests"] else 0.0
+    if error_rate > args.max_error_rate:
+        print(f"\n❌ 错误比例 {error_rate:.2%} 超过 {args.max_error_rate:.2%}")
+        failed = True
+    if args.max_p99_ms is not None and total["p99_ms"] > args.max_p99_ms:
+        print(f"\n❌ p99 {total['p99_ms']}ms 超过 {args.max_p99_ms}ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+基准测试用的合成病历与规则
+固定随机种子，同一规模每次生成的病历完全相同，基准结果可比
+"""
+from typing import Any, Dict
+import random
+
+from benchmarks.corpus import PHRASES, SECTIONS
+
+
+# 病历规模：各 section 的字段数、每个字段的短语数
+RECORD_SIZES = {
+    "small": {"fields": 2, "phrases": (1, 3)},
+    "typical": {"fields": 8, "phrases": (4, 20)},
+    "huge": {"fields": 40, "phrases": (200, 600)},
+}
+
+LLM_OUTPUT_SAMPLE = (
+    "<thinking>主诉包含症状与持续时间，符合书写规范。</thinking>"
+    "<evidence>患者因头痛3天入院</evidence>"
+    "<conclusion>是</conclusion>"
+)
+
+
+def build_record(size: str, seed: int = 0) -> Dict[str, Any]:
+    """
+    生成指定规模的合成病历
+
+    Args:
+        size: small / typical / huge
+        seed: 随机种子
+
+    Returns:
+        {section: {field: text}} 形式的病历
+    """
+    spec = RECORD_SIZES[size]
+    rng = random.Random(f"{size}-{seed}")
+    record: Dict[str, Any] = {}
+    for section, fields in SECTIONS.items():
+        record[section] = {}
+        for i in range(spec["fields"]):
+            base = fields[i % len(fields)][0]
+            name = base if i < len(fields) else f"{base}{i // len(fields) + 1}"
+            low, high = spec["phrases"]
+            record[section][name] = "，".join(rng.choice(PHRASES) for _ in range(rng.randint(low, high))) + "。"
+    return record
+
+
+def build_rule_config() -> Dict[str, Any]:
+    """基准规则：字段提取 -> 字符计数 / 文本统计 -> 数值范围检查，解释模板引用多个节点输出"""
+    return {
+        "rule_id": "bench_001",
+        "rule_name": "基准-主诉与现病史",
+        "module": "入院记录",
+        "function_list": {
+            "nodes": [
+                {"id": 1, "function": "extract_field_content",
+                 "params": {"field_name": ["入院记录", "主诉"]},
+                 "outputs": {"text": "result", "is_empty": "is_empty"}},
+                {"id": 2, "function": "extract_field_content",
+                 "params": {"field_name": ["入院记录", ""]},
+                 "outputs": {"text": "result"}},
+                {"id": 3, "function": "count_characters",
+                 "params": {"text": {"source": 1, "output": "text"}, "count_chinese_only": True},
+                 "outputs": {"count": "result"}},
+                {"id": 4, "function": "text_statistics",
+                 "params": {"text": {"source": 2, "output": "text"}},
+                 "outputs": {"length": "result", "lines": "line_count"}},
+                {"id": 5, "function": "is_number_in_range",
+                 "params": {"value": {"source": 3, "output": "count"}, "min_value": 2, "max_value": 20},
+                 "outputs": {"ok": "result"}},
+            ],
+            "result_rule": {
+                "pass": {"source": 5, "output": "ok", "expect": True},
+                "skipped_1": {"source": 1, "output": "is_empty", "expect": True},
+            },
+            "explanation_template": {
+                "pass": "主诉{{node_3.count}}个中文字符，入院记录共{{node_4.length}}字{{node_4.lines}}行",
+                "fail": "主诉{{node_3.count}}个中文字符，不在2-20范围内",
+                "skipped_1": "主诉为空",
+            },
+        },
+        "deduct": 5,
+    }
+
+
+def build_io_rule_config(io_function: str) -> Dict[str, Any]:
+    """
+    含阻塞节点的基准规则：两个互不依赖的 I/O 节点（模拟外部调用）与纯函数节点混合，
+    用于确认并发执行确实让阻塞节点重叠，且纯函数节点不因并发而变慢
+    """
+    config = build_rule_config()
+    config["rule_id"] = "bench_io_001"
+    config["rule_name"] = "基准-含阻塞节点"
+    config["function_list"]["nodes"] += [
+        {"id": 6, "function": io_function,
+         "params": {"text": {"source": 1, "output": "text"}},
+         "outputs": {"waited": "result"}},
+        {"id": 7, "function": io_function,
+         "params": {"text": {"source": 2, "output": "text"}},
+         "outputs": {"waited": "result"}},
+    ]
+    return config
@@ -0,0 +1,348 @@
+"""
+规则引擎微基准
+
+覆盖引擎构建、execute（并发 / 顺序）、ExecutionContext.resolve_params、解释模板渲染，
+以及每个已注册的原子函数；按 small / typical / huge 三种规模的合成病历分别测量。
+结果可保存为 JSON 基线，之后每次运行与基线比较，任一指标变慢超过阈值即以非零状态退出。
+另外在同一次运行内比较并发与顺序执行（不依赖基线）：并发比顺序慢超过阈值同样以非零状态退出。
+
+绝对耗时只在同一台机器、同一 Python 版本上可比，因此基线不入库：默认写入
+benchmarks/baseline.local.json（已被 benchmarks/.gitignore 忽略），由各自的机器在改动前生成：
+
+    git stash                                              # 或切换到改动前的提交
+    python -m benchmarks.run_benchmarks --save             # 在本机生成基线
+    git stash pop
+    python -m benchmarks.run_benchmarks                    # 与本机基线比较
+
+CI 中在同一个 job 里先对目标分支 --save、再对改动分支比较。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.run_benchmarks                    # 运行并与基线比较
+    python -m benchmarks.run_benchmarks --save             # 运行并写入基线
+    python -m benchmarks.run_benchmarks --filter function. --sizes small,typical
+    python -m benchmarks.run_benchmarks --threshold 0.3 --output bench.json
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+from ruleengine import functions  # noqa: F401  确保函数注册
+from ruleengine.core.context import ExecutionContext
+from ruleengine.core.engine import RuleEngine
+from ruleengine.core.record_index import RecordIndex
+from ruleengine.registry import get_registered_functions, register_function
+
+from benchmarks.records import (
+    LLM_OUTPUT_SAMPLE, RECORD_SIZES, build_io_rule_config, build_record, build_rule_config,
+)
+
+
+# 本机基线（不入库，见模块说明）
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.local.json")
+DEFAULT_THRESHOLD = 0.25
+
+# 原子函数的基准参数：函数名 -> (是否随病历规模变化, 参数构造函数(病历, 入院记录全文))
+# 新注册的函数需要在此补充，否则运行时会提示缺少基准参数
+FUNCTION_ARGS: Dict[str, Tuple[bool, Callable[[Dict[str, Any], str], Dict[str, Any]]]] = {
+    "extract_field_content": (True, lambda record, text: {
+        "field_name": ["入院记录", ""], "medical_record": record,
+    }),
+    "count_characters": (True, lambda record, text: {"text": text}),
+    "count_chinese_characters": (True, lambda record, text: {"text": text}),
+    "text_statistics": (True, lambda record, text: {"text": text}),
+    "is_number_in_range": (False, lambda record, text: {"value": 12, "min_value": 2, "max_value": 20}),
+    "extract_llm_tags": (True, lambda record, text: {"text": text + LLM_OUTPUT_SAMPLE}),
+}
+
+# 模拟阻塞节点的等待时间（秒）
+IO_WAIT_SECONDS = 0.001
+
+
+@register_function(
+    name="_bench_io_wait",
+    description="基准用：模拟一次外部调用的等待（非纯函数，并发执行时转到线程池）",
+    category="基准",
+    inputs=[{"name": "text", "type": "str", "desc": "任意文本"}],
+)
+def _bench_io_wait(text: str) -> Dict[str, Any]:
+    time.sleep(IO_WAIT_SECONDS)
+    return {"result": True}
+
+
+# ---------- 计时 ----------
+
+def measure(func: Callable[[], Any], repeat: int = 5, min_time: float = 0.02) -> Dict[str, float]:
+    """
+    测量单次调用耗时
+
+    设计思路：
+    1. 先倍增调用次数，直到一轮耗时不少于 min_time，摊薄计时器开销
+    2. 重复 repeat 轮，取每轮的单次平均耗时；比较基线使用最小值（受干扰最小），同时给出中位数
+
+    Returns:
+        {"per_call_us": 最小单次耗时, "median_us": 中位单次耗时, "number": 每轮调用次数}
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2
+
+    per_call = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        per_call.append((time.perf_counter() - start) / number)
+    return {
+        "per_call_us": round(min(per_call) * 1e6, 3),
+        "median_us": round(statistics.median(per_call) * 1e6, 3),
+        "number": number,
+    }
+
+
+# ---------- 基准用例 ----------
+
+def _function_caller(name: str, kwargs: Dict[str, Any]) -> Callable[[], Any]:
+    info = get_registered_functions()[name]
+    func = info["function"]
+    if info.get("is_async"):
+        return lambda: asyncio.run(func(**kwargs))
+    return lambda: func(**kwargs)
+
+
+def build_cases(sizes: List[str]) -> Tuple[List[Tuple[str, Callable[[], Any]]], List[str]]:
+    """
+    构造全部基准用例
+
+    Returns:
+        ([(用例名, 无参可调用对象)], 缺少基准参数的已注册函数名)
+    """
+    rule_config = build_rule_config()
+    cases: List[Tuple[str, Callable[[], Any]]] = []
+
+    # 与病历规模无关的用例
+    cases.append(("engine.construct", lambda: RuleEngine(rule_config)))
+
+    engine = RuleEngine(rule_config, concurrent=False)
+    engine.execute(build_record("typical"))
+    context = engine.context
+    templates = engine.plan.templates
+    cases.append(("template.render[pass]", lambda: templates["pass"].render(context)))
+    cases.append(("template.render[fail]", lambda: templates["fail"].render(context)))
+
+    registered = get_registered_functions()
+    missing = sorted(name for name in registered if not name.startswith("_") and name not in FUNCTION_ARGS)
+    for name, (per_size, build_args) in FUNCTION_ARGS.items():
+        if name in registered and not per_size:
+            cases.append((f"function.{name}", _function_caller(name, build_args({}, ""))))
+
+    for size in sizes:
+        record = build_record(size)
+        text = RecordIndex(record).text("入院记录", "")
+
+        concurrent_engine = RuleEngine(rule_config)
+        sequential_engine = RuleEngine(rule_config, concurrent=False)
+        cases.append((f"engine.execute[{size}]", lambda e=concurrent_engine, r=record: e.execute(r)))
+        cases.append((f"engine.execute_sequential[{size}]", lambda e=sequential_engine, r=record: e.execute(r)))
+        io_config = build_io_rule_config("_bench_io_wait")
+        concurrent_io_engine = RuleEngine(io_config)
+        sequential_io_engine = RuleEngine(io_config, concurrent=False)
+        cases.append((f"engine.execute_io[{size}]", lambda e=concurrent_io_engine, r=record: e.execute(r)))
+        cases.append((f"engine.execute_io_sequential[{size}]", lambda e=sequential_io_engine, r=record: e.execute(r)))
+
+        resolve_context = ExecutionContext()
+        resolve_context.set_medical_record(record)
+        resolve_context.set_node_output("1", {"text": text, "is_empty": False})
+        resolve_context.set_node_output("2", {"text": text, "count": len(text)})
+        params = {
+            "text": {"source": 1, "output": "text"},
+            "joined": [{"source": 1, "output": "text"}, {"source": 2, "output": "text"}],
+            "value": {"source": 2, "output": "count"},
+            "options": {"field_name": ["入院记录", "主诉"], "limit": 20},
+        }
+        cases.append((f"context.resolve_params[{size}]", lambda c=resolve_context, p=params: c.resolve_params(p)))
+
+        for name, (per_size, build_args) in FUNCTION_ARGS.items():
+            if name in registered and per_size:
+                cases.append((f"function.{name}[{size}]", _function_caller(name, build_args(record, text))))
+
+    return cases, missing
+
+
+# ---------- 基线 ----------
+
+def load_baseline(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _environment() -> Dict[str, str]:
+    """决定绝对耗时是否可比的运行环境"""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.node(),
+    }
+
+
+def environment_mismatch(baseline: Dict[str, Any]) -> List[str]:
+    """基线的运行环境与本机不同的项（python / platform / machine）"""
+    meta = baseline.get("meta", {})
+    return [key for key, value in _environment().items() if key in meta and meta[key] != value]
+
+
+def save_results(path: str, results: Dict[str, Dict[str, float]]):
+    data = {
+        "meta": {
+            **_environment(),
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Any],
+    threshold: float,
+) -> List[Tuple[str, float, float, float]]:
+    """
+    与基线比较（基线应在同一台机器上生成，不同机器间的绝对耗时不可比）
+
+    Returns:
+        变慢超过阈值的用例 [(用例名, 基线耗时us, 当前耗时us, 变化比例)]
+    """
+    regressions = []
+    baseline_results = baseline.get("results", {})
+    for name, current in results.items():
+        base = baseline_results.get(name)
+        if not base or not base.get("per_call_us"):
+            continue
+        ratio = current["per_call_us"] / base["per_call_us"] - 1
+        if ratio > threshold:
+            regressions.append((name, base["per_call_us"], current["per_call_us"], ratio))
+    return regressions
+
+
+def compare_pairs(
+    results: Dict[str, Dict[str, float]],
+    threshold: float,
+) -> List[Tuple[str, float, float, float]]:
+    """
+    同一次运行内比较并发执行与对应的顺序执行（xxx[size] 与 xxx_sequential[size]）
+
+    同一进程内的相对耗时可比，不需要基线；并发执行不应比顺序执行慢
+
+    Returns:
+        并发比顺序慢超过阈值的用例 [(并发用例名, 顺序耗时us, 并发耗时us, 变化比例)]
+    """
+    slower = []
+    for name, sequential in results.items():
+        base, sep, size = name.partition("_sequential[")
+        if not sep:
+            continue
+        concurrent = results.get(f"{base}[{size}")
+        if not concurrent or not sequential.get("per_call_us"):
+            continue
+        ratio = concurrent["per_call_us"] / sequential["per_call_us"] - 1
+        if ratio > threshold:
+            slower.append((f"{base}[{size}", sequential["per_call_us"], concurrent["per_call_us"], ratio))
+    return slower
+
+
+# ---------- 入口 ----------
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="规则引擎微基准")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线 JSON 路径")
+    parser.add_argument("--save", action="store_true", help="将本次结果写入基线")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="允许的变慢比例，默认 0.25（即 25%%）")
+    parser.add_argument("--sizes", default=",".join(RECORD_SIZES), help="病历规模，逗号分隔")
+    parser.add_argument("--filter", default="", help="只运行名称包含该子串的用例")
+    parser.add_argument("--repeat", type=int, default=5, help="每个用例的测量轮数")
+    parser.add_argument("--min-time", type=float, default=0.02, help="每轮最少耗时（秒）")
+    parser.add_argument("--output", help="另存本次结果的 JSON 路径")
+    args = parser.parse_args(argv)
+
+    sizes = [size for size in args.sizes.split(",") if size]
+    unknown = [size for size in sizes if size not in RECORD_SIZES]
+    if unknown:
+        parser.error(f"未知的病历规模: {', '.join(unknown)}，可选: {', '.join(RECORD_SIZES)}")
+
+    cases, missing = build_cases(sizes)
+    if missing:
+        print(f"⚠️  以下已注册函数缺少基准参数（见 FUNCTION_ARGS）: {', '.join(missing)}")
+
+    baseline = load_baseline(args.baseline)
+    baseline_results = (baseline or {}).get("results", {})
+    mismatch = environment_mismatch(baseline) if baseline and not args.save else []
+    if mismatch:
+        print(f"⚠️  基线 {args.baseline} 不是在本机环境下生成的（{', '.join(mismatch)} 不同），"
+              f"绝对耗时不可比；请先用 --save 在本机生成基线")
+
+    results: Dict[str, Dict[str, float]] = {}
+    print(f"{'用例':<46}{'单次(us)':>12}{'中位(us)':>12}{'基线(us)':>12}{'变化':>9}")
+    for name, func in cases:
+        if args.filter and args.filter not in name:
+            continue
+        result = measure(func, repeat=args.repeat, min_time=args.min_time)
+        results[name] = result
+        base = baseline_results.get(name, {}).get("per_call_us")
+        change = f"{(result['per_call_us'] / base - 1) * 100:+.1f}%" if base else "-"
+        print(f"{name:<46}{result['per_call_us']:>12.2f}{result['median_us']:>12.2f}"
+              f"{base if base else '-':>12}{change:>9}")
+
+    if args.output:
+        save_results(args.output, results)
+
+    slower = compare_pairs(results, args.threshold)
+    if slower:
+        print(f"\n❌ {len(slower)} 个用例并发执行比顺序执行慢超过 {args.threshold:.0%}:")
+        for name, sequential, concurrent, ratio in slower:
+            print(f"  - {name}: 顺序 {sequential:.2f}us -> 并发 {concurrent:.2f}us ({ratio:+.1%})")
+        return 1
+
+    if args.save:
+        if baseline_results and (args.filter or len(sizes) < len(RECORD_SIZES)):
+            # 只运行了部分用例时合并进已有基线，不丢弃其余用例
+            results = {**baseline_results, **results}
+        save_results(args.baseline, results)
+        print(f"\n✅ 基线已写入: {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print(f"\n未找到基线 {args.baseline}，先在改动前的代码上用 --save 生成本机基线")
+        return 0
+    if mismatch:
+        print("\n跳过与基线的比较")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} 个用例变慢超过 {args.threshold:.0%}:")
+        for name, base, current, ratio in regressions:
+            print(f"  - {name}: {base:.2f}us -> {current:.2f}us ({ratio:+.1%})")
+        return 1
+    print(f"\n✅ 无超过 {args.threshold:.0%} 的性能回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,6 +12,59 @@ class Settings:
     # 可选：LLM 服务等配置
     LLM_BASE_URL: str = os.getenv("LLM_BASE_URL", "")
     LLM_API_KEY: str = os.getenv("LLM_API_KEY", "")
+    LLM_MODEL: str = os.getenv("LLM_MODEL", "")
+    LLM_CHAT_PATH: str = os.getenv("LLM_CHAT_PATH", "/chat/completions")
+    LLM_TEMPERATURE: float = float(os.getenv("LLM_TEMPERATURE", "0"))
+    # LLM 客户端：超时（秒）、重试与退避（秒）、连接池与在途请求上限
+    LLM_CONNECT_TIMEOUT: float = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+    LLM_READ_TIMEOUT: float = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    LLM_BACKOFF_BASE: float = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+    LLM_BACKOFF_MAX: float = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+    LLM_MAX_KEEPALIVE: int = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+    LLM_MAX_IN_FLIGHT: int = int(os.getenv("LLM_MAX_IN_FLIGHT", "32"))
+    # LLM 准入控制：交互 / 批量通道各自的并发上限，以及共享的令牌桶限速（请求/秒，<=0 不限速）
+    LLM_INTERACTIVE_CONCURRENCY: int = int(os.getenv("LLM_INTERACTIVE_CONCURRENCY", "24"))
+    LLM_BATCH_CONCURRENCY: int = int(os.getenv("LLM_BATCH_CONCURRENCY", "8"))
+    LLM_RATE_LIMIT_RPS: float = float(os.getenv("LLM_RATE_LIMIT_RPS", "0"))
+    LLM_RATE_LIMIT_BURST: float = float(os.getenv("LLM_RATE_LIMIT_BURST", "10"))
+    # LLM 请求合并：相同提示词的并发请求共享一次上游调用；
+    # 微批 = 等待 LLM_MICRO_BATCH_WAIT_MS 毫秒内最多 LLM_MICRO_BATCH_SIZE 个提示词合并为一次批量请求（<=1 不启用）
+    LLM_COALESCE: bool = os.getenv("LLM_COALESCE", "true").lower() == "true"
+    LLM_BATCH_PATH: str = os.getenv("LLM_BATCH_PATH", "/completions")
+    LLM_MICRO_BATCH_SIZE: int = int(os.getenv("LLM_MICRO_BATCH_SIZE", "0"))
+    LLM_MICRO_BATCH_WAIT_MS: float = float(os.getenv("LLM_MICRO_BATCH_WAIT_MS", "5"))
+    LLM_MICRO_BATCH_CONCURRENCY: int = int(os.getenv("LLM_MICRO_BATCH_CONCURRENCY", "4"))
+    # LLM 响应缓存：内存 LRU 条目数 + SQLite 文件（路径为空则只用内存），过期时间（秒，<=0 不过期）
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_PATH: str = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+    LLM_CACHE_MEMORY_SIZE: int = int(os.getenv("LLM_CACHE_MEMORY_SIZE", "2048"))
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "200000"))
+    LLM_CACHE_TTL_SECONDS: float = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+    # 规则引擎：并发执行相互独立的阻塞节点（非纯函数 / 协程函数）的线程池大小（<=1 表示始终顺序执行）
+    ENGINE_MAX_WORKERS: int = int(os.getenv("ENGINE_MAX_WORKERS", "16"))
+    # 异步执行路径：纯函数节点的输入规模（字符串字符数 / 容器元素数之和）超过该值时转到线程池执行，
+    # 避免大病历上的 CPU 计算长时间占用事件循环（<0 表示始终在事件循环中执行）
+    ENGINE_ASYNC_INLINE_MAX_SIZE: int = int(os.getenv("ENGINE_ASYNC_INLINE_MAX_SIZE", "20000"))
+    # 批量执行接口（POST /api/qc/execute/batch）单次请求的病历数上限，超出返回 422
+    BATCH_MAX_RECORDS: int = int(os.getenv("BATCH_MAX_RECORDS", "1000"))
+    # 进程池批量执行：进程数（<=0 表示 CPU 核数）与每个任务携带的病历数
+    PROCESS_POOL_WORKERS: int = int(os.getenv("PROCESS_POOL_WORKERS", "0"))
+    PROCESS_CHUNK_SIZE: int = int(os.getenv("PROCESS_CHUNK_SIZE", "64"))
+    # 工作进程启动方式：spawn / forkserver（不使用 fork：服务进程中已有后台线程，fork 可能继承被持有的锁）
+    PROCESS_START_METHOD: str = os.getenv("PROCESS_START_METHOD", "spawn")
+    # 已发布规则缓存：后台与数据库同步的间隔（秒），<=0 表示不启动后台同步
+    RULE_CACHE_REFRESH_SECONDS: float = float(os.getenv("RULE_CACHE_REFRESH_SECONDS", "30"))
+    # 执行证据（answer）默认级别：none / fail_only / summary / full，可被规则配置与请求参数覆盖；
+    # summary / fail_only 下长文本截断到 EVIDENCE_MAX_LENGTH 个字符
+    EVIDENCE_LEVEL: str = os.getenv("EVIDENCE_LEVEL", "summary").lower()
+    EVIDENCE_MAX_LENGTH: int = int(os.getenv("EVIDENCE_MAX_LENGTH", "100"))
+    # 执行记录持久化：sync = 提交后再响应；buffered = 缓冲后由后台线程批量写入
+    RECORD_DURABILITY: str = os.getenv("RECORD_DURABILITY", "sync").lower()
+    RECORD_QUEUE_SIZE: int = int(os.getenv("RECORD_QUEUE_SIZE", "20000"))
+    RECORD_FLUSH_SIZE: int = int(os.getenv("RECORD_FLUSH_SIZE", "500"))
+    RECORD_FLUSH_INTERVAL_MS: int = int(os.getenv("RECORD_FLUSH_INTERVAL_MS", "200"))
     # 其他：日志、跨域、鉴权开关等
     ENABLE_CORS: bool = os.getenv("ENABLE_CORS", "true").lower() == "true"
 
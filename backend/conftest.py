@@ -0,0 +1,13 @@
+"""
+测试环境配置
+Settings 在导入 config 时读取环境变量，这里需在任何测试模块导入应用之前执行：
+接口测试使用临时 SQLite 数据库，LLM 响应缓存只用内存，不启动已发布规则缓存的后台同步
+"""
+import os
+import tempfile
+
+_tmp_dir = tempfile.mkdtemp(prefix="medical_qc_test_")
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'test.db')}"
+os.environ["LLM_CACHE_PATH"] = ""
+os.environ["RULE_CACHE_REFRESH_SECONDS"] = "0"
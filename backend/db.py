@@ -1,7 +1,10 @@
-from sqlalchemy import create_engine
+import time
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 from config import get_settings
+from metrics import registry
 
 settings = get_settings()
 
@@ -16,11 +19,38 @@ SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, futu
 
 Base = declarative_base()
 
+DB_SESSION_SECONDS = registry.histogram(
+    "qc_db_session_duration_seconds", "请求内数据库会话的持有时长（秒）"
+)
+DB_COMMIT_SECONDS = registry.histogram(
+    "qc_db_commit_duration_seconds", "数据库提交耗时（秒），含提交前的 flush"
+)
+DB_ROLLBACKS = registry.counter("qc_db_rollbacks_total", "数据库回滚次数")
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _before_commit(session):
+    session.info["commit_started"] = time.perf_counter()
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _after_commit(session):
+    started = session.info.pop("commit_started", None)
+    if started is not None:
+        DB_COMMIT_SECONDS.observe(time.perf_counter() - started)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("commit_started", None)
+    DB_ROLLBACKS.inc()
+
 
 def get_db():
     db = SessionLocal()
+    start = time.perf_counter()
     try:
         yield db
     finally:
         db.close()
-
+        DB_SESSION_SECONDS.observe(time.perf_counter() - start)
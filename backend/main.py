@@ -1,21 +1,54 @@
+from contextlib import asynccontextmanager
+
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from config import get_settings
 from db import Base, engine
+from metrics import CONTENT_TYPE, MetricsMiddleware, registry
 from routers import api_router
 import models  # 确保模型被导入，从而在 create_all 时创建表
 
 # 导入规则引擎函数库，确保装饰器执行（函数注册）
 from ruleengine import functions  # 新架构的函数库
+from ruleengine.batch_runner import shutdown_process_runner
+from ruleengine.core.scheduler import shutdown_executor
+from ruleengine.llm.cache import close_llm_cache, peek_llm_cache
+from ruleengine.llm.client import aclose_llm_client, close_llm_client
+from ruleengine.llm.coalesce import close_micro_batcher, coalesce_stats
+from ruleengine.llm.limiter import get_admission_controller
+from services.record_writer import DURABILITY_BUFFERED, record_writer
+from services.rule_cache import published_rule_cache
 
 # 创建表（生产环境建议用 Alembic 管理迁移）
 Base.metadata.create_all(bind=engine)
 
 settings = get_settings()
 
-app = FastAPI(title="Medical QC System", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 启动已发布规则缓存的后台同步（多 worker 进程间收敛）
+    published_rule_cache.start()
+    # 执行记录缓冲写入（RECORD_DURABILITY=buffered）
+    if settings.RECORD_DURABILITY == DURABILITY_BUFFERED:
+        record_writer.start()
+    yield
+    published_rule_cache.stop()
+    # 退出前写完缓冲中的执行记录
+    record_writer.stop()
+    # 退出时关闭规则引擎的节点线程池与批量执行进程池
+    shutdown_process_runner()
+    shutdown_executor()
+    close_micro_batcher()
+    # 先在服务事件循环上关闭异步连接池，再关闭同步连接池
+    await aclose_llm_client()
+    close_llm_client()
+    close_llm_cache()
+
+
+app = FastAPI(title="Medical QC System", version="0.1.0", lifespan=lifespan)
 
 if settings.ENABLE_CORS:
     app.add_middleware(
@@ -26,12 +59,32 @@ if settings.ENABLE_CORS:
         allow_headers=["*"],
     )
 
+# 请求耗时指标（GET /metrics）
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(api_router, prefix="/api")
 
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
+    # 只读取已创建的缓存，探活请求不创建缓存（不打开 SQLite 文件）
+    llm_cache = peek_llm_cache()
+    return {
+        "status": "ok",
+        "record_writer": {
+            "durability": settings.RECORD_DURABILITY,
+            **record_writer.stats(),
+        },
+        "llm_cache": llm_cache.stats() if llm_cache is not None else None,
+        "llm_coalesce": coalesce_stats(),
+        "llm_admission": get_admission_controller().stats(),
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus 抓取端点（文本格式），每个 worker 进程各自暴露本进程的指标"""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,365 @@
+"""
+进程内运行指标
+计数器 / 仪表 / 直方图的最小实现，以 Prometheus 文本格式输出（GET /metrics），无需额外依赖或 sidecar
+
+用法：
+    from metrics import registry
+
+    RULE_EXECUTIONS = registry.counter("qc_rule_executions_total", "规则执行次数", ("flag",))
+    RULE_EXECUTIONS.labels("pass").inc()
+
+各模块在导入时定义自己的指标；已有统计（如缓存命中、队列深度）通过 register_collector 在抓取时读取，
+热路径上不重复计数。多 worker 部署时每个进程各自暴露指标，由 Prometheus 按实例聚合。
+"""
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+import math
+import threading
+import time
+
+
+# 默认直方图桶（秒）：覆盖 1ms ~ 10s 的请求耗时
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 原子函数耗时桶（秒）：多数函数在微秒到毫秒级
+FUNCTION_BUCKETS = (0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.25, 1.0, 5.0)
+# LLM 调用耗时桶（秒）
+LLM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+# 抓取时采集的样本：(标签, 数值)
+Sample = Tuple[Dict[str, str], float]
+# 采集器返回的指标族：(名称, 类型, 说明, 样本)
+MetricFamily = Tuple[str, str, str, List[Sample]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _CounterChild:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("_lock", "_bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._lock = threading.Lock()
+        self._bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # 各桶（非累计）计数，最后一个为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = bisect_left(self._bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> "_Timer":
+        """with HISTOGRAM.labels(...).time(): ... 记录代码块耗时"""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: _HistogramChild):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class _Metric:
+    """
+    指标基类
+
+    每组标签值对应一个子对象（labels() 返回并缓存），子对象各自持锁；
+    热路径上可预先取得子对象（如按 flag 预建的计数器），省去标签查找
+    """
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: Any):
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}，实际传入 {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _items(self) -> List[Tuple[Dict[str, str], Any]]:
+        with self._lock:
+            items = list(self._children.items())
+        return [(dict(zip(self.labelnames, key)), child) for key, child in items]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for labels, child in self._items():
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(child.value)}")
+        return lines
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, child in self._items():
+            with child._lock:
+                counts = list(child.counts)
+                total, count = child.sum, child.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels({**labels, "le": _format_value(float(bound))})
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_text = _format_labels(labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表：按注册顺序输出直接记录的指标，再输出采集器在抓取时读取的指标"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # 模块被重复导入时复用已有指标
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[[], Iterable[MetricFamily]]):
+        """注册抓取时调用的采集器，返回 [(名称, 类型, 说明, [(标签, 数值)])]"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Prometheus 文本格式（0.0.4）"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector in collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                lines.append(f"# 采集器 {getattr(collector, '__name__', collector)} 出错: {e!r}")
+                continue
+            for name, type_name, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {type_name}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(float(value))}")
+        return "\n".join(lines) + "\n"
+
+
+# 进程内共享的指标注册表
+registry = MetricsRegistry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 各缓存的命中 / 未命中次数（执行计划缓存、已发布规则缓存等）；LLM 响应缓存沿用其自身计数，见 ruleengine/llm/cache.py
+CACHE_REQUESTS = registry.counter(
+    "qc_cache_requests_total", "缓存查找次数（result=hit/miss）", ("cache", "result")
+)
+
+
+def _collect_cache_hit_ratio() -> List[MetricFamily]:
+    """按 qc_cache_requests_total 计算各缓存的命中率（进程启动以来）"""
+    totals: Dict[str, List[float]] = {}
+    for labels, child in CACHE_REQUESTS._items():
+        entry = totals.setdefault(labels["cache"], [0.0, 0.0])
+        if labels["result"] == "hit":
+            entry[0] += child.value
+        entry[1] += child.value
+    samples = [
+        ({"cache": cache}, hits / lookups if lookups else 0.0)
+        for cache, (hits, lookups) in sorted(totals.items())
+    ]
+    return [("qc_cache_hit_ratio", "gauge", "缓存命中率（进程启动以来）", samples)]
+
+
+registry.register_collector(_collect_cache_hit_ratio)
+
+
+# ---------- HTTP 请求 ----------
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "qc_http_request_duration_seconds", "HTTP 请求耗时（秒），按路由模板统计", ("method", "route", "status")
+)
+HTTP_REQUESTS_IN_PROGRESS = registry.gauge(
+    "qc_http_requests_in_progress", "正在处理的 HTTP 请求数", ("method",)
+)
+
+
+class MetricsMiddleware:
+    """
+    记录请求耗时的 ASGI 中间件
+
+    路由标签取路由模板（如 /api/rules/{rule_id}），而不是实际路径，避免标签基数随 ID 增长；
+    未匹配任何路由的请求记为 "unmatched"（同样避免随意路径撑大标签）。纯 ASGI 实现，不包装请求 / 响应体
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_progress.dec()
+            HTTP_REQUEST_SECONDS.labels(method, _route_template(scope), status).observe(elapsed)
+
+
+def _route_template(scope) -> str:
+    """
+    由请求路径与路径参数还原路由模板：/api/rules/5 + {rule_id: 5} -> /api/rules/{rule_id}
+
+    路由器处理请求后会在 scope 中写入 endpoint 与 path_params；嵌套 include_router 时
+    scope["route"] 只带子路由的相对路径，因此从完整路径反推，不依赖框架内部结构
+    """
+    if scope.get("endpoint") is None:
+        return "unmatched"
+    path = scope.get("path", "")
+    params = scope.get("path_params") or {}
+    if not params:
+        return path
+    names = {str(value): name for name, value in params.items()}
+    return "/".join(f"{{{names[part]}}}" if part in names else part for part in path.split("/"))
@@ -4,18 +4,53 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
 from db import get_db
-from schemas.rule import ExecuteRequest, ExecuteResponse
-from services.execution_service import execute_rule_by_id
+from schemas.rule import (
+    BatchExecuteRequest,
+    BatchExecuteResponse,
+    ExecuteAllRequest,
+    ExecuteAllResponse,
+    ExecuteRequest,
+    ExecuteResponse,
+)
+from services.execution_service import (
+    execute_published_rules_async,
+    execute_rule_batch_async,
+    execute_rule_by_id_async,
+)
 
 router = APIRouter()
 
 
 @router.post("/execute", response_model=ExecuteResponse)
-def api_execute(req: ExecuteRequest, db: Session = Depends(get_db)):
+async def api_execute(req: ExecuteRequest, db: Session = Depends(get_db)):
     start = time.time()
-    result = execute_rule_by_id(db, req.rule_id, req.medical_record, req.medical_id)
+    result = await execute_rule_by_id_async(
+        db, req.rule_id, req.medical_record, req.medical_id, req.evidence_level
+    )
     if result is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rule not found")
     result["duration_ms"] = int((time.time() - start) * 1000)
     return result
 
+
+@router.post("/execute/batch", response_model=BatchExecuteResponse)
+async def api_execute_batch(req: BatchExecuteRequest, db: Session = Depends(get_db)):
+    results = await execute_rule_batch_async(
+        db, req.rule_id, req.records, req.use_processes, req.evidence_level
+    )
+    if results is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rule not found")
+    return BatchExecuteResponse(rule_id=req.rule_id, total=len(results), results=results)
+
+
+@router.post("/execute-all", response_model=ExecuteAllResponse)
+async def api_execute_all(req: ExecuteAllRequest, db: Session = Depends(get_db)):
+    results = await execute_published_rules_async(
+        db, req.medical_record, req.medical_id, req.module, req.evidence_level
+    )
+    return ExecuteAllResponse(
+        medical_id=req.medical_id,
+        total=len(results),
+        total_deduct=sum(r.get("deduct") or 0 for r in results),
+        results=results,
+    )
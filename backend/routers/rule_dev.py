@@ -2,15 +2,18 @@
 规则开发工具接口
 用于编写、测试规则，测试通过后再导入到系统
 """
+import asyncio
+
 from fastapi import APIRouter, HTTPException, status, Depends
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Any, Dict, Optional
 from sqlalchemy.orm import Session
 
 from ruleengine.core.engine import RuleEngine
+from ruleengine.core.profiling import function_stats, profile_rule
 from db import get_db
 from services.rule_service import create_rule
-from schemas.rule import RuleOut
+from schemas.rule import EvidenceLevel, RuleOut
 
 router = APIRouter(prefix="/rule-dev", tags=["rule-dev"])
 
@@ -19,6 +22,11 @@ class TestRuleRequest(BaseModel):
     """测试规则请求"""
     rule_config: Dict[str, Any]  # 完整的规则配置
     medical_record: Dict[str, Any]  # 测试用的病历数据
+    evidence_level: Optional[EvidenceLevel] = None  # 证据级别，未指定时沿用规则配置
+    timings: bool = False  # 是否返回逐节点耗时明细
+    profile: bool = False  # 是否剖析规则执行（cProfile 热点函数 + 采样折叠栈）
+    profile_runs: int = Field(20, ge=1, le=1000)  # 剖析时的执行次数
+    profile_top: int = Field(30, ge=1, le=200)  # 返回的热点函数个数
 
 
 class TestRuleResponse(BaseModel):
@@ -30,6 +38,8 @@ class TestRuleResponse(BaseModel):
     answer: Dict[str, Any]
     error: Optional[str] = None
     duration_ms: int
+    timings: Optional[Dict[str, Any]] = None  # 逐节点耗时明细（请求 timings=true 时）
+    profile: Optional[Dict[str, Any]] = None  # 剖析结果（请求 profile=true 且规则执行成功时），见 profile_rule
 
 
 class ImportRuleRequest(BaseModel):
@@ -45,18 +55,35 @@ class ImportRuleRequest(BaseModel):
 
 
 @router.post("/test", response_model=TestRuleResponse)
-def test_rule(req: TestRuleRequest):
+async def test_rule(req: TestRuleRequest):
     """
     测试规则（不保存到数据库）
     
-    用于在导入规则前测试规则配置是否正确
+    用于在导入规则前测试规则配置是否正确。
+    profile=true 时另外将规则执行 profile_runs 次进行剖析，返回按累计耗时排序的热点函数
+    与折叠栈（collapsed 字段，保存为文件后可用 flamegraph.pl / speedscope 生成火焰图）；
+    剖析在线程中进行，不阻塞事件循环
     """
     try:
         # 创建规则引擎
         engine = RuleEngine(req.rule_config)
         
         # 执行规则
-        result = engine.execute(req.medical_record)
+        result = await engine.execute_async(
+            req.medical_record, evidence_level=req.evidence_level, timings=req.timings
+        )
+        
+        profile = None
+        if req.profile and result.get("flag") != -1:
+            # 顺序执行：所有节点在剖析线程中运行，cProfile 与采样都能观察到
+            profile = await asyncio.to_thread(
+                profile_rule,
+                RuleEngine(req.rule_config, concurrent=False),
+                req.medical_record,
+                runs=req.profile_runs,
+                top=req.profile_top,
+                evidence_level=req.evidence_level,
+            )
         
         return TestRuleResponse(
             success=True,
@@ -64,7 +91,9 @@ def test_rule(req: TestRuleRequest):
             flag=result.get("flag", -1),
             explanation=result.get("explanation", ""),
             answer=result.get("answer", {}),
-            duration_ms=result.get("duration_ms", 0)
+            duration_ms=result.get("duration_ms", 0),
+            timings=result.get("timings"),
+            profile=profile,
         )
     except Exception as e:
         return TestRuleResponse(
@@ -77,6 +106,17 @@ def test_rule(req: TestRuleRequest):
         )
 
 
+@router.get("/function-stats")
+def get_function_stats():
+    """
+    各原子函数的累计耗时（本进程启动以来）
+    
+    返回 {函数名: {count, errors, mean_ms, p95_ms, max_ms}}，p95 取最近 1024 次调用；
+    用于定位规则执行中的慢函数
+    """
+    return function_stats.snapshot()
+
+
 @router.post("/import", response_model=RuleOut, status_code=status.HTTP_201_CREATED)
 def import_rule(req: ImportRuleRequest, db: Session = Depends(get_db)):
     """
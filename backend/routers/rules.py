@@ -31,7 +31,10 @@ def api_get_rule(rule_id: int, db: Session = Depends(get_db)):
 
 @router.post("/", response_model=RuleOut, status_code=status.HTTP_201_CREATED)
 def api_create_rule(payload: RuleCreate, db: Session = Depends(get_db)):
-    return create_rule(db, payload)
+    try:
+        return create_rule(db, payload)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @router.put("/{rule_id}", response_model=RuleOut)
@@ -47,7 +50,10 @@ def api_update_rule(rule_id: int, payload: RuleUpdate, db: Session = Depends(get
 
 @router.post("/{rule_id}/publish", response_model=RuleOut)
 def api_publish_rule(rule_id: int, db: Session = Depends(get_db)):
-    rule = publish_rule(db, rule_id)
+    try:
+        rule = publish_rule(db, rule_id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     if not rule:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rule not found")
     return rule
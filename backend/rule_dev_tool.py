@@ -3,7 +3,11 @@
 用于编写、测试规则，测试通过后生成导入用的JSON
 """
 import json
+import time
+from ruleengine import functions  # noqa: F401  确保函数注册
+from ruleengine.batch_runner import ProcessBatchRunner
 from ruleengine.core.engine import RuleEngine
+from ruleengine.core.profiling import profile_rule
 from ruleengine.registry import get_registered_functions
 
 
@@ -34,32 +38,23 @@ def print_available_functions():
                 print(f"    输入: {', '.join([inp.get('name', '') for inp in inputs])}")
 
 
-def test_rule(rule_config_path: str, medical_record_path: str = None):
-    """
-    测试规则配置
-    
-    Args:
-        rule_config_path: 规则配置JSON文件路径
-        medical_record_path: 测试病历JSON文件路径（可选）
-    """
-    # 读取规则配置
+def _load_test_inputs(rule_config_path: str, medical_record_path: str = None):
+    """读取规则配置与测试病历（未提供病历时使用默认病历）；读取失败时返回 (None, None)"""
     try:
         with open(rule_config_path, 'r', encoding='utf-8') as f:
             rule_config = json.load(f)
     except Exception as e:
         print(f"❌ 读取规则配置失败: {e}")
-        return False
-    
-    # 读取测试病历
+        return None, None
+
     if medical_record_path:
         try:
             with open(medical_record_path, 'r', encoding='utf-8') as f:
                 medical_record = json.load(f)
         except Exception as e:
             print(f"❌ 读取测试病历失败: {e}")
-            return False
+            return None, None
     else:
-        # 使用默认测试病历
         medical_record = {
             "入院记录": {
                 "主诉": "患者因头痛3天入院",
@@ -67,6 +62,20 @@ def test_rule(rule_config_path: str, medical_record_path: str = None):
             }
         }
         print("⚠️  使用默认测试病历")
+    return rule_config, medical_record
+
+
+def test_rule(rule_config_path: str, medical_record_path: str = None):
+    """
+    测试规则配置
+    
+    Args:
+        rule_config_path: 规则配置JSON文件路径
+        medical_record_path: 测试病历JSON文件路径（可选）
+    """
+    rule_config, medical_record = _load_test_inputs(rule_config_path, medical_record_path)
+    if rule_config is None:
+        return False
     
     # 执行测试
     print("\n" + "=" * 60)
@@ -75,15 +84,16 @@ def test_rule(rule_config_path: str, medical_record_path: str = None):
     
     try:
         engine = RuleEngine(rule_config)
-        result = engine.execute(medical_record)
+        result = engine.execute(medical_record, timings=True)
         
         print(f"\n✅ 规则执行成功")
         print(f"规则ID: {result.get('rule_id')}")
         print(f"规则名称: {result.get('rule_name')}")
         print(f"是否通过: {result.get('passed')}")
-        print(f"状态标志: {result.get('flag')} (1=通过, 0=不通过, -1=错误)")
+        print(f"状态标志: {result.get('flag')} (1=通过, 0=不通过, 2=跳过, -1=错误)")
         print(f"解释: {result.get('explanation')}")
         print(f"执行耗时: {result.get('duration_ms', 0)}ms")
+        _print_timings(result.get("timings"))
         print(f"\n证据数据:")
         print(json.dumps(result.get('answer', {}), ensure_ascii=False, indent=2))
         
@@ -101,6 +111,162 @@ def test_rule(rule_config_path: str, medical_record_path: str = None):
         return False
 
 
+def _print_timings(timings: dict):
+    """打印逐节点耗时明细"""
+    if not timings:
+        return
+    print(f"\n节点耗时（总计 {timings['total_ms']:.3f}ms）:")
+    for item in timings["nodes"]:
+        note = "（共享缓存）" if item["cached"] else ""
+        if item.get("error"):
+            note = f"（出错: {item['error']}）"
+        print(f"  节点 {item['node_id']:<4} {item['function']:<28} {item['duration_ms']:>10.3f}ms  "
+              f"输入 {item['input_size']}  输出 {item['output_size']}{note}")
+
+
+def profile_test(
+    rule_config_path: str,
+    medical_record_path: str = None,
+    runs: int = None,
+    top: int = None,
+    collapsed_path: str = None,
+):
+    """
+    剖析规则执行：打印按累计耗时排序的热点函数，并可保存折叠栈用于生成火焰图
+
+    Args:
+        rule_config_path: 规则配置JSON文件路径
+        medical_record_path: 测试病历JSON文件路径（可选）
+        runs: 执行次数（默认 20）
+        top: 打印的函数个数（默认 30）
+        collapsed_path: 折叠栈输出路径（可选），如 rule.folded；
+            之后可执行 flamegraph.pl rule.folded > rule.svg，或导入 speedscope
+    """
+    rule_config, medical_record = _load_test_inputs(rule_config_path, medical_record_path)
+    if rule_config is None:
+        return False
+
+    try:
+        # 顺序执行：所有节点在当前线程中运行，剖析结果完整
+        engine = RuleEngine(rule_config, concurrent=False)
+        result = engine.execute(medical_record)
+        if result.get("flag") == -1:
+            print(f"❌ 规则执行出错: {result.get('explanation')}")
+            return False
+        report = profile_rule(engine, medical_record, runs=runs or 20, top=top or 30)
+    except Exception as e:
+        print(f"❌ 剖析失败: {e}")
+        return False
+
+    print(f"\n执行 {report['runs']} 次，平均耗时 {report['mean_ms']:.3f}ms（不含剖析开销）")
+    print(f"\n热点函数（按累计耗时，{report['runs']} 次合计）:")
+    print(f"  {'累计ms':>10} {'每次ms':>10} {'自身ms':>10} {'调用次数':>10}  函数")
+    for item in report["top_functions"]:
+        print(f"  {item['cumtime_ms']:>10.3f} {item['cumtime_per_run_ms']:>10.3f} {item['tottime_ms']:>10.3f} "
+              f"{item['calls']:>10}  {item['function']} ({item['location']})")
+
+    print(f"\n采样: {report['samples']} 个样本（执行 {report['sample_runs']} 次，"
+          f"间隔 {report['sample_interval_ms']}ms）")
+    if collapsed_path:
+        with open(collapsed_path, 'w', encoding='utf-8') as f:
+            f.write(report["collapsed"])
+        print(f"折叠栈已保存到: {collapsed_path}（flamegraph.pl {collapsed_path} > flame.svg）")
+    return True
+
+
+def _read_jsonl_records(records_path: str):
+    """
+    逐行读取 JSONL 病历文件
+
+    每行可以是病历字典本身，也可以是 {"medical_id": ..., "medical_record": {...}}
+
+    Yields:
+        (medical_id, medical_record)
+    """
+    with open(records_path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if isinstance(item, dict) and "medical_record" in item:
+                yield item.get("medical_id") or str(line_no), item["medical_record"]
+            else:
+                yield str(line_no), item
+
+
+def batch_test(
+    rule_config_path: str,
+    records_path: str,
+    output_path: str = None,
+    workers: int = None,
+    chunk_size: int = None,
+):
+    """
+    使用进程池对 JSONL 病历文件批量执行规则
+
+    Args:
+        rule_config_path: 规则配置JSON文件路径
+        records_path: 病历 JSONL 文件路径
+        output_path: 结果 JSONL 输出路径（可选）
+        workers: 进程数（默认 CPU 核数）
+        chunk_size: 每个任务携带的病历数
+    """
+    try:
+        with open(rule_config_path, 'r', encoding='utf-8') as f:
+            rule_config = json.load(f)
+    except Exception as e:
+        print(f"❌ 读取规则配置失败: {e}")
+        return False
+
+    medical_ids = []
+
+    def records():
+        for medical_id, medical_record in _read_jsonl_records(records_path):
+            medical_ids.append(medical_id)
+            yield medical_record
+
+    out = open(output_path, 'w', encoding='utf-8') if output_path else None
+    flags = {}
+    total = 0
+    start = time.time()
+    try:
+        with ProcessBatchRunner(max_workers=workers, chunk_size=chunk_size) as runner:
+            print(f"开始批量执行（进程数: {runner.max_workers}，分块大小: {runner.chunk_size}）...")
+            for result in runner.iter_execute(rule_config, records()):
+                flag = result.get("flag")
+                flags[flag] = flags.get(flag, 0) + 1
+                if out:
+                    result["medical_id"] = medical_ids[total]
+                    out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                total += 1
+    except Exception as e:
+        print(f"❌ 批量执行失败: {e}")
+        return False
+    finally:
+        if out:
+            out.close()
+
+    elapsed = time.time() - start
+    print(f"\n✅ 批量执行完成：{total} 份病历，耗时 {elapsed:.2f}s，"
+          f"吞吐 {total / elapsed if elapsed > 0 else 0:.0f} 份/秒")
+    print(f"结果分布: 通过 {flags.get(1, 0)}，不通过 {flags.get(0, 0)}，"
+          f"跳过 {flags.get(2, 0)}，错误 {flags.get(-1, 0)}")
+    if output_path:
+        print(f"结果已保存到: {output_path}")
+    return flags.get(-1, 0) == 0
+
+
+def _pop_int_option(args: list, name: str):
+    """从参数列表中取出 --name N 形式的整数选项"""
+    if name in args:
+        index = args.index(name)
+        value = int(args[index + 1])
+        del args[index:index + 2]
+        return value
+    return None
+
+
 def generate_import_json(rule_config_path: str, output_path: str = None):
     """
     生成导入用的JSON（用于API调用）
@@ -202,6 +368,10 @@ if __name__ == "__main__":
         print("  python rule_dev_tool.py template [output.json]  # 创建规则模板")
         print("  python rule_dev_tool.py test <rule.json> [medical.json]  # 测试规则")
         print("  python rule_dev_tool.py import <rule.json> [output.json]  # 生成导入JSON")
+        print("  python rule_dev_tool.py batch <rule.json> <records.jsonl> [output.jsonl] [--workers N] [--chunk-size N]")
+        print("                                                  # 进程池批量执行")
+        print("  python rule_dev_tool.py profile <rule.json> [medical.json] [--runs N] [--top N] [--collapsed out.folded]")
+        print("                                                  # 剖析规则执行（热点函数 + 火焰图折叠栈）")
         sys.exit(1)
     
     command = sys.argv[1]
@@ -225,6 +395,31 @@ if __name__ == "__main__":
         rule_file = sys.argv[2]
         output_file = sys.argv[3] if len(sys.argv) > 3 else None
         generate_import_json(rule_file, output_file)
+    elif command == "batch":
+        args = sys.argv[2:]
+        workers = _pop_int_option(args, "--workers")
+        chunk_size = _pop_int_option(args, "--chunk-size")
+        if len(args) < 2:
+            print("❌ 请提供规则配置文件和病历 JSONL 文件路径")
+            sys.exit(1)
+        output_file = args[2] if len(args) > 2 else None
+        ok = batch_test(args[0], args[1], output_file, workers, chunk_size)
+        sys.exit(0 if ok else 1)
+    elif command == "profile":
+        args = sys.argv[2:]
+        runs = _pop_int_option(args, "--runs")
+        top = _pop_int_option(args, "--top")
+        collapsed_file = None
+        if "--collapsed" in args:
+            index = args.index("--collapsed")
+            collapsed_file = args[index + 1]
+            del args[index:index + 2]
+        if len(args) < 1:
+            print("❌ 请提供规则配置文件路径")
+            sys.exit(1)
+        medical_file = args[1] if len(args) > 1 else None
+        ok = profile_test(args[0], medical_file, runs, top, collapsed_file)
+        sys.exit(0 if ok else 1)
     else:
         print(f"❌ 未知命令: {command}")
 
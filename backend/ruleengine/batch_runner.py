@@ -0,0 +1,212 @@
+"""
+进程池批量执行器
+用于 CPU 密集型规则（正则、字符统计等）的大批量病历质控，突破单进程 GIL 限制
+"""
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional
+import collections
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+
+from config import get_settings
+
+
+def _init_worker():
+    """工作进程初始化：导入函数库，完成函数注册；LLM 调用走批量通道（每个进程只执行一次）"""
+    from ruleengine import functions  # noqa: F401
+    from ruleengine.llm.limiter import LANE_BATCH, current_lane
+
+    current_lane.set(LANE_BATCH)
+
+
+def _counted(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """工作进程的指标不在主进程暴露，结果回到主进程后按 flag 计入规则执行次数"""
+    from ruleengine.core.engine import record_rule_execution
+
+    for result in results:
+        record_rule_execution(result.get("flag"))
+    return results
+
+
+def _execute_chunk(
+    rule_id: Hashable,
+    version: int,
+    rule_config: Dict[str, Any],
+    medical_records: List[Dict[str, Any]],
+    evidence_level: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    在工作进程中执行一批病历
+
+    执行计划通过 get_cached_plan 按 (规则ID, 版本) 缓存在工作进程内，同一规则每个进程只编译一次，
+    规则发布新版本后旧版本的计划被替换；进程本身已并行，节点按顺序执行，不再占用节点线程池
+    """
+    from ruleengine.core.engine import RuleEngine
+    from ruleengine.core.plan import get_cached_plan
+
+    plan = get_cached_plan(rule_id, version, rule_config)
+    return RuleEngine.from_plan(plan, concurrent=False).execute_many(medical_records, evidence_level)
+
+
+def _chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _config_key(rule_config: Dict[str, Any]) -> str:
+    """未指定规则ID时，以配置内容的摘要代替规则ID作为工作进程内的计划缓存键"""
+    payload = json.dumps(rule_config, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class ProcessBatchRunner:
+    """
+    进程池批量执行器
+
+    设计思路：
+    1. 进程池长期复用，工作进程启动时导入函数注册表；进程池在服务进程中按需创建，
+       此时规则缓存同步、执行记录写入、节点线程池、HTTP 连接池等线程已在运行，
+       因此以 spawn（或 forkserver）启动工作进程，避免 fork 继承被其他线程持有的锁而死锁
+    2. 执行计划在每个工作进程内按规则缓存，只编译一次
+    3. 病历按 chunk_size 分块提交，摊薄序列化（pickle）和进程间通信开销
+    4. 在途任务数有上限，输入可以是生成器（如逐行读取的 JSONL），内存占用与总量无关
+    5. 结果顺序与输入顺序一致
+
+    使用示例：
+        with ProcessBatchRunner(max_workers=8) as runner:
+            for result in runner.iter_execute(rule_config, records):
+                ...
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        start_method: Optional[str] = None,
+    ):
+        """
+        Args:
+            max_workers: 工作进程数，默认取 Settings.PROCESS_POOL_WORKERS（<=0 时为 CPU 核数）
+            chunk_size: 每个任务携带的病历数，默认取 Settings.PROCESS_CHUNK_SIZE
+            start_method: 工作进程启动方式（spawn / forkserver），默认取 Settings.PROCESS_START_METHOD
+
+        Raises:
+            ValueError: 启动方式为 fork 或当前平台不支持
+        """
+        settings = get_settings()
+        if max_workers is None or max_workers <= 0:
+            max_workers = settings.PROCESS_POOL_WORKERS
+        if max_workers <= 0:
+            max_workers = os.cpu_count() or 1
+        self.max_workers = max_workers
+        self.chunk_size = max(1, chunk_size or settings.PROCESS_CHUNK_SIZE)
+        self.start_method = start_method or settings.PROCESS_START_METHOD
+        if self.start_method == "fork":
+            raise ValueError("进程池不支持 fork 启动方式（服务进程中已有后台线程），请使用 spawn 或 forkserver")
+        self._mp_context = multiprocessing.get_context(self.start_method)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=self._mp_context,
+                        initializer=_init_worker,
+                    )
+        return self._executor
+
+    def iter_execute(
+        self,
+        rule_config: Dict[str, Any],
+        medical_records: Iterable[Dict[str, Any]],
+        rule_id: Optional[Hashable] = None,
+        version: int = 0,
+        evidence_level: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        分块提交到进程池执行，按输入顺序逐条产出结果
+
+        Args:
+            rule_config: 规则配置字典
+            medical_records: 病历序列（可以是生成器）
+            rule_id: 规则ID（数据库主键），与 version 一起作为工作进程内的计划缓存键；
+                默认使用配置摘要（配置变化即视为不同规则，旧计划不会被替换）
+            version: 规则版本号；同一规则的新版本替换工作进程内缓存的旧版本计划
+            evidence_level: 证据级别（见 RuleEngine.execute）
+
+        Yields:
+            质控结果字典（与 RuleEngine.execute 相同）
+        """
+        if rule_id is None:
+            rule_id = _config_key(rule_config)
+        executor = self._get_executor()
+        # 在途任务上限：保持每个进程都有活可干，同时限制内存中的待处理病历数
+        max_in_flight = self.max_workers * 2
+        in_flight: "collections.deque[Future]" = collections.deque()
+
+        for chunk in _chunked(medical_records, self.chunk_size):
+            in_flight.append(executor.submit(_execute_chunk, rule_id, version, rule_config, chunk, evidence_level))
+            if len(in_flight) >= max_in_flight:
+                yield from _counted(in_flight.popleft().result())
+
+        while in_flight:
+            yield from _counted(in_flight.popleft().result())
+
+    def execute_many(
+        self,
+        rule_config: Dict[str, Any],
+        medical_records: Iterable[Dict[str, Any]],
+        rule_id: Optional[Hashable] = None,
+        version: int = 0,
+        evidence_level: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """分块并行执行，返回与输入顺序一致的结果列表（参数同 iter_execute）"""
+        return list(self.iter_execute(rule_config, medical_records, rule_id, version, evidence_level))
+
+    def shutdown(self, wait: bool = True):
+        """关闭进程池"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+    def __enter__(self) -> "ProcessBatchRunner":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+
+_shared_runner: Optional[ProcessBatchRunner] = None
+_shared_runner_lock = threading.Lock()
+
+
+def get_process_runner() -> ProcessBatchRunner:
+    """获取进程内共享的批量执行器（供 API 使用，进程池跨请求复用）"""
+    global _shared_runner
+    if _shared_runner is None:
+        with _shared_runner_lock:
+            if _shared_runner is None:
+                _shared_runner = ProcessBatchRunner()
+    return _shared_runner
+
+
+def shutdown_process_runner():
+    """关闭共享批量执行器（应用退出时调用）"""
+    global _shared_runner
+    with _shared_runner_lock:
+        if _shared_runner is not None:
+            _shared_runner.shutdown()
+            _shared_runner = None
@@ -5,6 +5,15 @@
 from ruleengine.core.engine import RuleEngine
 from ruleengine.core.context import ExecutionContext
 from ruleengine.core.evaluator import ResultEvaluator
+from ruleengine.core.plan import ExecutionPlan, compile_plan, get_cached_plan, invalidate_plan
 
-__all__ = ["RuleEngine", "ExecutionContext", "ResultEvaluator"]
+__all__ = [
+    "RuleEngine",
+    "ExecutionContext",
+    "ResultEvaluator",
+    "ExecutionPlan",
+    "compile_plan",
+    "get_cached_plan",
+    "invalidate_plan",
+]
 
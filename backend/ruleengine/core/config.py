@@ -36,6 +36,10 @@ class RuleConfig:
         if "nodes" not in function_list:
             raise ValueError("function_list 必须包含 nodes")
     
+    def to_dict(self) -> Dict[str, Any]:
+        """获取原始配置字典（只读使用，不要修改）"""
+        return self._config
+    
     @property
     def rule_id(self) -> str:
         return self._config.get("rule_id", "")
@@ -64,6 +68,16 @@ class RuleConfig:
     def deduct(self) -> int:
         return self._config.get("deduct", 0)
     
+    @property
+    def evidence_level(self) -> Optional[str]:
+        """规则级证据级别（见 ruleengine.core.evidence），未配置为 None"""
+        return self._config.get("evidence_level")
+    
+    @property
+    def evidence_max_length(self) -> Optional[int]:
+        """规则级证据截断长度，未配置为 None"""
+        return self._config.get("evidence_max_length")
+    
     def get_nodes(self) -> List[Dict[str, Any]]:
         """获取节点列表，按 id 排序"""
         nodes = self._config["function_list"]["nodes"]
@@ -83,6 +97,10 @@ class RuleConfig:
                 skip_conds[key] = value
         return skip_conds
     
+    def get_explanation_templates(self) -> Dict[str, str]:
+        """获取全部解释模板 {状态: 模板}"""
+        return self._config["function_list"].get("explanation_template", {})
+    
     def get_explanation_template(self, status: str) -> Optional[str]:
         """
         获取解释模板
@@ -5,6 +5,8 @@
 from typing import Any, Dict, List, Optional, Union
 import json
 
+from ruleengine.core.record_index import RecordIndex
+
 
 class ExecutionContext:
     """
@@ -16,15 +18,23 @@ class ExecutionContext:
     3. 提供证据提取接口
     """
     
-    def __init__(self):
+    def __init__(self, shared_cache: Optional[Dict[Any, Any]] = None):
+        """
+        Args:
+            shared_cache: 同一病历上多条规则共享的节点结果缓存（可选）
+        """
+        self.shared_cache = shared_cache
         self.medical_record: Optional[Dict[str, Any]] = None
+        self.record_index: Optional[RecordIndex] = None  # 病历字段索引，见 get_record_index
         self.node_outputs: Dict[str, Dict[str, Any]] = {}  # {node_id: {output_name: value}}
         self.skip_reason: Optional[str] = None
+        self.node_timings: Optional[List[Dict[str, Any]]] = None  # 逐节点耗时明细，None 表示不收集
         self.metadata: Dict[str, Any] = {}  # 可扩展的元数据
     
     def set_medical_record(self, record: Dict[str, Any]):
         """设置病历数据"""
         self.medical_record = record
+        self.record_index = None
     
     def get_medical_record(self) -> Optional[Dict[str, Any]]:
         """获取病历数据"""
@@ -34,6 +44,21 @@ class ExecutionContext:
         """检查是否有病历数据"""
         return self.medical_record is not None
     
+    def get_record_index(self) -> RecordIndex:
+        """
+        获取当前病历的字段索引（首次调用时创建）
+        
+        有 shared_cache（其本身即按病历划分）时索引存放其中，同一病历的多条规则共用一个索引
+        """
+        if self.record_index is None:
+            if self.shared_cache is not None:
+                self.record_index = self.shared_cache.get(RecordIndex)
+                if self.record_index is None:
+                    self.record_index = self.shared_cache.setdefault(RecordIndex, RecordIndex(self.medical_record))
+            else:
+                self.record_index = RecordIndex(self.medical_record)
+        return self.record_index
+    
     def set_node_output(self, node_id: str, outputs: Dict[str, Any]):
         """
         保存节点输出
@@ -108,6 +133,8 @@ class ExecutionContext:
         Returns:
             引用的值
         """
+        # 节点输出以字符串 id 保存，配置中的 source 可能是整数
+        source_id = str(source_id)
         if source_id not in self.node_outputs:
             raise RuntimeError(f"节点 {source_id} 尚未执行或不存在")
         
@@ -117,12 +144,15 @@ class ExecutionContext:
         
         return node_output[output_key]
     
-    def extract_evidence(self) -> Dict[str, Any]:
+    def extract_evidence(self, max_length: Optional[int] = 100) -> Dict[str, Any]:
         """
         提取执行证据
         
         用于生成质控报告，包含关键节点输出
         
+        Args:
+            max_length: 长字符串截断长度；None 表示不截断
+        
         Returns:
             证据字典
         """
@@ -131,8 +161,8 @@ class ExecutionContext:
         for node_id, outputs in self.node_outputs.items():
             for key, value in outputs.items():
                 # 处理长字符串（截断）
-                if isinstance(value, str) and len(value) > 100:
-                    value = value[:100] + "..."
+                if max_length is not None and isinstance(value, str) and len(value) > max_length:
+                    value = value[:max_length] + "..."
                 
                 evidence[f"node_{node_id}.{key}"] = value
         
@@ -2,14 +2,54 @@
 规则执行引擎
 负责解析规则配置、按流程执行节点、管理执行上下文
 """
-from typing import Any, Dict, List, Optional
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Dict, Iterable, List, Optional, Set, Tuple, Union
+import asyncio
+import contextvars
+import functools
+from config import get_settings
+from metrics import FUNCTION_BUCKETS, registry
 from ruleengine.core.context import ExecutionContext
 from ruleengine.core.evaluator import ResultEvaluator
-from ruleengine.core.config import RuleConfig
-from ruleengine.registry import function_registry
+from ruleengine.core.evidence import EVIDENCE_FULL, evidence_required, validate_evidence_level
+from ruleengine.core.plan import CompiledNode, ExecutionPlan, compile_plan, make_shared_key
+from ruleengine.core.profiling import function_stats, node_timing, order_timings, params_size, recording_enabled
+from ruleengine.core.scheduler import get_executor
 import time
 
 
+# 节点结果未命中共享缓存的标记
+_MISSING = object()
+
+RULE_EXECUTIONS = registry.counter("qc_rule_executions_total", "规则执行次数（按结果 flag）", ("flag",))
+FUNCTION_SECONDS = registry.histogram(
+    "qc_function_duration_seconds", "原子函数调用耗时（秒）", ("function",), buckets=FUNCTION_BUCKETS
+)
+# flag -> 预建的计数器子对象：1=通过, 0=不通过, 2=跳过, -1=错误
+_FLAG_COUNTERS = {
+    flag: RULE_EXECUTIONS.labels(label)
+    for flag, label in ((1, "pass"), (0, "fail"), (2, "skip"), (-1, "error"))
+}
+
+
+def record_rule_execution(flag: int):
+    """计入一次规则执行（进程池批量执行的结果由主进程调用计入）"""
+    counter = _FLAG_COUNTERS.get(flag)
+    if counter is not None:
+        counter.inc()
+
+
+def _run_coroutine_sync(coro: Awaitable) -> Any:
+    """在同步调用路径中运行协程函数节点"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # 当前线程已有运行中的事件循环（同步接口在协程中被调用），转到独立线程运行
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
 class RuleEngine:
     """
     规则执行引擎
@@ -21,23 +61,47 @@ class RuleEngine:
     4. 统一的错误处理和结果格式化
     """
     
-    def __init__(self, rule_config: Dict[str, Any]):
+    def __init__(self, rule_config: Union[Dict[str, Any], ExecutionPlan], concurrent: bool = True):
         """
         初始化规则引擎
         
         Args:
-            rule_config: 规则配置字典，包含规则元数据和执行流程
+            rule_config: 规则配置字典，或已编译的执行计划（见 get_cached_plan）
+            concurrent: 是否允许并发执行相互独立的阻塞节点；False 时严格按 id 顺序执行
         """
-        self.config = RuleConfig(rule_config)
+        if isinstance(rule_config, ExecutionPlan):
+            self.plan = rule_config
+        else:
+            self.plan = compile_plan(rule_config)
+        self.config = self.plan.config
+        self.concurrent = concurrent
         self.context = ExecutionContext()
-        self.evaluator = ResultEvaluator(self.config)
+        self.evaluator = ResultEvaluator(self.config, self.plan.templates)
+    
+    @classmethod
+    def from_plan(cls, plan: ExecutionPlan, concurrent: bool = True) -> "RuleEngine":
+        """基于已编译（通常已缓存）的执行计划创建引擎"""
+        return cls(plan, concurrent=concurrent)
         
-    def execute(self, medical_record: Dict[str, Any]) -> Dict[str, Any]:
+    def execute(
+        self,
+        medical_record: Dict[str, Any],
+        shared_cache: Optional[Dict[Any, Any]] = None,
+        evidence_level: Optional[str] = None,
+        timings: bool = False,
+    ) -> Dict[str, Any]:
         """
         执行规则，对病历进行质控检查
         
         Args:
             medical_record: 病历数据字典
+            shared_cache: 同一病历上多条规则共享的节点结果缓存（可选）。
+                对同一病历执行多条规则时传入同一个字典，纯函数节点
+                （函数相同、解析后参数相同）只计算一次；
+                不同病历之间不能复用
+            evidence_level: 本次执行的证据级别（none / fail_only / summary / full），
+                优先于规则配置的 evidence_level 与 Settings.EVIDENCE_LEVEL
+            timings: 是否在结果中返回逐节点耗时明细（timings 字段）
             
         Returns:
             质控结果字典，包含：
@@ -46,10 +110,16 @@ class RuleEngine:
             - flag: 状态标志（1=通过, 0=不通过, 2=跳过, -1=错误）
             - deduct: 扣分
             - explanation: 解释说明
-            - answer: 证据数据
+            - answer: 证据数据（按证据级别提取，不需要时为空字典）
+            - timings: 逐节点耗时明细（仅 timings=True 时），见 _build_timings
         """
         start_time = time.time()
         
+        # 每次执行使用独立的上下文，同一引擎可重复执行
+        self.context = ExecutionContext(shared_cache)
+        if timings:
+            self.context.node_timings = []
+        
         try:
             # 1. 初始化执行上下文
             self.context.set_medical_record(medical_record)
@@ -57,58 +127,189 @@ class RuleEngine:
             # 2. 执行规则节点流程
             self._execute_nodes()
             
-            # 3. 评估最终结果
-            passed = self.evaluator.evaluate(self.context)
-            
-            # 4. 生成解释文本
-            explanation = self.evaluator.render_explanation(self.context, passed)
-            
-            # 5. 提取证据
-            evidence = self.context.extract_evidence()
-            
-            # 6. 计算执行耗时
-            duration_ms = int((time.time() - start_time) * 1000)
-            
-            # 7. 构建返回结果
-            return {
-                "rule_id": self.config.rule_id,
-                "rule_name": self.config.rule_name,
-                "description": self.config.description,
-                "module": self.config.module,
-                "type": self.config.type,
-                "fields_name": self.config.fields_name,
-                "passed": passed,
-                "flag": 1 if passed else 0,
-                "conclusion": "符合" if passed else "不符合",
-                "answer": evidence,
-                "explanation": explanation,
-                "deduct": 0 if passed else self.config.deduct,
-                "duration_ms": duration_ms
-            }
+            # 3~7. 评估结果、生成解释、提取证据并构建返回结果
+            return self._build_result(start_time, evidence_level)
             
         except Exception as e:
             # 错误处理
-            return {
-                "rule_id": self.config.rule_id,
-                "rule_name": self.config.rule_name,
-                "description": self.config.description,
-                "module": self.config.module,
-                "type": self.config.type,
-                "fields_name": self.config.fields_name,
-                "passed": False,
-                "flag": -1,
-                "conclusion": "系统错误",
-                "answer": {"error": str(e)},
-                "explanation": f"【系统错误】规则执行失败：{str(e)}",
-                "deduct": 0,
-                "duration_ms": int((time.time() - start_time) * 1000)
-            }
+            return self._build_error_result(e, start_time)
+    
+    async def execute_async(
+        self,
+        medical_record: Dict[str, Any],
+        shared_cache: Optional[Dict[Any, Any]] = None,
+        evidence_level: Optional[str] = None,
+        timings: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        异步执行规则（参数与返回值同 execute）
+        
+        协程函数节点在事件循环中直接 await；相互独立的节点以任务形式并发等待。
+        同步的纯函数节点输入规模不超过 ENGINE_ASYNC_INLINE_MAX_SIZE 时直接在事件循环中执行
+        （计算量小、无 I/O）；输入规模更大的纯函数节点与其余同步节点转到节点线程池执行，避免阻塞事件循环
+        
+        注意：同一引擎实例不能并发调用 execute_async（上下文保存在实例上），
+        并发执行请为每个任务创建引擎，或使用 execute_many_async
+        """
+        start_time = time.time()
+        self.context = ExecutionContext(shared_cache)
+        if timings:
+            self.context.node_timings = []
+        
+        try:
+            self.context.set_medical_record(medical_record)
+            await self._execute_nodes_async()
+            return self._build_result(start_time, evidence_level)
+        except Exception as e:
+            return self._build_error_result(e, start_time)
+    
+    def _evidence_settings(self, evidence_level: Optional[str]) -> Tuple[str, int]:
+        """确定证据级别与截断长度：请求参数 > 规则配置 > Settings"""
+        settings = get_settings()
+        level = (
+            validate_evidence_level(evidence_level)
+            or self.config.evidence_level
+            or validate_evidence_level(settings.EVIDENCE_LEVEL)
+        )
+        max_length = self.config.evidence_max_length or settings.EVIDENCE_MAX_LENGTH
+        return level, max_length
+    
+    def _build_result(self, start_time: float, evidence_level: Optional[str] = None) -> Dict[str, Any]:
+        """根据执行上下文构建质控结果"""
+        # 3. 评估最终结果
+        passed = self.evaluator.evaluate(self.context)
+        
+        # 4. 生成解释文本
+        explanation = self.evaluator.render_explanation(self.context, passed)
+        
+        # 5. 按证据级别提取证据：不需要时（如 fail_only 下通过的结果）不遍历节点输出
+        level, max_length = self._evidence_settings(evidence_level)
+        if evidence_required(level, passed):
+            evidence = self.context.extract_evidence(None if level == EVIDENCE_FULL else max_length)
+        else:
+            evidence = {}
+        
+        # 6. 计算执行耗时
+        duration_ms = int((time.time() - start_time) * 1000)
+        
+        # 7. 构建返回结果（passed 为 None 表示被跳过）
+        skipped = passed is None
+        flag = 2 if skipped else (1 if passed else 0)
+        if recording_enabled():
+            _FLAG_COUNTERS[flag].inc()
+        result = {
+            "rule_id": self.config.rule_id,
+            "rule_name": self.config.rule_name,
+            "description": self.config.description,
+            "module": self.config.module,
+            "type": self.config.type,
+            "fields_name": self.config.fields_name,
+            "passed": passed,
+            "flag": flag,
+            "conclusion": "不适用" if skipped else ("符合" if passed else "不符合"),
+            "answer": evidence,
+            "explanation": explanation,
+            "deduct": 0 if passed or skipped else self.config.deduct,
+            "duration_ms": duration_ms
+        }
+        if self.context.node_timings is not None:
+            result["timings"] = self._build_timings(start_time)
+        return result
+    
+    def _build_timings(self, start_time: float) -> Dict[str, Any]:
+        """
+        逐节点耗时明细
+        
+        Returns:
+            {"total_ms": 本次执行总耗时, "nodes_ms": 各节点耗时之和（并发执行时可大于总耗时）,
+             "nodes": [{node_id, function, duration_ms, input_size, output_size, cached[, error]}]}
+        """
+        nodes = order_timings(self.context.node_timings, [node.node_id for node in self.plan.nodes])
+        return {
+            "total_ms": round((time.time() - start_time) * 1000, 3),
+            "nodes_ms": round(sum(timing["duration_ms"] for timing in nodes), 3),
+            "nodes": nodes,
+        }
+    
+    def _build_error_result(self, error: Exception, start_time: float) -> Dict[str, Any]:
+        """构建执行出错时的质控结果"""
+        if recording_enabled():
+            _FLAG_COUNTERS[-1].inc()
+        result = {
+            "rule_id": self.config.rule_id,
+            "rule_name": self.config.rule_name,
+            "description": self.config.description,
+            "module": self.config.module,
+            "type": self.config.type,
+            "fields_name": self.config.fields_name,
+            "passed": False,
+            "flag": -1,
+            "conclusion": "系统错误",
+            "answer": {"error": str(error)},
+            "explanation": f"【系统错误】规则执行失败：{str(error)}",
+            "deduct": 0,
+            "duration_ms": int((time.time() - start_time) * 1000)
+        }
+        if self.context.node_timings is not None:
+            result["timings"] = self._build_timings(start_time)
+        return result
+    
+    def execute_many(
+        self,
+        medical_records: Iterable[Dict[str, Any]],
+        evidence_level: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        使用同一执行计划对多份病历执行规则
+        
+        规则只解析、编译一次；每份病历使用独立的执行上下文，
+        单份病历出错不影响其余病历（错误体现在对应结果的 flag=-1）
+        
+        Args:
+            medical_records: 病历数据字典序列
+            evidence_level: 证据级别（见 execute）
+            
+        Returns:
+            与输入顺序一致的质控结果列表
+        """
+        return [
+            self.execute(medical_record, evidence_level=evidence_level)
+            for medical_record in medical_records
+        ]
+    
+    async def execute_many_async(
+        self,
+        medical_records: Iterable[Dict[str, Any]],
+        max_concurrency: int = 32,
+        evidence_level: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        异步批量执行（语义同 execute_many），最多 max_concurrency 份病历同时执行
+        
+        Returns:
+            与输入顺序一致的质控结果列表
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        
+        async def run(medical_record: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                # 每份病历使用独立的引擎实例（共享同一执行计划），避免上下文互相覆盖
+                engine = RuleEngine.from_plan(self.plan, concurrent=self.concurrent)
+                return await engine.execute_async(medical_record, evidence_level=evidence_level)
+        
+        return list(await asyncio.gather(*(run(record) for record in medical_records)))
     
     def _execute_nodes(self):
+        """执行所有节点：存在可重叠执行的阻塞节点时按依赖图并发执行，否则按顺序执行（见 compile_plan）"""
+        executor = get_executor() if self.concurrent and self.plan.concurrent else None
+        if executor is None:
+            self._execute_nodes_sequentially()
+        else:
+            self._execute_nodes_concurrently(executor)
+    
+    def _execute_nodes_sequentially(self):
         """按顺序执行所有节点"""
-        nodes = self.config.get_nodes()
-        
-        for node in nodes:
+        for node in self.plan.nodes:
             # 执行节点
             self._execute_single_node(node)
             
@@ -116,47 +317,290 @@ class RuleEngine:
             if self._should_skip_remaining(node):
                 break
     
-    def _execute_single_node(self, node: Dict[str, Any]):
+    def _execute_nodes_concurrently(self, executor: Executor):
+        """
+        按依赖图并发执行节点
+        
+        保证与顺序执行结果一致：
+        1. 节点只在其依赖（参数引用的节点、排在前面的带跳过条件的节点）全部完成后才开始
+        2. 跳过条件命中或节点出错后，不再调度排在其后的节点；排在其前的节点照常执行完
+        3. 多个节点出错时，抛出排序最靠前节点的异常
+        4. 节点输出最终按 id 顺序排列，证据顺序不受完成先后影响
+        
+        只有阻塞节点（协程函数、非纯函数）提交到线程池；纯同步函数在提交之后于当前线程就地执行，
+        与线程池中的 I/O 重叠，且不付出线程切换的开销
+        """
+        pending: List[CompiledNode] = list(self.plan.nodes)
+        running: Dict[Future, CompiledNode] = {}
+        completed: Set[str] = set()
+        failures: Dict[int, BaseException] = {}
+        cutoff = len(pending)  # 排序位置 >= cutoff 的节点不再调度
+        
+        def finish(node: CompiledNode, error: Optional[BaseException]):
+            nonlocal cutoff
+            if error is not None:
+                failures[node.index] = error
+                cutoff = min(cutoff, node.index)
+                return
+            completed.add(node.node_id)
+            if node.index < cutoff and self._should_skip_remaining(node):
+                cutoff = node.index + 1
+        
+        while True:
+            ready = [
+                node for node in pending
+                if node.index < cutoff and all(dep in completed for dep in node.depends_on)
+            ]
+            for node in ready:
+                pending.remove(node)
+            
+            # 只有一个可执行节点且没有在途节点时，阻塞节点也直接在当前线程执行，省去线程切换
+            offload = len(ready) > 1 or bool(running)
+            inline = []
+            for node in ready:
+                if offload and node.blocking:
+                    # 复制 contextvars，使节点函数在工作线程中看到与调用方相同的上下文变量
+                    future = executor.submit(contextvars.copy_context().run, self._execute_single_node, node)
+                    running[future] = node
+                else:
+                    inline.append(node)
+            
+            if inline:
+                for node in inline:
+                    if node.index >= cutoff:
+                        continue
+                    try:
+                        self._execute_single_node(node)
+                        finish(node, None)
+                    except Exception as e:
+                        finish(node, e)
+                continue
+            
+            if not running:
+                break
+            
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in sorted(done, key=lambda f: running[f].index):
+                finish(running.pop(future), future.exception())
+        
+        if failures:
+            raise failures[min(failures)]
+        
+        self._order_node_outputs()
+    
+    def _order_node_outputs(self):
+        """按节点顺序重排输出，保证证据顺序不受完成先后影响"""
+        outputs = self.context.node_outputs
+        self.context.node_outputs = {
+            node.node_id: outputs[node.node_id]
+            for node in self.plan.nodes
+            if node.node_id in outputs
+        }
+    
+    async def _execute_nodes_async(self):
+        """
+        按依赖图异步执行节点
+        
+        调度规则与 _execute_nodes_concurrently 相同（依赖、跳过屏障、出错截止、输出排序），
+        只是以 asyncio 任务代替线程
+        """
+        pending: List[CompiledNode] = list(self.plan.nodes)
+        running: Dict[asyncio.Task, CompiledNode] = {}
+        completed: Set[str] = set()
+        failures: Dict[int, BaseException] = {}
+        cutoff = len(pending)  # 排序位置 >= cutoff 的节点不再调度
+        
+        def finish(node: CompiledNode, error: Optional[BaseException]):
+            nonlocal cutoff
+            if error is not None:
+                failures[node.index] = error
+                cutoff = min(cutoff, node.index)
+                return
+            completed.add(node.node_id)
+            if node.index < cutoff and self._should_skip_remaining(node):
+                cutoff = node.index + 1
+        
+        while True:
+            ready = [
+                node for node in pending
+                if node.index < cutoff and all(dep in completed for dep in node.depends_on)
+            ]
+            for node in ready:
+                pending.remove(node)
+            
+            if len(ready) == 1 and not running:
+                try:
+                    await self._execute_single_node_async(ready[0])
+                    finish(ready[0], None)
+                except Exception as e:
+                    finish(ready[0], e)
+                continue
+            
+            for node in ready:
+                running[asyncio.ensure_future(self._execute_single_node_async(node))] = node
+            
+            if not running:
+                break
+            
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=lambda t: running[t].index):
+                finish(running.pop(task), task.exception())
+        
+        if failures:
+            raise failures[min(failures)]
+        
+        self._order_node_outputs()
+    
+    def _execute_single_node(self, node: CompiledNode):
         """
         执行单个节点
         
         Args:
-            node: 节点配置，包含 id, function, params, outputs
+            node: 编译后的节点，函数对象和注入标志已在编译期确定
         """
-        node_id = node["id"]
-        func_name = node["function"]
-        
-        # 1. 查找注册的函数
-        if func_name not in function_registry:
-            raise KeyError(f"未找到注册函数: {func_name}")
+        started = time.perf_counter()
+        called = False
+        input_size = None
+        try:
+            shared_cache, shared_key, resolved_params, raw_result = self._prepare_node(node)
+            if raw_result is _MISSING:
+                input_size = self._input_size(resolved_params)
+                called = True
+                raw_result = self._call_function(node, resolved_params)
+                if node.is_async:
+                    # 同步执行路径遇到协程函数：在独立事件循环中运行
+                    raw_result = _run_coroutine_sync(raw_result)
+                if shared_key is not None:
+                    shared_cache[shared_key] = raw_result
+            
+            self._save_node_outputs(node, raw_result)
+        except Exception as e:
+            self._record_timing(node, started, called, input_size, e)
+            raise
+        self._record_timing(node, started, called, input_size)
+    
+    async def _execute_single_node_async(self, node: CompiledNode):
+        """异步执行单个节点（见 execute_async 中的执行策略）"""
+        started = time.perf_counter()
+        called = False
+        input_size = None
+        try:
+            shared_cache, shared_key, resolved_params, raw_result = self._prepare_node(node)
+            if raw_result is _MISSING:
+                input_size = self._input_size(resolved_params)
+                called = True
+                if node.is_async:
+                    raw_result = await self._call_function(node, resolved_params)
+                elif node.pure and self._runs_inline(resolved_params, input_size):
+                    raw_result = self._call_function(node, resolved_params)
+                else:
+                    loop = asyncio.get_running_loop()
+                    call = functools.partial(self._call_function, node, resolved_params)
+                    raw_result = await loop.run_in_executor(get_executor(), contextvars.copy_context().run, call)
+                if shared_key is not None:
+                    shared_cache[shared_key] = raw_result
+            
+            self._save_node_outputs(node, raw_result)
+        except Exception as e:
+            self._record_timing(node, started, called, input_size, e)
+            raise
+        self._record_timing(node, started, called, input_size)
+    
+    @staticmethod
+    def _runs_inline(resolved_params: Dict[str, Any], input_size: Optional[int]) -> bool:
+        """异步执行路径中纯函数节点是否直接在事件循环中执行（输入规模不超过 ENGINE_ASYNC_INLINE_MAX_SIZE）"""
+        limit = get_settings().ENGINE_ASYNC_INLINE_MAX_SIZE
+        if limit < 0:
+            return True
+        size = input_size if input_size is not None else params_size(resolved_params)
+        return size <= limit
+    
+    def _input_size(self, resolved_params: Dict[str, Any]) -> Optional[int]:
+        """需要耗时明细时计算输入规模（须在注入 medical_record / record_index 之前）"""
+        if self.context.node_timings is None:
+            return None
+        return params_size(resolved_params)
+    
+    def _record_timing(
+        self,
+        node: CompiledNode,
+        started: float,
+        called: bool,
+        input_size: Optional[int],
+        error: Optional[BaseException] = None,
+    ):
+        """
+        记录节点耗时：实际调用了函数时计入按函数的聚合（function_stats）；
+        需要耗时明细时追加到上下文（命中共享缓存的节点标记 cached）。
+        剖析等诊断性执行（recording_disabled）不计入聚合与运行指标
+        """
+        seconds = time.perf_counter() - started
+        if called and recording_enabled():
+            function_stats.record(node.function_name, seconds, error is not None)
+            FUNCTION_SECONDS.labels(node.function_name).observe(seconds)
+        timings = self.context.node_timings
+        if timings is not None:
+            output_size = None if error is not None else params_size(self.context.node_outputs.get(node.node_id))
+            timings.append(node_timing(
+                node.node_id,
+                node.function_name,
+                seconds,
+                input_size,
+                output_size,
+                cached=not called and error is None,
+                error=None if error is None else str(error),
+            ))
+    
+    def _prepare_node(self, node: CompiledNode):
+        """
+        查找可复用的节点结果，或解析节点参数
         
-        func_info = function_registry[func_name]
-        func = func_info["function"]
+        纯函数节点在同一病历的多条规则间去重：参数不含引用时去重键编译期已知，
+        否则按解析后的参数生成
         
-        # 2. 解析参数（支持引用其他节点的输出）
-        resolved_params = self.context.resolve_params(node.get("params", {}))
+        Returns:
+            (shared_cache, shared_key, resolved_params, raw_result)；
+            未命中时 raw_result 为 _MISSING，需要调用函数；
+            shared_key 不为 None 表示调用结果应写入 shared_cache
+        """
+        shared_cache = self.context.shared_cache if node.pure else None
+        if shared_cache is None:
+            return None, None, self.context.resolve_params(node.params), _MISSING
         
-        # 3. 注入 medical_record（仅当函数签名包含该参数时）
-        import inspect
-        sig = inspect.signature(func)
-        if "medical_record" in sig.parameters and self.context.has_medical_record():
-            resolved_params["medical_record"] = self.context.get_medical_record()
+        shared_key = node.shared_key
+        resolved_params = None
+        if shared_key is None:
+            resolved_params = self.context.resolve_params(node.params)
+            shared_key = make_shared_key(node.function, resolved_params)
         
-        # 4. 调用函数
-        raw_result = func(**resolved_params)
+        if shared_key is not None and shared_key in shared_cache:
+            return shared_cache, None, None, shared_cache[shared_key]
         
-        # 5. 映射输出别名
+        # 解析参数（支持引用其他节点的输出）
+        if resolved_params is None:
+            resolved_params = self.context.resolve_params(node.params)
+        return shared_cache, shared_key, resolved_params, _MISSING
+    
+    def _save_node_outputs(self, node: CompiledNode, raw_result: Dict[str, Any]):
+        """映射输出别名并保存到上下文"""
         outputs = {}
-        for alias, field in node.get("outputs", {}).items():
+        for alias, field in node.outputs:
             if field in raw_result:
                 outputs[alias] = raw_result[field]
             else:
                 raise KeyError(f"函数返回中不存在字段 '{field}'，无法映射为 '{alias}'")
         
-        # 6. 保存节点输出到上下文（统一转为字符串）
-        self.context.set_node_output(str(node_id), outputs)
+        self.context.set_node_output(node.node_id, outputs)
     
-    def _should_skip_remaining(self, node: Dict[str, Any]) -> bool:
+    def _call_function(self, node: CompiledNode, resolved_params: Dict[str, Any]) -> Any:
+        """注入 medical_record / record_index（仅当函数签名包含该参数时）并调用节点函数"""
+        if node.needs_medical_record and self.context.has_medical_record():
+            resolved_params["medical_record"] = self.context.get_medical_record()
+        if node.needs_record_index and self.context.has_medical_record():
+            resolved_params["record_index"] = self.context.get_record_index()
+        return node.function(**resolved_params)
+    
+    def _should_skip_remaining(self, node: CompiledNode) -> bool:
         """
         判断是否应该跳过剩余流程
         
@@ -168,26 +612,14 @@ class RuleEngine:
         Returns:
             是否跳过
         """
-        skip_conditions = self.config.get_skip_conditions()
-        if not skip_conditions:
+        if not node.skip_conditions:
             return False
         
-        node_id = str(node["id"])
-        
-        # 检查所有 skip 条件
-        for skip_key, skip_cond in skip_conditions.items():
-            skip_source = str(skip_cond.get("source"))
-            if skip_source == node_id_str:
-                output_key = skip_cond.get("output")
-                expected_value = skip_cond.get("expect", False)
-                
-                node_outputs = self.context.get_node_output(node_id_str)
-                if output_key in node_outputs:
-                    actual_value = node_outputs[output_key]
-                    if actual_value == expected_value:
-                        # 匹配到跳过条件
-                        self.context.set_skip_reason(skip_key)
-                        return True
+        node_outputs = self.context.get_node_output(node.node_id)
+        for skip_cond in node.skip_conditions:
+            if skip_cond.output in node_outputs and node_outputs[skip_cond.output] == skip_cond.expect:
+                # 匹配到跳过条件
+                self.context.set_skip_reason(skip_cond.key)
+                return True
         
         return False
-
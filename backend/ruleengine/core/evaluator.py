@@ -2,7 +2,7 @@
 结果评估器
 负责评估规则执行结果、生成解释文本
 """
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 import re
 from ruleengine.core.config import RuleConfig
 from ruleengine.core.context import ExecutionContext
@@ -14,12 +14,18 @@ class ResultEvaluator:
     
     设计思路：
     1. 根据 result_rule 配置判断是否通过
-    2. 支持模板化解释文本生成
+    2. 支持模板化解释文本生成（模板在编译执行计划时预编译）
     3. 支持跳过场景的特殊处理
     """
     
-    def __init__(self, config: RuleConfig):
+    def __init__(self, config: RuleConfig, templates: Optional[Dict[str, "CompiledTemplate"]] = None):
+        """
+        Args:
+            config: 规则配置
+            templates: 执行计划中预编译的解释模板 {状态: 模板}（见 compile_plan）
+        """
         self.config = config
+        self.templates = templates or {}
     
     def evaluate(self, context: ExecutionContext) -> bool:
         """
@@ -64,47 +70,99 @@ class ResultEvaluator:
         """
         if passed is None:
             # 跳过场景
-            skip_reason = context.get_skip_reason()
-            template = self.config.get_explanation_template(skip_reason)
+            template = self._get_template(context.get_skip_reason())
             if template:
-                return self._render_template(template, context)
+                return template.render(context)
             return "不满足质控条件，无需质控"
         
         # 正常场景
-        status = "pass" if passed else "fail"
-        template = self.config.get_explanation_template(status)
+        template = self._get_template("pass" if passed else "fail")
         if not template:
             return "符合" if passed else "不符合"
         
-        return self._render_template(template, context)
+        return template.render(context)
     
-    def _render_template(self, template: str, context: ExecutionContext) -> str:
-        """
-        渲染模板字符串
-        
-        支持 {{node_X.key}} 语法
-        
-        Args:
-            template: 模板字符串
-            context: 执行上下文
-            
-        Returns:
-            渲染后的文本
-        """
-        result = template
-        
-        # 匹配 {{node_X.key}} 模式
-        pattern = r'\{\{node_(\d+)\.(\w+)\}\}'
-        matches = re.findall(pattern, result)
+    def _get_template(self, status: Optional[str]) -> Optional["CompiledTemplate"]:
+        """获取已编译的模板；未随执行计划预编译时现场编译"""
+        if status in self.templates:
+            return self.templates[status]
+        template = self.config.get_explanation_template(status)
+        return compile_template(template) if template else None
+
+
+# 匹配 {{node_X.key}} 模式
+_PLACEHOLDER_PATTERN = re.compile(r'\{\{node_(\d+)\.(\w+)\}\}')
+
+
+class CompiledTemplate:
+    """
+    已编译的解释模板
+    
+    模板在编译期拆分为文本片段与占位符片段，渲染时逐段取值后一次 join；
+    节点没有对应输出时保留占位符原文
+    """
+    
+    __slots__ = ("source", "segments")
+    
+    def __init__(self, source: str, segments: Tuple[Union[str, Tuple[str, str, str]], ...]):
+        self.source = source
+        # 片段：str 为原样文本；(node_id, key, 占位符原文) 为占位符
+        self.segments = segments
+    
+    def placeholders(self) -> List[Tuple[str, str]]:
+        """模板引用的 (节点ID, 输出字段) 列表"""
+        return [(seg[0], seg[1]) for seg in self.segments if not isinstance(seg, str)]
+    
+    def render(self, context: ExecutionContext) -> str:
+        if len(self.segments) == 1 and isinstance(self.segments[0], str):
+            return self.segments[0]
+        parts = []
+        for seg in self.segments:
+            if isinstance(seg, str):
+                parts.append(seg)
+                continue
+            node_id, key, raw = seg
+            node_output = context.get_node_output(node_id)
+            parts.append(str(node_output[key]) if key in node_output else raw)
+        return "".join(parts)
+
+
+def compile_template(
+    template: str,
+    node_outputs: Optional[Dict[str, Iterable[str]]] = None,
+    name: str = "",
+) -> CompiledTemplate:
+    """
+    将模板字符串编译为片段序列
+    
+    Args:
+        template: 模板字符串，如 "主诉长度{{node_2.count}}个字符"
+        node_outputs: {节点ID: 输出字段别名}；提供时校验占位符引用的节点与字段均存在
+        name: 模板名称（pass / fail / skipped_xxx），用于错误信息
         
-        for node_id_str, key in matches:
-            node_id = int(node_id_str)
-            node_output = context.get_node_output(str(node_id))
-            
-            if key in node_output:
-                value = str(node_output[key])
-                placeholder = f"{{{{node_{node_id}.{key}}}}}"
-                result = result.replace(placeholder, value)
+    Returns:
+        已编译的模板
         
-        return result
-
+    Raises:
+        ValueError: 占位符引用了不存在的节点或该节点没有的输出字段
+    """
+    segments: List[Union[str, Tuple[str, str, str]]] = []
+    pos = 0
+    for match in _PLACEHOLDER_PATTERN.finditer(template):
+        node_id = str(int(match.group(1)))
+        if node_id != match.group(1):
+            # 带前导零的写法（如 node_02）以往不会被替换，按原文保留
+            continue
+        if match.start() > pos:
+            segments.append(template[pos:match.start()])
+        key = match.group(2)
+        if node_outputs is not None:
+            if node_id not in node_outputs:
+                raise ValueError(f"解释模板 '{name}' 引用了不存在的节点: {match.group(0)}")
+            if key not in node_outputs[node_id]:
+                raise ValueError(f"解释模板 '{name}' 引用了节点 {node_id} 不存在的输出 '{key}': {match.group(0)}")
+        segments.append((node_id, key, match.group(0)))
+        pos = match.end()
+    if pos < len(template) or not segments:
+        segments.append(template[pos:])
+    return CompiledTemplate(template, tuple(segments))
@@ -0,0 +1,43 @@
+"""
+执行证据级别
+决定一次执行是否提取证据（answer）、提取多少
+"""
+from typing import Optional
+
+
+EVIDENCE_NONE = "none"            # 不提取证据
+EVIDENCE_FAIL_ONLY = "fail_only"  # 仅不通过时提取（截断长文本）
+EVIDENCE_SUMMARY = "summary"      # 始终提取，长文本截断（默认，与以往行为一致）
+EVIDENCE_FULL = "full"            # 始终提取，不截断
+
+EVIDENCE_LEVELS = (EVIDENCE_NONE, EVIDENCE_FAIL_ONLY, EVIDENCE_SUMMARY, EVIDENCE_FULL)
+
+
+def validate_evidence_level(level: Optional[str]) -> Optional[str]:
+    """
+    校验证据级别
+
+    Returns:
+        原值（None 表示未指定，沿用上一级配置）
+
+    Raises:
+        ValueError: 未知的证据级别
+    """
+    if level is not None and level not in EVIDENCE_LEVELS:
+        raise ValueError(f"未知的证据级别: {level}，可选: {', '.join(EVIDENCE_LEVELS)}")
+    return level
+
+
+def evidence_required(level: str, passed: Optional[bool]) -> bool:
+    """
+    该级别下本次结果是否需要提取证据
+
+    Args:
+        level: 证据级别
+        passed: 是否通过（None 表示跳过）
+    """
+    if level == EVIDENCE_NONE:
+        return False
+    if level == EVIDENCE_FAIL_ONLY:
+        return passed is False
+    return True
@@ -0,0 +1,312 @@
+"""
+规则执行计划
+将规则配置编译为不可变的执行计划，并按 (规则ID, 版本) 在进程内缓存
+"""
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple, Union
+import copy
+import inspect
+import logging
+import threading
+
+from metrics import CACHE_REQUESTS
+from ruleengine.core.config import RuleConfig
+from ruleengine.core.evaluator import CompiledTemplate, compile_template
+from ruleengine.core.evidence import validate_evidence_level
+from ruleengine.registry import function_registry
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SkipCondition:
+    """跳过条件：节点输出 output 等于 expect 时，以 key 作为跳过原因终止流程"""
+    key: str
+    output: str
+    expect: Any
+
+
+@dataclass(frozen=True)
+class CompiledNode:
+    """
+    编译后的节点
+
+    函数对象、是否需要注入 medical_record / record_index、跳过条件均在编译期确定，
+    执行期不再查注册表、不再做签名检查
+    """
+    node_id: str
+    function_name: str
+    function: Any
+    params: Any
+    outputs: Tuple[Tuple[str, str], ...]
+    needs_medical_record: bool
+    skip_conditions: Tuple[SkipCondition, ...]
+    pure: bool = False
+    is_async: bool = False
+    shared_key: Optional[Tuple[Any, ...]] = None
+    index: int = 0
+    depends_on: Tuple[str, ...] = ()
+    needs_record_index: bool = False
+
+    @property
+    def blocking(self) -> bool:
+        """
+        是否可能阻塞（协程函数，或非纯函数，通常含 I/O）
+
+        并发执行时只有这类节点转到线程池；纯同步函数只做少量 CPU 计算，
+        受 GIL 限制放到线程池并不会更快，反而多出调度开销，因此在当前线程就地执行
+        """
+        return self.is_async or not self.pure
+
+
+@dataclass(frozen=True)
+class ExecutionPlan:
+    """
+    规则执行计划
+
+    设计思路：
+    1. 规则配置只解析、校验一次，结果不可变，可被多个请求/线程共享
+    2. 节点按 id 预排序，跳过条件按节点 id 预先归类
+    3. 根据参数引用构建依赖图（depends_on），存在可与其他节点重叠执行的阻塞节点时才并发执行
+    4. 解释模板预编译为文本/占位符片段，并校验引用的节点与输出字段
+    5. 每次执行只需新建 ExecutionContext
+    """
+    config: RuleConfig
+    nodes: Tuple[CompiledNode, ...]
+    concurrent: bool = False
+    templates: Dict[str, CompiledTemplate] = field(default_factory=dict)
+
+    @property
+    def rule_id(self) -> str:
+        return self.config.rule_id
+
+
+def _references(params: Any) -> Set[str]:
+    """收集参数中 {"source", "output"} 引用的节点 id"""
+    if isinstance(params, dict):
+        if "source" in params and "output" in params:
+            return {str(params["source"])}
+        return set().union(*(_references(v) for v in params.values()))
+    if isinstance(params, list):
+        return set().union(*(_references(item) for item in params))
+    return set()
+
+
+def _build_dependencies(nodes: List[CompiledNode]) -> List[CompiledNode]:
+    """
+    根据参数引用和跳过条件计算每个节点的前置节点
+
+    - 数据依赖：参数引用了哪些（排在其前面的）节点的输出。
+      引用排在后面或不存在的节点不计入依赖，执行时照常报“尚未执行”错误，保证依赖图无环
+    - 跳过屏障：带跳过条件的节点一旦命中即终止其后的全部节点，
+      因此排在其后的节点都必须等它执行完，保证跳过语义与顺序执行一致
+    """
+    seen: Set[str] = set()
+    barriers: List[str] = []
+    compiled = []
+    for index, node in enumerate(nodes):
+        deps = (_references(node.params) & seen) | set(barriers)
+        compiled.append(replace(node, index=index, depends_on=tuple(sorted(deps))))
+        seen.add(node.node_id)
+        if node.skip_conditions:
+            barriers.append(node.node_id)
+    return compiled
+
+
+def _has_independent_nodes(nodes: List[CompiledNode]) -> bool:
+    """
+    并发执行是否有收益：依赖图的同一层级有两个及以上节点，且其中有阻塞节点（见 CompiledNode.blocking）
+
+    只含纯同步函数的层级并发执行只会更慢（GIL 下 CPU 计算无法并行），按顺序执行
+    """
+    levels: Dict[str, int] = {}
+    groups: Dict[int, List[CompiledNode]] = {}
+    for node in nodes:
+        level = 1 + max((levels[d] for d in node.depends_on), default=0)
+        levels[node.node_id] = level
+        groups.setdefault(level, []).append(node)
+    return any(
+        len(group) > 1 and any(node.blocking for node in group)
+        for group in groups.values()
+    )
+
+
+def _freeze(value: Any) -> Hashable:
+    """
+    将参数值转换为可哈希的等价结构
+
+    容器带类型标签（dict / list / tuple），避免列表与元组、字典与键值对列表得到相同的键
+    """
+    if isinstance(value, dict):
+        return ("dict", tuple(sorted((k, _freeze(v)) for k, v in value.items())))
+    if isinstance(value, list):
+        return ("list", tuple(_freeze(item) for item in value))
+    if isinstance(value, tuple):
+        return ("tuple", tuple(_freeze(item) for item in value))
+    hash(value)  # 不可哈希时抛出 TypeError，由调用方放弃去重
+    return value
+
+
+def make_shared_key(func: Callable, params: Any) -> Optional[Tuple[Any, ...]]:
+    """
+    生成纯函数节点的去重键：(函数对象, 冻结后的参数)
+
+    同一函数的不同注册名指向同一函数对象，因此也能互相复用
+
+    Returns:
+        去重键；参数无法哈希时返回 None
+    """
+    try:
+        return (func, _freeze(params))
+    except TypeError:
+        return None
+
+
+def _compile_templates(
+    config: RuleConfig,
+    nodes: List[CompiledNode],
+    strict_templates: bool,
+) -> Dict[str, CompiledTemplate]:
+    """预编译解释模板；strict_templates=False 时引用错误只记录警告，占位符渲染时保留原文"""
+    node_outputs = {node.node_id: {alias for alias, _ in node.outputs} for node in nodes}
+    templates = {}
+    for status, template in config.get_explanation_templates().items():
+        if not template or not isinstance(template, str):
+            continue
+        try:
+            templates[status] = compile_template(template, node_outputs, status)
+        except ValueError as e:
+            if strict_templates:
+                raise
+            logger.warning("规则 %s 的解释模板无效：%s", config.rule_id, e)
+            templates[status] = compile_template(template)
+    return templates
+
+
+def compile_plan(rule_config: Dict[str, Any], strict_templates: bool = True) -> ExecutionPlan:
+    """
+    将规则配置编译为执行计划
+
+    Args:
+        rule_config: 规则配置字典
+        strict_templates: 解释模板引用不存在的节点/输出时是否报错
+
+    Returns:
+        执行计划
+
+    Raises:
+        ValueError: 配置不完整、证据级别无效或解释模板引用错误
+        KeyError: 节点引用了未注册的函数
+    """
+    # 深拷贝，避免调用方后续修改配置影响已缓存的计划
+    config = RuleConfig(copy.deepcopy(rule_config))
+    validate_evidence_level(config.evidence_level)
+
+    skip_by_node: Dict[str, list] = {}
+    for skip_key, skip_cond in config.get_skip_conditions().items():
+        condition = SkipCondition(
+            key=skip_key,
+            output=skip_cond.get("output"),
+            expect=skip_cond.get("expect", False),
+        )
+        skip_by_node.setdefault(str(skip_cond.get("source")), []).append(condition)
+
+    nodes = []
+    for node in config.get_nodes():
+        node_id = str(node["id"])
+        func_name = node["function"]
+        if func_name not in function_registry:
+            raise KeyError(f"未找到注册函数: {func_name}")
+        func_info = function_registry[func_name]
+        func = func_info["function"]
+        signature = inspect.signature(func)
+        params = node.get("params", {})
+
+        # 纯函数节点可在同一病历的多条规则间去重；
+        # 不引用其他节点的，去重键在编译期即可确定
+        pure = bool(func_info.get("pure"))
+        shared_key = None
+        if pure and not _references(params):
+            shared_key = make_shared_key(func, params)
+
+        nodes.append(CompiledNode(
+            node_id=node_id,
+            function_name=func_name,
+            function=func,
+            params=params,
+            outputs=tuple(node.get("outputs", {}).items()),
+            needs_medical_record="medical_record" in signature.parameters,
+            needs_record_index="record_index" in signature.parameters,
+            skip_conditions=tuple(skip_by_node.get(node_id, ())),
+            pure=pure,
+            is_async=bool(func_info.get("is_async")),
+            shared_key=shared_key,
+        ))
+
+    nodes = _build_dependencies(nodes)
+    return ExecutionPlan(
+        config=config,
+        nodes=tuple(nodes),
+        concurrent=_has_independent_nodes(nodes),
+        templates=_compile_templates(config, nodes, strict_templates),
+    )
+
+
+# 进程内计划缓存：{(rule_id, version): ExecutionPlan}
+_plan_cache: Dict[Tuple[Hashable, int], ExecutionPlan] = {}
+_plan_cache_lock = threading.Lock()
+_PLAN_CACHE_HITS = CACHE_REQUESTS.labels("plan", "hit")
+_PLAN_CACHE_MISSES = CACHE_REQUESTS.labels("plan", "miss")
+
+
+def get_cached_plan(
+    rule_id: Hashable,
+    version: int,
+    rule_config: Union[Dict[str, Any], Callable[[], Dict[str, Any]]],
+) -> ExecutionPlan:
+    """
+    获取（必要时编译并缓存）规则执行计划
+
+    同一规则只保留最新版本的计划，旧版本在新版本编译后被替换。
+    已入库的规则在导入/发布时已严格校验，这里不因解释模板错误而拒绝编译
+    （只记录警告），避免历史规则阻断整批执行
+
+    Args:
+        rule_id: 规则ID（数据库主键）
+        version: 规则版本号
+        rule_config: 规则配置字典，或返回配置字典的函数（仅在缓存未命中时调用，
+            可避免命中时重复 json.loads）
+
+    Returns:
+        执行计划
+    """
+    key = (rule_id, version)
+    plan = _plan_cache.get(key)
+    if plan is not None:
+        _PLAN_CACHE_HITS.inc()
+        return plan
+
+    _PLAN_CACHE_MISSES.inc()
+    if callable(rule_config):
+        rule_config = rule_config()
+    plan = compile_plan(rule_config, strict_templates=False)
+    with _plan_cache_lock:
+        for stale_key in [k for k in _plan_cache if k[0] == rule_id and k != key]:
+            del _plan_cache[stale_key]
+        _plan_cache[key] = plan
+    return plan
+
+
+def invalidate_plan(rule_id: Optional[Hashable] = None):
+    """
+    使缓存的执行计划失效
+
+    Args:
+        rule_id: 规则ID；为 None 时清空全部缓存
+    """
+    with _plan_cache_lock:
+        if rule_id is None:
+            _plan_cache.clear()
+            return
+        for key in [k for k in _plan_cache if k[0] == rule_id]:
+            del _plan_cache[key]
@@ -0,0 +1,309 @@
+"""
+节点耗时统计
+单次执行的逐节点耗时明细（可选返回）、进程内按函数累计的耗时聚合，
+以及规则开发时按需使用的 cProfile / 采样剖析（profile_rule）
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import collections
+import cProfile
+import functools
+import os
+import pstats
+import sys
+import threading
+import time
+
+
+# 为 False 时当前上下文中的执行不计入 function_stats 与运行指标（剖析等诊断性执行）
+_recording: ContextVar[bool] = ContextVar("rule_stats_recording", default=True)
+
+
+def recording_enabled() -> bool:
+    """当前上下文中的执行是否计入 function_stats 与运行指标"""
+    return _recording.get()
+
+
+@contextmanager
+def recording_disabled() -> Iterator[None]:
+    """
+    在 with 块内执行的规则不计入进程内统计（函数耗时聚合、规则执行次数与函数耗时指标）
+
+    基于 ContextVar：只影响当前线程 / 协程及其派生的上下文，同时处理的其他请求照常记录
+    """
+    token = _recording.set(False)
+    try:
+        yield
+    finally:
+        _recording.reset(token)
+
+
+def value_size(value: Any) -> int:
+    """值的规模：字符串为字符数，容器为元素个数，None 为 0，其余标量为 1"""
+    if value is None:
+        return 0
+    if isinstance(value, (str, bytes, list, tuple, dict, set)):
+        return len(value)
+    return 1
+
+
+def params_size(params: Optional[Dict[str, Any]]) -> Optional[int]:
+    """已解析参数的总规模（命中共享缓存、未解析参数时为 None）"""
+    if params is None:
+        return None
+    return sum(value_size(value) for value in params.values())
+
+
+def node_timing(
+    node_id: str,
+    function: str,
+    seconds: float,
+    input_size: Optional[int],
+    output_size: Optional[int],
+    cached: bool,
+    error: Optional[str] = None,
+) -> Dict[str, Any]:
+    """单个节点的耗时记录（执行结果 timings.nodes 的元素）"""
+    timing = {
+        "node_id": node_id,
+        "function": function,
+        "duration_ms": round(seconds * 1000, 3),
+        "input_size": input_size,
+        "output_size": output_size,
+        "cached": cached,
+    }
+    if error is not None:
+        timing["error"] = error
+    return timing
+
+
+class FunctionStats:
+    """
+    按函数累计的耗时聚合
+
+    设计思路：
+    1. 每个函数记录调用次数、总耗时、最大耗时，以及最近 window 次耗时（用于 p95）
+    2. 只记录实际调用，命中共享缓存的节点不计入
+    3. 记录在节点执行线程中进行，加锁保护；一次记录只是几次加法与一次 deque 追加
+    """
+
+    def __init__(self, window: int = 1024):
+        self.window = window
+        self._lock = threading.Lock()
+        self._count: Dict[str, int] = {}
+        self._total: Dict[str, float] = {}
+        self._max: Dict[str, float] = {}
+        self._errors: Dict[str, int] = {}
+        self._recent: Dict[str, collections.deque] = {}
+
+    def record(self, function: str, seconds: float, error: bool = False):
+        with self._lock:
+            recent = self._recent.get(function)
+            if recent is None:
+                recent = self._recent[function] = collections.deque(maxlen=self.window)
+                self._count[function] = 0
+                self._total[function] = 0.0
+                self._max[function] = 0.0
+                self._errors[function] = 0
+            recent.append(seconds)
+            self._count[function] += 1
+            self._total[function] += seconds
+            if seconds > self._max[function]:
+                self._max[function] = seconds
+            if error:
+                self._errors[function] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """{函数名: {count, errors, mean_ms, p95_ms, max_ms}}，p95 取最近 window 次调用"""
+        with self._lock:
+            data = {
+                name: (self._count[name], self._errors[name], self._total[name], self._max[name], list(recent))
+                for name, recent in self._recent.items()
+            }
+        stats = {}
+        for name, (count, errors, total, max_seconds, recent) in sorted(data.items()):
+            ordered = sorted(recent)
+            p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] if ordered else 0.0
+            stats[name] = {
+                "count": count,
+                "errors": errors,
+                "mean_ms": round(total / count * 1000, 3) if count else 0.0,
+                "p95_ms": round(p95 * 1000, 3),
+                "max_ms": round(max_seconds * 1000, 3),
+            }
+        return stats
+
+    def reset(self):
+        with self._lock:
+            self._count.clear()
+            self._total.clear()
+            self._max.clear()
+            self._errors.clear()
+            self._recent.clear()
+
+
+# 进程内共享的函数耗时聚合
+function_stats = FunctionStats()
+
+
+def order_timings(timings: List[Dict[str, Any]], node_order: List[str]) -> List[Dict[str, Any]]:
+    """按节点顺序排列耗时记录（并发执行时完成顺序不定）"""
+    position = {node_id: i for i, node_id in enumerate(node_order)}
+    return sorted(timings, key=lambda t: position.get(t["node_id"], len(position)))
+
+
+# 同一时刻只允许一个剖析任务（cProfile 不支持在多个线程中同时启用）
+_profile_lock = threading.Lock()
+_SOURCE_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _short_path(filename: str) -> str:
+    """源码路径：项目内文件取相对路径，其余取文件名（包的 __init__.py 带上包名）"""
+    if filename.startswith(_SOURCE_ROOT + os.sep):
+        return os.path.relpath(filename, _SOURCE_ROOT)
+    head, name = os.path.split(filename)
+    return f"{os.path.basename(head)}/{name}" if name == "__init__.py" else name
+
+
+def _frame_label(code) -> str:
+    """折叠栈中的帧名：函数名 (文件:行)，去掉分号以免与栈分隔符冲突"""
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({_short_path(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+
+def _top_functions(profiler: cProfile.Profile, runs: int, top: int) -> List[Dict[str, Any]]:
+    """按累计耗时排序的函数列表（耗时为 runs 次执行的合计，另给出平均每次执行的累计耗时）"""
+    stats = pstats.Stats(profiler).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:top]
+    functions = []
+    for (filename, line, name), (primitive_calls, calls, tottime, cumtime, _) in rows:
+        functions.append({
+            "function": name,
+            "location": f"{_short_path(filename)}:{line}" if filename != "~" else "built-in",
+            "calls": calls,
+            "primitive_calls": primitive_calls,
+            "tottime_ms": round(tottime * 1000, 3),
+            "cumtime_ms": round(cumtime * 1000, 3),
+            "cumtime_per_run_ms": round(cumtime / runs * 1000, 3),
+        })
+    return functions
+
+
+class _StackSampler:
+    """
+    采样剖析器：后台线程按固定间隔读取目标线程的调用栈，累计折叠栈计数
+
+    设计思路：
+    1. sys._current_frames() 读取目标线程当前帧，沿 f_back 回溯到 root_code（剖析循环）为止，
+       只保留其下方的帧，栈底不包含 Web 框架 / 线程池等无关帧
+    2. 采样线程需要获得 GIL 才能读取，目标线程为纯计算时实际间隔受 sys.getswitchinterval() 限制
+    3. 目标线程不在 root_code 内（尚未开始或已结束）时的采样丢弃
+    """
+
+    def __init__(self, thread_id: int, root_code, interval: float):
+        self.thread_id = thread_id
+        self.root_code = root_code
+        self.interval = interval
+        self.counts: Dict[str, int] = collections.Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rule-profile-sampler", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame.f_code is not self.root_code:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if frame is None or not stack:
+                continue
+            self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """折叠栈文本（每行 "帧;帧;帧 次数"），可直接交给 flamegraph.pl / speedscope 等工具"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+def _run_repeatedly(execute: Callable[[], Any], runs: int, min_seconds: float) -> int:
+    """执行至少 runs 次且至少 min_seconds 秒，返回实际执行次数（采样的栈底帧）"""
+    count = 0
+    deadline = time.perf_counter() + min_seconds
+    while count < runs or time.perf_counter() < deadline:
+        execute()
+        count += 1
+    return count
+
+
+def profile_rule(
+    engine: Any,
+    medical_record: Dict[str, Any],
+    runs: int = 20,
+    top: int = 30,
+    sample_interval: float = 0.001,
+    sample_seconds: float = 0.5,
+    evidence_level: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    剖析规则执行：定位规则慢在哪个函数、哪条调用路径
+
+    设计思路：
+    1. 第一阶段在 cProfile 下执行 runs 次，按累计耗时给出前 top 个函数（确定性统计，含调用次数）
+    2. 第二阶段不启用 cProfile，以采样方式执行（至少 runs 次且至少 sample_seconds 秒），
+       输出折叠栈，用于生成火焰图；两阶段分开，避免 cProfile 的开销扭曲采样比例
+    3. 引擎应以 concurrent=False 创建，所有节点在调用线程中执行，两种剖析都只观察该线程
+    4. 同一进程内剖析任务串行执行；含 LLM 节点的规则每次执行都会请求（或命中缓存），次数不宜过多
+    5. 剖析中的执行在 recording_disabled 下进行，不计入 function_stats 与规则执行 / 函数耗时指标，
+       避免数千次重复执行扭曲生产统计（LLM 节点的上游调用仍照常计入 LLM 指标）
+
+    Args:
+        engine: RuleEngine 实例（concurrent=False）
+        medical_record: 测试病历
+        runs: cProfile 阶段的执行次数，也是采样阶段的最少执行次数
+        top: 返回的函数个数
+        sample_interval: 采样间隔（秒）
+        sample_seconds: 采样阶段的最短时长（秒），执行很快的规则需要多次执行才能采到足够样本
+        evidence_level: 证据级别，同 RuleEngine.execute
+
+    Returns:
+        {runs, mean_ms, top_functions, samples, sample_runs, sample_interval_ms, collapsed}；
+        mean_ms 取自采样阶段（不含 cProfile 开销）
+    """
+    runs = max(1, runs)
+    execute = functools.partial(engine.execute, medical_record, evidence_level=evidence_level)
+
+    with _profile_lock, recording_disabled():
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            for _ in range(runs):
+                execute()
+        finally:
+            profiler.disable()
+
+        sampler = _StackSampler(threading.get_ident(), _run_repeatedly.__code__, sample_interval)
+        start = time.perf_counter()
+        with sampler:
+            sample_runs = _run_repeatedly(execute, runs, sample_seconds)
+        elapsed = time.perf_counter() - start
+
+    return {
+        "runs": runs,
+        "mean_ms": round(elapsed / sample_runs * 1000, 3),
+        "top_functions": _top_functions(profiler, runs, top),
+        "samples": sampler.samples,
+        "sample_runs": sample_runs,
+        "sample_interval_ms": round(sample_interval * 1000, 3),
+        "collapsed": sampler.collapsed(),
+    }
@@ -0,0 +1,125 @@
+"""
+病历字段索引
+同一份病历上的所有提取节点共享的规范化字段文本，按需填充、只读
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from ruleengine.text_stats import TextStats, compute_text_stats
+
+
+@dataclass(frozen=True)
+class FieldEntry:
+    """
+    规范化后的字段
+
+    text 为去除首尾空白的字段文本（整段提取时为各字段拼接的文本）；
+    formatted 为节点输出使用的 "section.field>>>text\\n" 形式，字段为空时为 ""
+    """
+    text: str
+    formatted: str
+    found: bool
+    extract_mode: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def is_empty(self) -> bool:
+        return self.text == ""
+
+
+class RecordIndex:
+    """
+    病历字段索引
+
+    设计思路：
+    1. 每份病历一个索引，路径 (section, field) 首次被访问时才规范化（去空白、
+       转字符串、拼接 "section.field>>>" 前缀），之后直接返回缓存结果
+    2. field 为空字符串表示整段提取，拼接好的整段文本同样只生成一次
+    3. 同一份病历的多条规则（execute-all）通过 shared_cache 共享同一个索引，
+       全部规则执行完每个字段只处理一次
+    4. 同时按文本缓存文本统计（text_stats），同一段文本在一次执行中只统计一次
+    5. 索引只读，不修改病历；并发节点同时填充同一路径时至多重复计算一次，结果一致，无需加锁
+    """
+
+    __slots__ = ("_record", "_entries", "_stats")
+
+    def __init__(self, medical_record: Dict[str, Any]):
+        self._record = medical_record
+        self._entries: Dict[Tuple[str, str], FieldEntry] = {}
+        self._stats: Dict[str, TextStats] = {}
+
+    @property
+    def medical_record(self) -> Dict[str, Any]:
+        return self._record
+
+    def get(self, section: str, field: str) -> FieldEntry:
+        """
+        获取字段（field 为 '' 时为整段内容）
+
+        Args:
+            section: 一级节名，如 "入院记录"
+            field: 二级字段名，如 "主诉"；'' 表示整个 section
+
+        Returns:
+            规范化后的字段
+        """
+        key = (section, field)
+        try:
+            entry = self._entries.get(key)
+        except TypeError:
+            # 路径不可哈希（配置错误）：不缓存，由 _build 记录错误
+            return self._build(section, field)
+        if entry is None:
+            entry = self._build(section, field)
+            self._entries[key] = entry
+        return entry
+
+    def text(self, section: str, field: str) -> str:
+        """字段的规范化文本（不含路径前缀），字段不存在时为 ''"""
+        return self.get(section, field).text
+
+    def text_stats(self, text: str) -> TextStats:
+        """文本统计（按文本缓存，见 ruleengine.text_stats）"""
+        stats = self._stats.get(text)
+        if stats is None:
+            stats = compute_text_stats(text)
+            self._stats[text] = stats
+        return stats
+
+    def _build(self, section: str, field: str) -> FieldEntry:
+        text = ""
+        found = False
+        extract_mode = None
+        error = None
+        try:
+            section_value = self._record[section] if section in self._record else None
+            if isinstance(section_value, dict):
+                if field == "":
+                    # 整段提取：各字段按 "key: value" 逐行拼接（保留原始结构信息）
+                    if section_value:
+                        lines = []
+                        for k, v in section_value.items():
+                            v_str = str(v).strip() if isinstance(v, str) else repr(v)
+                            lines.append(f"{k}: {v_str}")
+                        text = "\n".join(lines)
+                    found = True
+                    extract_mode = "full_section"
+                elif field in section_value:
+                    raw_value = section_value[field]
+                    text = raw_value.strip() if isinstance(raw_value, str) else str(raw_value).strip()
+                    found = True
+                    extract_mode = "specific_field"
+        except Exception as e:
+            text = ""
+            found = False
+            error = str(e)
+
+        if text == "":
+            return FieldEntry(text="", formatted="", found=False, extract_mode=extract_mode, error=error)
+        return FieldEntry(
+            text=text,
+            formatted=f"{section}.{field}>>>{text}\n",
+            found=found,
+            extract_mode=extract_mode,
+            error=error,
+        )
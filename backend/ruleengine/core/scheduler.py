@@ -0,0 +1,48 @@
+"""
+节点调度线程池
+为规则引擎并发执行相互独立的节点提供进程内共享的有界线程池
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import threading
+
+from config import get_settings
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_max_workers() -> int:
+    """线程池大小，取自 Settings.ENGINE_MAX_WORKERS"""
+    return get_settings().ENGINE_MAX_WORKERS
+
+
+def get_executor() -> Optional[ThreadPoolExecutor]:
+    """
+    获取共享线程池（首次调用时创建）
+
+    Returns:
+        线程池；ENGINE_MAX_WORKERS <= 1 时返回 None，表示只顺序执行
+    """
+    global _executor
+    if _executor is None:
+        max_workers = get_max_workers()
+        if max_workers <= 1:
+            return None
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max_workers,
+                    thread_name_prefix="ruleengine-node",
+                )
+    return _executor
+
+
+def shutdown_executor(wait: bool = True):
+    """关闭共享线程池（进程退出时调用）"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
@@ -3,8 +3,16 @@
 包括字符计数、数值范围检查、时间计算等
 """
 from ruleengine.registry import register_function
+from ruleengine.core.record_index import RecordIndex
+from ruleengine.text_stats import TextStats, cjk_preview, compute_text_stats
 from typing import Dict, Any, Optional
-import re
+
+
+def _text_stats(text: str, record_index: Optional[RecordIndex]) -> TextStats:
+    """有病历索引时使用其按文本缓存的统计结果"""
+    if record_index is not None:
+        return record_index.text_stats(text)
+    return compute_text_stats(text)
 
 
 @register_function(
@@ -27,50 +35,54 @@ import re
         "type": "dict",
         "desc": "包含 result(字符数), evidence(统计详情), details(详细信息)"
     },
-    tags=["numeric", "count", "text", "chinese"]
+    tags=["numeric", "count", "text", "chinese"],
+    pure=True
 )
-def count_characters(text: str, count_chinese_only: bool = False) -> Dict[str, Any]:
+def count_characters(
+    text: str,
+    count_chinese_only: bool = False,
+    record_index: Optional[RecordIndex] = None,
+) -> Dict[str, Any]:
     """
     统计文本中的字符数量
     
+    基于 text_stats 的一次遍历统计；引擎注入 record_index 时，
+    同一段文本在本次执行中只统计一次
+    
     Args:
         text: 待统计的文本
         count_chinese_only: 是否只统计中文字符
+        record_index: 病历字段索引（引擎自动注入）
         
     Returns:
         包含字符数的字典
     """
     if not isinstance(text, str):
         text = str(text) if text is not None else ""
+    stats = _text_stats(text, record_index)
     
     if count_chinese_only:
         # 只统计中文字符（包括中文标点）
-        chinese_pattern = r'[\u4e00-\u9fff\u3400-\u4dbf\uf900-\ufaff]'
-        matches = re.findall(chinese_pattern, text)
-        count = len(matches)
+        count = stats.cjk
         evidence = {
             "chinese_count": count,
-            "total_length": len(text),
-            "chinese_chars": "".join(matches[:10]) + ("..." if len(matches) > 10 else "")
+            "total_length": stats.length,
+            "chinese_chars": cjk_preview(text, 10) + ("..." if count > 10 else "")
         }
     else:
         # 统计所有字符（包括空格）
-        count = len(text)
-        # 统计中文字符数
-        chinese_pattern = r'[\u4e00-\u9fff\u3400-\u4dbf\uf900-\ufaff]'
-        chinese_matches = re.findall(chinese_pattern, text)
-        chinese_count = len(chinese_matches)
+        count = stats.length
         evidence = {
             "total_count": count,
-            "chinese_count": chinese_count,
-            "non_chinese_count": count - chinese_count
+            "chinese_count": stats.cjk,
+            "non_chinese_count": stats.non_cjk
         }
     
     return {
         "result": count,
         "evidence": evidence,
         "details": {
-            "text_length": len(text),
+            "text_length": stats.length,
             "count_mode": "chinese_only" if count_chinese_only else "all",
             "count": count
         }
@@ -92,19 +104,68 @@ def count_characters(text: str, count_chinese_only: bool = False) -> Dict[str, A
         "type": "dict",
         "desc": "包含 result(中文字符数), evidence(统计详情), details(详细信息)"
     },
-    tags=["numeric", "count", "chinese"]
+    tags=["numeric", "count", "chinese"],
+    pure=True
 )
-def count_chinese_characters(text: str) -> Dict[str, Any]:
+def count_chinese_characters(text: str, record_index: Optional[RecordIndex] = None) -> Dict[str, Any]:
     """
     统计文本中的中文字符数量
     
     Args:
         text: 待统计的文本
+        record_index: 病历字段索引（引擎自动注入）
         
     Returns:
         包含中文字符数的字典
     """
-    return count_characters(text, count_chinese_only=True)
+    return count_characters(text, count_chinese_only=True, record_index=record_index)
+
+
+@register_function(
+    name="text_statistics",
+    description="一次遍历统计文本的总长度、中文字符、数字、标点、空白字符数与行数",
+    category="数值检查",
+    inputs=[
+        {
+            "name": "text",
+            "type": "str",
+            "desc": "待统计的文本"
+        }
+    ],
+    outputs={
+        "type": "dict",
+        "desc": "包含 result(总长度), chinese_count, digit_count, punctuation_count, whitespace_count, line_count, evidence, details"
+    },
+    tags=["numeric", "count", "text", "statistics"],
+    pure=True
+)
+def text_statistics(text: str, record_index: Optional[RecordIndex] = None) -> Dict[str, Any]:
+    """
+    统计文本的各类字符数量
+    
+    Args:
+        text: 待统计的文本
+        record_index: 病历字段索引（引擎自动注入）
+        
+    Returns:
+        包含各项统计的字典，每项均可通过 outputs 单独映射
+    """
+    if not isinstance(text, str):
+        text = str(text) if text is not None else ""
+    stats = _text_stats(text, record_index)
+    counts = {
+        "chinese_count": stats.cjk,
+        "digit_count": stats.digits,
+        "punctuation_count": stats.punctuation,
+        "whitespace_count": stats.whitespace,
+        "line_count": stats.lines,
+    }
+    return {
+        "result": stats.length,
+        **counts,
+        "evidence": {"total_length": stats.length, **counts},
+        "details": {"text_length": stats.length}
+    }
 
 
 @register_function(
@@ -132,7 +193,8 @@ def count_chinese_characters(text: str) -> Dict[str, Any]:
         "type": "dict",
         "desc": "包含 result(是否在范围内), evidence(范围信息), details(详细信息)"
     },
-    tags=["numeric", "range", "validation"]
+    tags=["numeric", "range", "validation"],
+    pure=True
 )
 def is_number_in_range(value: float, min_value: float, max_value: float) -> Dict[str, Any]:
     """
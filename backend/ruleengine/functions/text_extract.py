@@ -3,6 +3,8 @@
 包括字段提取、内容抽取等
 """
 from ruleengine.registry import register_function
+from ruleengine.core.record_index import RecordIndex
+from ruleengine.regex_tools import KNOWN_TAGS, extract_tags
 from typing import List, Dict, Any, Optional
 
 
@@ -26,74 +28,98 @@ from typing import List, Dict, Any, Optional
         "type": "dict",
         "desc": "包含 result(文本), is_empty(是否为空), evidence(证据), details(详情)"
     },
-    tags=["text", "extract", "field", "nested"]
+    tags=["text", "extract", "field", "nested"],
+    pure=True
 )
-def extract_field_content(field_name: List[str], medical_record: Dict[str, Any]) -> Dict[str, Any]:
+def extract_field_content(
+    field_name: List[str],
+    medical_record: Dict[str, Any],
+    record_index: Optional[RecordIndex] = None,
+) -> Dict[str, Any]:
     """
     从病历中提取字段内容
     
     支持从二级嵌套的病历字典中提取字段内容。
     field_name 应为长度为2的字符串列表: [section, field]
     如果 field 为空字符串 ''，则返回该 section 的全部内容（合并为文本或原字典）
+    
+    字段的规范化（去空白、拼接前缀、整段拼接）由病历字段索引完成并缓存，
+    引擎执行时自动注入 record_index，同一病历上的其他节点/规则直接复用
     """
     # 参数校验
     if not isinstance(field_name, list) or len(field_name) != 2:
         raise ValueError("field_name must be a list of two strings: [section, field]")
     
     section, field = field_name
-    text = ""
-    is_empty = True
-    found = False
-    details_data = {"section": section, "field": field}
+    if record_index is None:
+        record_index = RecordIndex(medical_record)
+    entry = record_index.get(section, field)
 
-    try:
-        if section in medical_record and isinstance(medical_record[section], dict):
-            if field == "":
-                # 特殊情况：field 为空，返回整个 section 的内容
-                section_dict = medical_record[section]
-                if section_dict:
-                    # 将字典的所有 value 转为字符串并拼接（保留原始结构信息）
-                    lines = []
-                    for k, v in section_dict.items():
-                        v_str = str(v).strip() if isinstance(v, str) else repr(v)
-                        lines.append(f"{k}: {v_str}")
-                    text = "\n".join(lines)
-                    is_empty = False
-                else:
-                    text = ""
-                    is_empty = True
-                found = True
-                details_data["extract_mode"] = "full_section"
-            else:
-                # 正常提取二级字段
-                if field in medical_record[section]:
-                    raw_value = medical_record[section][field]
-                    if isinstance(raw_value, str):
-                        text = raw_value.strip()
-                    else:
-                        text = str(raw_value).strip()
-                    is_empty = text == ""
-                    found = True
-                    details_data["extract_mode"] = "specific_field"
-    except Exception as e:
-        text = ""
-        is_empty = True
-        found = False
-        details_data["error"] = str(e)
+    details_data = {"section": section, "field": field}
+    if entry.extract_mode is not None:
+        details_data["extract_mode"] = entry.extract_mode
+    if entry.error is not None:
+        details_data["error"] = entry.error
 
-    if text == "":
-        is_empty = True
-        found = False
-    else:
-        text = ".".join(field_name) + ">>>" + text + "\n"
-    
     return {
-        "result": text,
-        "is_empty": is_empty,
-        "evidence": {"raw_text": text},
+        "result": entry.formatted,
+        "is_empty": entry.is_empty,
+        "evidence": {"raw_text": entry.formatted},
         "details": {
             **details_data,
-            "found": found
+            "found": entry.found
         }
     }
 
+
+# extract_llm_tags 的固定输出字段，标签不能与之重名
+_LLM_TAG_RESERVED_OUTPUTS = ("result", "missing", "evidence", "details")
+
+
+@register_function(
+    name="extract_llm_tags",
+    description="一次扫描提取 LLM 输出中的全部 <tag>...</tag> 标签（conclusion、reason、thinking、content、times 等）",
+    category="文本提取",
+    inputs=[
+        {
+            "name": "text",
+            "type": "str",
+            "desc": "LLM 返回的文本"
+        },
+        {
+            "name": "tags",
+            "type": "list[str]",
+            "desc": "需要的标签，默认 conclusion/reason/thinking/content/times；每个标签都会作为同名输出字段返回，"
+                    "不能使用 result/missing/evidence/details"
+        }
+    ],
+    outputs={
+        "type": "dict",
+        "desc": "包含 result(全部标签字典), 各标签同名字段(未找到为 None), missing(缺失的标签), evidence, details"
+    },
+    tags=["text", "extract", "llm", "tag"],
+    pure=True
+)
+def extract_llm_tags(text: str, tags: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    从 LLM 输出中提取标签内容
+    
+    一个节点即可得到全部标签，规则通过 outputs 按需映射，如 {"conclusion": "conclusion"}
+
+    Raises:
+        ValueError: 标签名与固定输出字段（result/missing/evidence/details）重名
+    """
+    wanted = list(tags) if tags else list(KNOWN_TAGS)
+    reserved = [tag for tag in wanted if tag in _LLM_TAG_RESERVED_OUTPUTS]
+    if reserved:
+        raise ValueError(f"tag names conflict with output fields: {reserved}")
+    found = extract_tags(text or "", wanted)
+    missing = [tag for tag in wanted if tag not in found]
+
+    return {
+        **{tag: found.get(tag) for tag in wanted},
+        "result": found,
+        "missing": missing,
+        "evidence": {"tags": found},
+        "details": {"tags": wanted, "found": len(found)}
+    }
@@ -0,0 +1,16 @@
+"""
+LLM 调用基础设施
+连接池客户端、响应缓存等，供 model_request 组合使用
+"""
+from ruleengine.llm.cache import LLMResponseCache, get_llm_cache, make_cache_key, peek_llm_cache
+from ruleengine.llm.client import LLMClient, LLMRequestError, get_llm_client
+
+__all__ = [
+    "LLMClient",
+    "LLMRequestError",
+    "get_llm_client",
+    "LLMResponseCache",
+    "get_llm_cache",
+    "peek_llm_cache",
+    "make_cache_key",
+]
@@ -0,0 +1,297 @@
+"""
+LLM 响应缓存
+内存 LRU + SQLite 持久化两级缓存，键为模型参数与提示词的哈希
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from metrics import registry
+
+
+def make_cache_key(prompt: str, **model_params: Any) -> str:
+    """
+    生成缓存键：sha256(模型参数 + 提示词)
+
+    模型名、温度、接口路径等任一参数变化都会得到不同的键，
+    避免切换模型后命中旧模型的输出
+    """
+    material = json.dumps(
+        {"params": model_params, "prompt": prompt},
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    LLM 响应缓存
+
+    设计思路：
+    1. 内存层为 OrderedDict 实现的 LRU，命中时不访问磁盘
+    2. 磁盘层为 SQLite（WAL 模式），进程重启、重新部署后仍可命中；
+       path 为空时只使用内存层
+    3. 条目超过 ttl_seconds 视为过期（<=0 表示不过期）；
+       内存层超过 memory_size、磁盘层超过 max_entries 时按写入时间淘汰最旧的条目
+    4. 统计命中（内存/磁盘）、未命中、淘汰次数，见 stats()
+    5. 内存层与 SQLite 连接各用一把锁：_memory_lock 保护 LRU 与计数，只在内存操作期间持有；
+       _disk_lock 保护连接与磁盘条目数。磁盘读写期间不持有内存锁，
+       peek 因此不会被并发的磁盘查询、写入或淘汰阻塞（嵌套时只允许先磁盘锁后内存锁）
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        memory_size: int = 2048,
+        max_entries: int = 100000,
+        ttl_seconds: float = 0,
+    ):
+        self.path = path or ""
+        self.memory_size = max(0, memory_size)
+        self.max_entries = max(0, max_entries)
+        self.ttl_seconds = ttl_seconds
+
+        # {key: (value, created_at)}
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._memory_lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disk_count = 0
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+            "expired": 0,
+        }
+        if self.path:
+            self._open()
+
+    def _open(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_created_at ON llm_cache (created_at)")
+        self._conn = conn
+        self._disk_count = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    # ---------- 读 ----------
+
+    def peek(self, key: str) -> Optional[str]:
+        """只查内存层（不访问磁盘，可在事件循环中直接调用）"""
+        now = time.time()
+        with self._memory_lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            value, created_at = entry
+            if self._expired(created_at, now):
+                del self._memory[key]
+                self._counters["expired"] += 1
+                return None
+            self._memory.move_to_end(key)
+            self._counters["memory_hits"] += 1
+            return value
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        查询缓存：先内存层，再磁盘层（磁盘命中后回填内存层）
+
+        Returns:
+            缓存的响应文本；未命中或已过期时返回 None
+        """
+        value = self.peek(key)
+        if value is not None:
+            return value
+
+        now = time.time()
+        row = None
+        with self._disk_lock:
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and self._expired(row[1], now):
+                    self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._disk_count -= 1
+                    self._count("expired")
+                    row = None
+
+        with self._memory_lock:
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+            value, created_at = row
+            self._counters["disk_hits"] += 1
+            # 读磁盘期间其他线程可能已 put 了更新的值，此时不以磁盘上的旧值覆盖
+            if key not in self._memory:
+                self._remember(key, value, created_at)
+            return value
+
+    # ---------- 写 ----------
+
+    def put(self, key: str, value: str):
+        """写入缓存（内存层与磁盘层）"""
+        now = time.time()
+        with self._memory_lock:
+            self._remember(key, value, now)
+        with self._disk_lock:
+            if self._conn is None:
+                return
+            cursor = self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, now),
+            )
+            # REPLACE 覆盖已有键时 changes 也为 1，这里只需近似计数，超限时以 COUNT 校正
+            self._disk_count += cursor.rowcount
+            if self.max_entries and self._disk_count > self.max_entries:
+                self._evict_disk()
+
+    def _remember(self, key: str, value: str, created_at: float):
+        """写入内存层并执行 LRU 淘汰（调用方持有内存锁）"""
+        if not self.memory_size:
+            return
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+            self._counters["memory_evictions"] += 1
+
+    def _count(self, name: str, n: int = 1):
+        """累加计数（在磁盘锁内调用时，内存锁只在累加期间持有）"""
+        with self._memory_lock:
+            self._counters[name] += n
+
+    def _evict_disk(self):
+        """磁盘层超限：删除过期条目，再按写入时间删除最旧的条目，留出 10% 余量（调用方持有磁盘锁）"""
+        self._disk_count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        if self.ttl_seconds > 0:
+            cursor = self._conn.execute(
+                "DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self._count("expired", cursor.rowcount)
+            self._disk_count -= cursor.rowcount
+        target = int(self.max_entries * 0.9)
+        excess = self._disk_count - target
+        if excess > 0:
+            cursor = self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY created_at LIMIT ?)",
+                (excess,),
+            )
+            self._count("disk_evictions", cursor.rowcount)
+            self._disk_count -= cursor.rowcount
+
+    # ---------- 管理 ----------
+
+    def clear(self):
+        """清空内存层与磁盘层"""
+        with self._memory_lock:
+            self._memory.clear()
+        with self._disk_lock:
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM llm_cache")
+                self._disk_count = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._memory_lock:
+            counters = dict(self._counters)
+            memory_entries = len(self._memory)
+        disk_entries = self._disk_count
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        lookups = hits + counters["misses"]
+        return {
+            **counters,
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": memory_entries,
+            "disk_entries": disk_entries,
+        }
+
+    def close(self):
+        with self._disk_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_cache: Optional[LLMResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def _collect_metrics():
+    """抓取时读取缓存自身的计数（缓存未创建时不输出）"""
+    if _cache is None:
+        return []
+    stats = _cache.stats()
+    return [
+        ("qc_llm_cache_requests_total", "counter", "LLM 响应缓存查找次数（result=memory_hit/disk_hit/miss）", [
+            ({"result": "memory_hit"}, stats["memory_hits"]),
+            ({"result": "disk_hit"}, stats["disk_hits"]),
+            ({"result": "miss"}, stats["misses"]),
+        ]),
+        ("qc_llm_cache_hit_ratio", "gauge", "LLM 响应缓存命中率（进程启动以来）", [({}, stats["hit_rate"])]),
+        ("qc_llm_cache_entries", "gauge", "LLM 响应缓存条目数", [
+            ({"tier": "memory"}, stats["memory_entries"]),
+            ({"tier": "disk"}, stats["disk_entries"]),
+        ]),
+    ]
+
+
+registry.register_collector(_collect_metrics)
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """
+    获取进程内共享的 LLM 响应缓存
+
+    Returns:
+        缓存实例；LLM_CACHE_ENABLED=false 时返回 None
+    """
+    global _cache
+    if _cache is None:
+        from config import get_settings
+
+        settings = get_settings()
+        if not settings.LLM_CACHE_ENABLED:
+            return None
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMResponseCache(
+                    path=settings.LLM_CACHE_PATH,
+                    memory_size=settings.LLM_CACHE_MEMORY_SIZE,
+                    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+                    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+                )
+    return _cache
+
+
+def peek_llm_cache() -> Optional[LLMResponseCache]:
+    """已创建的共享缓存；尚未创建时返回 None，不会打开 SQLite 文件（供 /health 等只读统计使用）"""
+    return _cache
+
+
+def close_llm_cache():
+    """关闭共享缓存的 SQLite 连接（应用退出时调用）"""
+    global _cache
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+            _cache = None
@@ -0,0 +1,421 @@
+"""
+LLM HTTP 客户端
+共享连接池、keep-alive、连接/读取超时、带抖动退避的有限重试、在途请求数上限，
+提供同步与异步、整体与流式（SSE）调用方式，接口为 OpenAI 兼容的 /chat/completions（批量为 /completions）
+"""
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+import asyncio
+import json
+import random
+import threading
+import time
+import weakref
+
+from metrics import LLM_BUCKETS, registry
+
+
+# 可重试的 HTTP 状态码：限流与网关/服务端临时错误
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+# 流式响应结束标记（对应 data: [DONE]）
+STREAM_DONE = object()
+
+
+class LLMRequestError(RuntimeError):
+    """LLM 请求失败（重试耗尽或不可重试的错误）"""
+
+
+LLM_REQUEST_SECONDS = registry.histogram(
+    "qc_llm_request_duration_seconds",
+    "LLM 上游调用耗时（秒，含重试；outcome=ok/error/cancelled）",
+    ("operation", "outcome"),
+    buckets=LLM_BUCKETS,
+)
+LLM_IN_FLIGHT = registry.gauge("qc_llm_requests_in_flight", "正在进行的 LLM 上游调用数", ("operation",))
+
+
+@contextmanager
+def _track(operation: str) -> Iterator[None]:
+    """记录一次上游调用（operation: chat / batch / stream）的在途数与耗时；流式调用被提前关闭记为 cancelled"""
+    in_flight = LLM_IN_FLIGHT.labels(operation)
+    in_flight.inc()
+    outcome = "error"
+    start = time.perf_counter()
+    try:
+        yield
+        outcome = "ok"
+    except (GeneratorExit, asyncio.CancelledError):
+        outcome = "cancelled"
+        raise
+    finally:
+        in_flight.dec()
+        LLM_REQUEST_SECONDS.labels(operation, outcome).observe(time.perf_counter() - start)
+
+
+class LLMClient:
+    """
+    LLM HTTP 客户端
+
+    设计思路：
+    1. 同步调用共享一个 httpx.Client，异步调用每个事件循环共享一个 httpx.AsyncClient，
+       连接池复用 keep-alive 连接，不再每次调用新建连接
+    2. 连接超时与读取超时分开配置
+    3. 网络错误与 RETRYABLE_STATUS 按指数退避 + 全抖动（full jitter）重试，
+       响应带 Retry-After 时取两者较大值
+    4. 同步、异步各自以信号量限制在途请求数（max_in_flight）
+    5. 所有参数默认取自 Settings，也可在构造时覆盖（便于对接本地替身服务测试）
+    6. 每次上游调用（含重试）记录在途数与耗时指标，见 /metrics
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        model: Optional[str] = None,
+        chat_path: Optional[str] = None,
+        batch_path: Optional[str] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+        max_connections: Optional[int] = None,
+        max_keepalive: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        temperature: Optional[float] = None,
+    ):
+        from config import get_settings
+
+        settings = get_settings()
+        self.base_url = (base_url if base_url is not None else settings.LLM_BASE_URL).rstrip("/")
+        self.api_key = api_key if api_key is not None else settings.LLM_API_KEY
+        self.model = model if model is not None else settings.LLM_MODEL
+        self.chat_path = chat_path if chat_path is not None else settings.LLM_CHAT_PATH
+        self.batch_path = batch_path if batch_path is not None else settings.LLM_BATCH_PATH
+        self.connect_timeout = connect_timeout if connect_timeout is not None else settings.LLM_CONNECT_TIMEOUT
+        self.read_timeout = read_timeout if read_timeout is not None else settings.LLM_READ_TIMEOUT
+        self.max_retries = max_retries if max_retries is not None else settings.LLM_MAX_RETRIES
+        self.backoff_base = backoff_base if backoff_base is not None else settings.LLM_BACKOFF_BASE
+        self.backoff_max = backoff_max if backoff_max is not None else settings.LLM_BACKOFF_MAX
+        self.max_connections = max_connections if max_connections is not None else settings.LLM_MAX_CONNECTIONS
+        self.max_keepalive = max_keepalive if max_keepalive is not None else settings.LLM_MAX_KEEPALIVE
+        self.max_in_flight = max(1, max_in_flight if max_in_flight is not None else settings.LLM_MAX_IN_FLIGHT)
+        self.temperature = temperature if temperature is not None else settings.LLM_TEMPERATURE
+
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._sync_slots = threading.BoundedSemaphore(self.max_in_flight)
+        # 异步客户端与信号量都绑定事件循环，按循环分别维护
+        self._async_state: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple]" = weakref.WeakKeyDictionary()
+
+    # ---------- 请求构造与解析 ----------
+
+    @property
+    def url(self) -> str:
+        return self.base_url + self.chat_path
+
+    def _headers(self) -> Dict[str, str]:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def build_payload(self, prompt: str, **extra: Any) -> Dict[str, Any]:
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": self.temperature,
+        }
+        payload.update(extra)
+        return payload
+
+    def cache_params(self) -> Dict[str, Any]:
+        """影响模型输出的参数，参与响应缓存键的计算"""
+        return {
+            "model": self.model,
+            "temperature": self.temperature,
+            "chat_path": self.chat_path,
+        }
+
+    @staticmethod
+    def parse_response(data: Dict[str, Any]) -> str:
+        try:
+            return data["choices"][0]["message"]["content"] or ""
+        except (KeyError, IndexError, TypeError) as e:
+            raise LLMRequestError(f"LLM 响应格式无法解析: {e}") from e
+
+    @staticmethod
+    def parse_stream_line(line: str) -> Any:
+        """
+        解析一行 SSE 流式响应（data: {...}）
+
+        Returns:
+            增量文本；非数据行返回 None；结束标记 [DONE] 返回 STREAM_DONE
+        """
+        if not line.startswith("data:"):
+            return None
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return STREAM_DONE
+        try:
+            choice = json.loads(data)["choices"][0]
+        except (ValueError, KeyError, IndexError, TypeError):
+            return None
+        return (choice.get("delta") or {}).get("content") or None
+
+    def _limits_and_timeout(self):
+        import httpx
+
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+        )
+        timeout = httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+        return limits, timeout
+
+    def _backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """第 attempt 次重试前的等待秒数：指数退避 + 全抖动"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    @staticmethod
+    def _json(response) -> Dict[str, Any]:
+        """解析响应 JSON；响应体不是合法 JSON 时抛出 LLMRequestError（不重试）"""
+        try:
+            return response.json()
+        except ValueError as e:
+            raise LLMRequestError(f"LLM 响应不是合法的 JSON: {e}") from e
+
+    @staticmethod
+    def _retry_after(response) -> Optional[float]:
+        value = response.headers.get("Retry-After")
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            return None
+
+    # ---------- 同步调用 ----------
+
+    def _operation(self, path: str) -> str:
+        """指标中的调用类型：批量接口为 batch，其余为 chat"""
+        return "batch" if path == self.batch_path else "chat"
+
+    def _get_client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import httpx
+
+                    limits, timeout = self._limits_and_timeout()
+                    self._client = httpx.Client(limits=limits, timeout=timeout, headers=self._headers())
+        return self._client
+
+    def post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """同步 POST（含在途上限与重试），返回响应 JSON"""
+        import httpx
+
+        client = self._get_client()
+        with self._sync_slots, _track(self._operation(path)):
+            for attempt in range(self.max_retries + 1):
+                retry_after = None
+                try:
+                    response = client.post(self.base_url + path, json=payload)
+                    if response.status_code not in RETRYABLE_STATUS:
+                        response.raise_for_status()
+                        return self._json(response)
+                    retry_after = self._retry_after(response)
+                    error = LLMRequestError(f"LLM 服务返回 {response.status_code}")
+                except httpx.TransportError as e:
+                    error = LLMRequestError(f"LLM 请求失败: {e!r}")
+                except httpx.HTTPStatusError as e:
+                    raise LLMRequestError(f"LLM 服务返回 {e.response.status_code}") from e
+                if attempt < self.max_retries:
+                    time.sleep(self._backoff(attempt, retry_after))
+            raise error
+
+    def chat(self, prompt: str, **extra: Any) -> str:
+        """同步调用，返回模型输出文本"""
+        return self.parse_response(self.post(self.chat_path, self.build_payload(prompt, **extra)))
+
+    def stream_chat(self, prompt: str, **extra: Any) -> Iterator[str]:
+        """
+        同步流式调用，逐段产出模型输出文本
+
+        收到第一段内容之前的失败按 post 的规则重试；之后的失败直接抛出。
+        调用方提前关闭生成器（close 或 break 后释放）即关闭连接，上游停止生成
+        """
+        import httpx
+
+        payload = self.build_payload(prompt, stream=True, **extra)
+        client = self._get_client()
+        with self._sync_slots, _track("stream"):
+            for attempt in range(self.max_retries + 1):
+                retry_after = None
+                started = False
+                try:
+                    with client.stream("POST", self.url, json=payload) as response:
+                        if response.status_code not in RETRYABLE_STATUS:
+                            response.raise_for_status()
+                            for line in response.iter_lines():
+                                delta = self.parse_stream_line(line)
+                                if delta is STREAM_DONE:
+                                    return
+                                if delta:
+                                    started = True
+                                    yield delta
+                            return
+                        retry_after = self._retry_after(response)
+                        error = LLMRequestError(f"LLM 服务返回 {response.status_code}")
+                except httpx.TransportError as e:
+                    if started:
+                        raise LLMRequestError(f"LLM 流式响应中断: {e!r}") from e
+                    error = LLMRequestError(f"LLM 请求失败: {e!r}")
+                except httpx.HTTPStatusError as e:
+                    raise LLMRequestError(f"LLM 服务返回 {e.response.status_code}") from e
+                if attempt < self.max_retries:
+                    time.sleep(self._backoff(attempt, retry_after))
+            raise error
+
+    def complete_batch(self, prompts: List[str]) -> List[str]:
+        """
+        批量调用：一次请求发送多个提示词（OpenAI 兼容的 /completions，prompt 为列表），
+        按 choices[].index 返回与 prompts 一一对应的输出文本
+        """
+        payload = {
+            "model": self.model,
+            "prompt": list(prompts),
+            "temperature": self.temperature,
+        }
+        data = self.post(self.batch_path, payload)
+        try:
+            choices = sorted(data["choices"], key=lambda choice: choice.get("index", 0))
+            return [choice.get("text") or "" for choice in choices]
+        except (KeyError, TypeError) as e:
+            raise LLMRequestError(f"LLM 批量响应格式无法解析: {e}") from e
+
+    # ---------- 异步调用 ----------
+
+    def _get_async_state(self):
+        loop = asyncio.get_running_loop()
+        state = self._async_state.get(loop)
+        if state is None:
+            import httpx
+
+            limits, timeout = self._limits_and_timeout()
+            state = (
+                httpx.AsyncClient(limits=limits, timeout=timeout, headers=self._headers()),
+                asyncio.Semaphore(self.max_in_flight),
+            )
+            self._async_state[loop] = state
+        return state
+
+    async def apost(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """异步 POST（含在途上限与重试），返回响应 JSON"""
+        import httpx
+
+        client, slots = self._get_async_state()
+        async with slots:
+            with _track(self._operation(path)):
+                for attempt in range(self.max_retries + 1):
+                    retry_after = None
+                    try:
+                        response = await client.post(self.base_url + path, json=payload)
+                        if response.status_code not in RETRYABLE_STATUS:
+                            response.raise_for_status()
+                            return self._json(response)
+                        retry_after = self._retry_after(response)
+                        error = LLMRequestError(f"LLM 服务返回 {response.status_code}")
+                    except httpx.TransportError as e:
+                        error = LLMRequestError(f"LLM 请求失败: {e!r}")
+                    except httpx.HTTPStatusError as e:
+                        raise LLMRequestError(f"LLM 服务返回 {e.response.status_code}") from e
+                    if attempt < self.max_retries:
+                        await asyncio.sleep(self._backoff(attempt, retry_after))
+                raise error
+
+    async def achat(self, prompt: str, **extra: Any) -> str:
+        """异步调用，返回模型输出文本"""
+        return self.parse_response(await self.apost(self.chat_path, self.build_payload(prompt, **extra)))
+
+    async def astream_chat(self, prompt: str, **extra: Any) -> AsyncIterator[str]:
+        """异步流式调用，逐段产出模型输出文本（语义同 stream_chat，提前关闭请使用 aclose）"""
+        import httpx
+
+        payload = self.build_payload(prompt, stream=True, **extra)
+        client, slots = self._get_async_state()
+        async with slots:
+            with _track("stream"):
+                for attempt in range(self.max_retries + 1):
+                    retry_after = None
+                    started = False
+                    try:
+                        async with client.stream("POST", self.url, json=payload) as response:
+                            if response.status_code not in RETRYABLE_STATUS:
+                                response.raise_for_status()
+                                async for line in response.aiter_lines():
+                                    delta = self.parse_stream_line(line)
+                                    if delta is STREAM_DONE:
+                                        return
+                                    if delta:
+                                        started = True
+                                        yield delta
+                                return
+                            retry_after = self._retry_after(response)
+                            error = LLMRequestError(f"LLM 服务返回 {response.status_code}")
+                    except httpx.TransportError as e:
+                        if started:
+                            raise LLMRequestError(f"LLM 流式响应中断: {e!r}") from e
+                        error = LLMRequestError(f"LLM 请求失败: {e!r}")
+                    except httpx.HTTPStatusError as e:
+                        raise LLMRequestError(f"LLM 服务返回 {e.response.status_code}") from e
+                    if attempt < self.max_retries:
+                        await asyncio.sleep(self._backoff(attempt, retry_after))
+                raise error
+
+    # ---------- 关闭 ----------
+
+    def close(self):
+        """关闭同步连接池"""
+        with self._client_lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    async def aclose(self):
+        """关闭当前事件循环上的异步连接池"""
+        state = self._async_state.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            await state[0].aclose()
+
+
+_client: Optional[LLMClient] = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    """获取进程内共享的 LLM 客户端（配置取自 Settings）"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient()
+    return _client
+
+
+async def aclose_llm_client():
+    """关闭共享客户端在当前事件循环上的异步连接池（应用退出时在服务事件循环中调用，先于 close_llm_client）"""
+    if _client is not None:
+        await _client.aclose()
+
+
+def close_llm_client():
+    """关闭共享客户端的同步连接池（应用退出时调用）"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
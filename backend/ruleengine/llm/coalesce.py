@@ -0,0 +1,259 @@
+"""
+LLM 请求合并
+- 单飞（single-flight）：相同提示词的并发请求只向上游发送一次，其余请求等待并共享结果
+- 微批（micro-batching）：几毫秒内到达的多个提示词合并为一次批量请求
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+import asyncio
+import threading
+import time
+import weakref
+
+from metrics import registry
+
+
+class SingleFlight:
+    """
+    同步单飞：同一 key 同时只有一个调用在执行
+
+    第一个到达的线程（leader）执行 fn，其余线程等待其结果；
+    leader 抛出的异常同样传递给等待者。调用结束后 key 立即释放，不缓存结果
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+class AsyncSingleFlight:
+    """
+    异步单飞：同一事件循环中同一 key 同时只有一个任务在执行
+
+    上游调用以独立任务运行，等待者通过 asyncio.shield 等待，
+    任一等待者被取消不会取消共享的上游调用
+    """
+
+    def __init__(self):
+        self._calls: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, asyncio.Task]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        calls = self._calls.setdefault(loop, {})
+        task = calls.get(key)
+        if task is None:
+            task = loop.create_task(factory())
+            calls[key] = task
+            task.add_done_callback(lambda _: calls.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+
+class MicroBatcher:
+    """
+    微批请求合并器
+
+    设计思路：
+    1. submit() 将提示词放入待发送队列，立即返回 concurrent.futures.Future；
+       同步调用方 future.result()，异步调用方 asyncio.wrap_future(future)
+    2. 后台线程在第一个提示词到达后最多等待 wait_ms 毫秒，
+       凑满 max_batch 个或超时即组成一批
+    3. 每批通过 send_batch(prompts) -> outputs 一次请求发送，按位置回填各 Future；
+       批请求在小线程池中执行，最多 concurrency 批同时在途
+    4. 批请求失败时，该批所有 Future 均收到同一异常
+    """
+
+    def __init__(
+        self,
+        send_batch: Callable[[List[str]], List[str]],
+        max_batch: int = 16,
+        wait_ms: float = 5,
+        concurrency: int = 4,
+    ):
+        self.send_batch = send_batch
+        self.max_batch = max(1, max_batch)
+        self.wait_seconds = max(0.0, wait_ms) / 1000
+        self.concurrency = max(1, concurrency)
+
+        self._cond = threading.Condition()
+        self._pending: List[Tuple[str, Future]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self._stopping = False
+        self._batches = 0
+        self._prompts = 0
+
+    def submit(self, prompt: str) -> Future:
+        future: Future = Future()
+        with self._cond:
+            if self._stopping:
+                raise RuntimeError("MicroBatcher 已停止")
+            if self._thread is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.concurrency, thread_name_prefix="llm-batch"
+                )
+                self._thread = threading.Thread(target=self._run, name="llm-micro-batcher", daemon=True)
+                self._thread.start()
+            self._pending.append((prompt, future))
+            self._cond.notify()
+        return future
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                # 第一个提示词到达后，最多再等 wait_seconds 凑批
+                deadline = time.monotonic() + self.wait_seconds
+                while len(self._pending) < self.max_batch and not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                self._batches += 1
+                self._prompts += len(batch)
+
+            # 在途批数达到上限时在此等待，期间新到的提示词继续积累成更大的批
+            self._slots.acquire()
+            self._executor.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch: List[Tuple[str, Future]]):
+        try:
+            prompts = [prompt for prompt, _ in batch]
+            try:
+                outputs = self.send_batch(prompts)
+                if len(outputs) != len(prompts):
+                    raise RuntimeError(f"批量响应数量不匹配: 期望 {len(prompts)}，实际 {len(outputs)}")
+            except BaseException as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                return
+            for (_, future), output in zip(batch, outputs):
+                future.set_result(output)
+        finally:
+            self._slots.release()
+
+    def stop(self):
+        """停止后台线程：已提交的提示词仍会发送完毕"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread, executor = self._thread, self._executor
+        if thread is not None:
+            thread.join()
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            batches, prompts, pending = self._batches, self._prompts, len(self._pending)
+        return {
+            "batches": batches,
+            "batched_prompts": prompts,
+            "avg_batch_size": round(prompts / batches, 2) if batches else 0.0,
+            "pending": pending,
+        }
+
+
+single_flight = SingleFlight()
+async_single_flight = AsyncSingleFlight()
+
+_batcher: Optional[MicroBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_micro_batcher() -> Optional[MicroBatcher]:
+    """
+    获取共享的微批合并器
+
+    Returns:
+        合并器实例；LLM_MICRO_BATCH_SIZE<=1 时返回 None（不启用微批）
+    """
+    global _batcher
+    if _batcher is None:
+        from config import get_settings
+        from ruleengine.llm.client import get_llm_client
+
+        settings = get_settings()
+        if settings.LLM_MICRO_BATCH_SIZE <= 1:
+            return None
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(
+                    send_batch=get_llm_client().complete_batch,
+                    max_batch=settings.LLM_MICRO_BATCH_SIZE,
+                    wait_ms=settings.LLM_MICRO_BATCH_WAIT_MS,
+                    concurrency=settings.LLM_MICRO_BATCH_CONCURRENCY,
+                )
+    return _batcher
+
+
+def close_micro_batcher():
+    """停止共享的微批合并器（应用退出时调用）"""
+    global _batcher
+    with _batcher_lock:
+        batcher, _batcher = _batcher, None
+    if batcher is not None:
+        batcher.stop()
+
+
+def _collect_metrics():
+    """抓取时读取单飞合并次数与微批统计"""
+    stats = coalesce_stats()
+    families = [
+        ("qc_llm_coalesced_total", "counter", "单飞合并的 LLM 请求数（未发往上游）", [({}, stats["coalesced"])]),
+    ]
+    batch = stats["micro_batch"]
+    if batch is not None:
+        families += [
+            ("qc_llm_micro_batches_total", "counter", "微批请求次数", [({}, batch["batches"])]),
+            ("qc_llm_micro_batched_prompts_total", "counter", "经微批发送的提示词数", [({}, batch["batched_prompts"])]),
+            ("qc_llm_micro_batch_pending", "gauge", "等待组批的提示词数", [({}, batch["pending"])]),
+        ]
+    return families
+
+
+def coalesce_stats() -> Dict[str, Any]:
+    """单飞合并次数与微批统计"""
+    return {
+        "coalesced": single_flight.coalesced + async_single_flight.coalesced,
+        "micro_batch": _batcher.stats() if _batcher is not None else None,
+    }
+
+
+registry.register_collector(_collect_metrics)
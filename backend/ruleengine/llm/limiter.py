@@ -0,0 +1,285 @@
+"""
+LLM 调用准入控制
+按优先级通道（交互 / 批量）限制并发，并以令牌桶限制请求速率
+"""
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+import asyncio
+import collections
+import threading
+import time
+
+from metrics import registry
+
+
+LANE_INTERACTIVE = "interactive"
+LANE_BATCH = "batch"
+# 通道按优先级从高到低排列
+LANES = (LANE_INTERACTIVE, LANE_BATCH)
+
+# 当前调用所属通道；默认交互通道，批量任务通过 llm_lane(LANE_BATCH) 切换。
+# 引擎的节点线程池、asyncio 任务、asyncio.to_thread 都会复制上下文，通道随调用链传递
+current_lane: ContextVar[str] = ContextVar("llm_lane", default=LANE_INTERACTIVE)
+
+
+@contextmanager
+def llm_lane(lane: str) -> Iterator[None]:
+    """在 with 块内（含其中创建的任务、提交的节点）以指定通道调用 LLM"""
+    if lane not in LANES:
+        raise ValueError(f"未知的 LLM 通道: {lane}")
+    token = current_lane.set(lane)
+    try:
+        yield
+    finally:
+        current_lane.reset(token)
+
+
+class TokenBucket:
+    """令牌桶：每秒补充 rate 个令牌，最多积累 burst 个；rate<=0 表示不限速（调用方持锁）"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_take(self) -> bool:
+        if self.rate <= 0:
+            return True
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def delay(self) -> float:
+        """距离下一个令牌可用的秒数"""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(time.monotonic())
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class _Waiter:
+    __slots__ = ("lane", "enqueued_at", "event", "loop", "future", "granted")
+
+    def __init__(self, lane: str, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.lane = lane
+        self.enqueued_at = time.monotonic()
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+        self.granted = False
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class AdmissionController:
+    """
+    LLM 调用准入控制器
+
+    设计思路：
+    1. 每个通道有独立的等待队列与并发上限，批量任务占满自己的配额也不会挤占交互通道
+    2. 所有通道共享一个令牌桶（LLM_RATE_LIMIT_RPS），令牌按通道优先级分配：
+       有交互请求在等令牌时，批量请求不会拿到令牌
+    3. 同步调用方以 threading.Event 等待，异步调用方以 Future 等待（不阻塞事件循环），
+       两者共用同一套队列与计数，放行统一在 _grant 中完成
+    4. 令牌不足时由定时器在下一个令牌可用时再次放行
+    5. 按通道记录排队等待时间（最近 window 次的 p50/p99、最大值），见 stats()
+    """
+
+    def __init__(
+        self,
+        lane_limits: Dict[str, int],
+        rate: float = 0,
+        burst: float = 1,
+        window: int = 2048,
+    ):
+        self.lane_limits = {lane: max(1, lane_limits.get(lane, 1)) for lane in LANES}
+        self._lock = threading.Lock()
+        self._bucket = TokenBucket(rate, burst)
+        self._timer: Optional[threading.Timer] = None
+        self._queues: Dict[str, collections.deque] = {lane: collections.deque() for lane in LANES}
+        self._in_flight = {lane: 0 for lane in LANES}
+        self._admitted = {lane: 0 for lane in LANES}
+        self._waits: Dict[str, collections.deque] = {
+            lane: collections.deque(maxlen=window) for lane in LANES
+        }
+        self._max_wait = {lane: 0.0 for lane in LANES}
+
+    # ---------- 放行 ----------
+
+    def _grant(self):
+        """按优先级放行等待者（调用方持锁）"""
+        blocked_by_rate = False
+        for lane in LANES:
+            queue = self._queues[lane]
+            while queue and self._in_flight[lane] < self.lane_limits[lane]:
+                if not self._bucket.try_take():
+                    blocked_by_rate = True
+                    break
+                waiter = queue.popleft()
+                self._admit(waiter)
+            if blocked_by_rate:
+                # 高优先级通道在等令牌，低优先级通道不参与分配
+                break
+        if blocked_by_rate and self._timer is None:
+            self._timer = threading.Timer(self._bucket.delay(), self._on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _admit(self, waiter: _Waiter):
+        lane = waiter.lane
+        waited = time.monotonic() - waiter.enqueued_at
+        waiter.granted = True
+        self._in_flight[lane] += 1
+        self._admitted[lane] += 1
+        self._waits[lane].append(waited)
+        if waited > self._max_wait[lane]:
+            self._max_wait[lane] = waited
+        waiter.wake()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            self._grant()
+
+    def _enqueue(self, waiter: _Waiter):
+        with self._lock:
+            self._queues[waiter.lane].append(waiter)
+            self._grant()
+
+    def release(self, lane: str):
+        with self._lock:
+            self._in_flight[lane] -= 1
+            self._grant()
+
+    # ---------- 获取 ----------
+
+    def acquire(self, lane: Optional[str] = None) -> str:
+        """同步获取调用许可（阻塞直到放行），返回所属通道"""
+        waiter = _Waiter(lane or current_lane.get())
+        self._enqueue(waiter)
+        waiter.event.wait()
+        return waiter.lane
+
+    async def acquire_async(self, lane: Optional[str] = None) -> str:
+        """异步获取调用许可；等待期间被取消时退出队列，已放行则归还许可"""
+        waiter = _Waiter(lane or current_lane.get(), asyncio.get_running_loop())
+        self._enqueue(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.granted:
+                    self._in_flight[waiter.lane] -= 1
+                    self._grant()
+                else:
+                    self._queues[waiter.lane].remove(waiter)
+            raise
+        return waiter.lane
+
+    @contextmanager
+    def slot(self, lane: Optional[str] = None) -> Iterator[str]:
+        granted_lane = self.acquire(lane)
+        try:
+            yield granted_lane
+        finally:
+            self.release(granted_lane)
+
+    @asynccontextmanager
+    async def aslot(self, lane: Optional[str] = None):
+        granted_lane = await self.acquire_async(lane)
+        try:
+            yield granted_lane
+        finally:
+            self.release(granted_lane)
+
+    # ---------- 统计 ----------
+
+    @staticmethod
+    def _percentile(values: List[float], q: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = {
+                lane: (
+                    self._in_flight[lane],
+                    len(self._queues[lane]),
+                    self._admitted[lane],
+                    list(self._waits[lane]),
+                    self._max_wait[lane],
+                )
+                for lane in LANES
+            }
+        lanes = {}
+        for lane, (in_flight, queued, admitted, waits, max_wait) in snapshot.items():
+            lanes[lane] = {
+                "limit": self.lane_limits[lane],
+                "in_flight": in_flight,
+                "queued": queued,
+                "admitted": admitted,
+                "wait_p50_ms": round(self._percentile(waits, 0.5) * 1000, 2),
+                "wait_p99_ms": round(self._percentile(waits, 0.99) * 1000, 2),
+                "wait_max_ms": round(max_wait * 1000, 2),
+            }
+        return {"rate_limit_rps": self._bucket.rate, "lanes": lanes}
+
+
+_controller: Optional[AdmissionController] = None
+_controller_lock = threading.Lock()
+
+
+def _collect_metrics():
+    """抓取时读取各通道的在途 / 排队请求数（控制器未创建时不输出）"""
+    if _controller is None:
+        return []
+    lanes = _controller.stats()["lanes"]
+    return [
+        ("qc_llm_admission_in_flight", "gauge", "LLM 准入控制：各通道在途请求数",
+         [({"lane": lane}, data["in_flight"]) for lane, data in lanes.items()]),
+        ("qc_llm_admission_queued", "gauge", "LLM 准入控制：各通道排队请求数",
+         [({"lane": lane}, data["queued"]) for lane, data in lanes.items()]),
+        ("qc_llm_admission_admitted_total", "counter", "LLM 准入控制：各通道累计放行请求数",
+         [({"lane": lane}, data["admitted"]) for lane, data in lanes.items()]),
+    ]
+
+
+registry.register_collector(_collect_metrics)
+
+
+def get_admission_controller() -> AdmissionController:
+    """获取进程内共享的准入控制器（配置取自 Settings）"""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                from config import get_settings
+
+                settings = get_settings()
+                _controller = AdmissionController(
+                    lane_limits={
+                        LANE_INTERACTIVE: settings.LLM_INTERACTIVE_CONCURRENCY,
+                        LANE_BATCH: settings.LLM_BATCH_CONCURRENCY,
+                    },
+                    rate=settings.LLM_RATE_LIMIT_RPS,
+                    burst=settings.LLM_RATE_LIMIT_BURST,
+                )
+    return _controller
@@ -2,44 +2,284 @@
 LLM模型请求封装
 提供统一的LLM调用接口
 """
-from typing import Optional
+from typing import Any, Dict, Optional, Sequence, Set, Tuple
+import asyncio
 import sys
 import os
+import threading
 
 # 添加backend目录到路径，以便导入config
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from config import get_settings
+from ruleengine.llm.cache import get_llm_cache, make_cache_key
+from ruleengine.llm.client import LLMClient, get_llm_client
+from ruleengine.llm.limiter import get_admission_controller
+from ruleengine.regex_tools import TagStreamParser
+from ruleengine.llm.coalesce import (
+    MicroBatcher,
+    async_single_flight,
+    get_micro_batcher,
+    single_flight,
+)
 
 
-def chat_method(prompt: str) -> str:
+# 后台读完剩余流式输出的任务（持有引用，避免任务被垃圾回收）
+_drain_tasks: Set[asyncio.Task] = set()
+
+
+def _request_params(client: LLMClient, batcher: Optional[MicroBatcher]) -> Dict[str, Any]:
+    # 微批走 /completions 接口，输出可能与 /chat/completions 不同，缓存键需区分
+    params = client.cache_params()
+    if batcher is not None:
+        params["batch_path"] = client.batch_path
+    return params
+
+
+def chat_method(prompt: str, use_cache: bool = True) -> str:
     """
-    调用LLM模型
+    调用LLM模型（同步）
+    
+    调用链：响应缓存 -> 单飞合并（相同提示词的并发请求共享一次上游调用）
+    -> 准入控制（按当前通道排队、限速，见 ruleengine.llm.limiter）
+    -> 微批（LLM_MICRO_BATCH_SIZE>1 时）或单条请求。
+    超时、重试、在途上限见 Settings 中的 LLM_* 配置
     
     Args:
         prompt: 提示词
+        use_cache: 是否使用响应缓存
         
     Returns:
-        LLM返回的文本
+        LLM返回的文本；未配置 LLM_BASE_URL 时返回空字符串
     """
     settings = get_settings()
+    if not settings.LLM_BASE_URL:
+        return ""
+    client = get_llm_client()
+    batcher = get_micro_batcher()
+    cache = get_llm_cache() if use_cache else None
+    key = make_cache_key(prompt, **_request_params(client, batcher))
+
+    if cache is not None:
+        answer = cache.get(key)
+        if answer is not None:
+            return answer
+
+    def call() -> str:
+        with get_admission_controller().slot():
+            answer = batcher.submit(prompt).result() if batcher is not None else client.chat(prompt)
+        if cache is not None and answer:
+            cache.put(key, answer)
+        return answer
+
+    if settings.LLM_COALESCE:
+        return single_flight.do(key, call)
+    return call()
+
+
+async def chat_method_async(prompt: str, use_cache: bool = True) -> str:
+    """
+    调用LLM模型（异步，供 async def 节点函数使用）
     
-    # TODO: 实现真实的LLM调用
-    # 这里提供一个占位实现，你需要根据实际使用的LLM服务进行实现
-    # 例如：OpenAI API、本地部署的大模型等
+    内存缓存命中时直接返回；磁盘缓存的查询与写入在线程池中执行，不阻塞事件循环。
+    同一事件循环内相同提示词的并发调用只发送一次上游请求
     
-    # 示例：如果配置了LLM服务
-    if settings.LLM_BASE_URL and settings.LLM_API_KEY:
-        # 调用LLM API
-        # import requests
-        # response = requests.post(settings.LLM_BASE_URL, ...)
-        # return response.json()["content"]
-        pass
+    Args:
+        prompt: 提示词
+        use_cache: 是否使用响应缓存
+        
+    Returns:
+        LLM返回的文本；未配置 LLM_BASE_URL 时返回空字符串
+    """
+    settings = get_settings()
+    if not settings.LLM_BASE_URL:
+        return ""
+    client = get_llm_client()
+    batcher = get_micro_batcher()
+    cache = get_llm_cache() if use_cache else None
+    key = make_cache_key(prompt, **_request_params(client, batcher))
+
+    if cache is not None:
+        answer = cache.peek(key)
+        if answer is None:
+            answer = await asyncio.to_thread(cache.get, key)
+        if answer is not None:
+            return answer
+
+    async def call() -> str:
+        async with get_admission_controller().aslot():
+            if batcher is not None:
+                answer = await asyncio.wrap_future(batcher.submit(prompt))
+            else:
+                answer = await client.achat(prompt)
+        if cache is not None and answer:
+            await asyncio.to_thread(cache.put, key, answer)
+        return answer
+
+    if settings.LLM_COALESCE:
+        return await async_single_flight.do(key, call)
+    return await call()
+
+
+def _stream_cache_keys(client: LLMClient, prompt: str, required_tags: Sequence[str]) -> Tuple[str, str]:
+    # 完整响应与非流式调用共用缓存键；提前取消得到的部分响应只对同样的 required_tags 有效
+    params = client.cache_params()
+    return (
+        make_cache_key(prompt, **params),
+        make_cache_key(prompt, **params, until_tags=sorted(required_tags)),
+    )
+
+
+def _cached_stream_answer(cache, keys: Tuple[str, str]) -> Optional[str]:
+    for key in keys:
+        answer = cache.get(key)
+        if answer is not None:
+            return answer
+    return None
+
+
+def chat_method_stream(
+    prompt: str,
+    required_tags: Sequence[str] = ("conclusion",),
+    cancel_on_complete: bool = True,
+    use_cache: bool = True,
+) -> str:
+    """
+    流式调用LLM模型（同步），所需标签一解析完成即返回
+    
+    以 TagStreamParser 增量解析流式输出，required_tags 都已闭合时：
+    - cancel_on_complete=True：关闭连接，上游停止生成（节省 token）
+    - cancel_on_complete=False：立即返回，剩余输出在后台线程读完并写入缓存
+    流式调用不参与单飞合并与微批，但同样经过准入控制
     
-    # 临时返回空字符串，避免报错
-    # 实际使用时需要替换为真实的LLM调用
-    return ""
+    Args:
+        prompt: 提示词
+        required_tags: 节点需要的标签，如 ("conclusion",)；为空时读完整个响应
+        cancel_on_complete: 标签齐全后是否取消剩余生成
+        use_cache: 是否使用响应缓存
+        
+    Returns:
+        截至所需标签闭合时收到的文本（可直接交给 regex_conclusion 等解析）；
+        未配置 LLM_BASE_URL 时返回空字符串
+    """
+    settings = get_settings()
+    if not settings.LLM_BASE_URL:
+        return ""
+    client = get_llm_client()
+    cache = get_llm_cache() if use_cache else None
+    full_key, partial_key = _stream_cache_keys(client, prompt, required_tags)
+    if cache is not None:
+        answer = _cached_stream_answer(cache, (full_key, partial_key))
+        if answer is not None:
+            return answer
+
+    controller = get_admission_controller()
+    lane = controller.acquire()
+    stream = client.stream_chat(prompt)
+    parser = TagStreamParser()
+    try:
+        for chunk in stream:
+            parser.feed(chunk)
+            if required_tags and parser.has_all(required_tags):
+                break
+        else:
+            # 所需标签闭合前响应已结束（或未指定标签）：得到的是完整响应
+            controller.release(lane)
+            if cache is not None and parser.text:
+                cache.put(full_key, parser.text)
+            return parser.text
+    except BaseException:
+        stream.close()
+        controller.release(lane)
+        raise
+
+    answer = parser.text
+    if cancel_on_complete:
+        stream.close()
+        controller.release(lane)
+        if cache is not None:
+            cache.put(partial_key, answer)
+        return answer
+
+    def drain():
+        try:
+            for chunk in stream:
+                parser.feed(chunk)
+            if cache is not None:
+                cache.put(full_key, parser.text)
+        except Exception:
+            pass  # 节点已拿到所需结果，后台读取失败只影响缓存
+        finally:
+            controller.release(lane)
+
+    threading.Thread(target=drain, name="llm-stream-drain", daemon=True).start()
+    return answer
+
+
+async def chat_method_stream_async(
+    prompt: str,
+    required_tags: Sequence[str] = ("conclusion",),
+    cancel_on_complete: bool = True,
+    use_cache: bool = True,
+) -> str:
+    """
+    chat_method_stream 的异步版本
+
+    cancel_on_complete=False 时剩余输出由后台任务读完并写入缓存
+    """
+    settings = get_settings()
+    if not settings.LLM_BASE_URL:
+        return ""
+    client = get_llm_client()
+    cache = get_llm_cache() if use_cache else None
+    full_key, partial_key = _stream_cache_keys(client, prompt, required_tags)
+    if cache is not None:
+        answer = cache.peek(full_key) or cache.peek(partial_key)
+        if answer is None:
+            answer = await asyncio.to_thread(_cached_stream_answer, cache, (full_key, partial_key))
+        if answer is not None:
+            return answer
+
+    controller = get_admission_controller()
+    lane = await controller.acquire_async()
+    stream = client.astream_chat(prompt)
+    parser = TagStreamParser()
+    complete = True
+    try:
+        async for chunk in stream:
+            parser.feed(chunk)
+            if required_tags and parser.has_all(required_tags):
+                complete = False
+                break
+    except BaseException:
+        await stream.aclose()
+        controller.release(lane)
+        raise
 
+    answer = parser.text
+    if complete:
+        controller.release(lane)
+        if cache is not None and answer:
+            await asyncio.to_thread(cache.put, full_key, answer)
+        return answer
+    if cancel_on_complete:
+        await stream.aclose()
+        controller.release(lane)
+        if cache is not None:
+            await asyncio.to_thread(cache.put, partial_key, answer)
+        return answer
 
-# 如果需要，可以添加更多LLM相关函数
-# 例如：流式调用、批量调用等
+    async def drain():
+        try:
+            async for chunk in stream:
+                parser.feed(chunk)
+            if cache is not None:
+                await asyncio.to_thread(cache.put, full_key, parser.text)
+        except Exception:
+            pass  # 节点已拿到所需结果，后台读取失败只影响缓存
+        finally:
+            controller.release(lane)
 
+    task = asyncio.get_running_loop().create_task(drain())
+    _drain_tasks.add(task)
+    task.add_done_callback(_drain_tasks.discard)
+    return answer
@@ -2,9 +2,55 @@
 正则工具函数
 用于从LLM返回的文本中提取结构化信息
 """
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 import re
 
 
+# LLM 输出中约定的标签
+KNOWN_TAGS = ("conclusion", "reason", "thinking", "content", "times")
+
+
+@lru_cache(maxsize=128)
+def _tag_pattern(tags: Tuple[str, ...]) -> "re.Pattern":
+    """编译只匹配指定标签的模式（按标签组合缓存）"""
+    names = "|".join(re.escape(tag) for tag in sorted(tags, key=len, reverse=True))
+    return re.compile(rf"<({names})>(.*?)</\1>", re.DOTALL)
+
+
+@lru_cache(maxsize=128)
+def _open_tag_pattern(tags: Tuple[str, ...]) -> "re.Pattern":
+    """编译只匹配指定开始标签的模式（按标签组合缓存）"""
+    names = "|".join(re.escape(tag) for tag in sorted(tags, key=len, reverse=True))
+    return re.compile(rf"<({names})>")
+
+
+def _first_tag(text: str, tag: str) -> Optional[str]:
+    match = _tag_pattern((tag,)).search(text)
+    return match.group(2).strip() if match else None
+
+
+def extract_tags(text: str, tags: Optional[Sequence[str]] = None) -> Dict[str, str]:
+    """
+    一次扫描提取文本中的全部 <tag>...</tag>
+    
+    结果与对每个标签分别调用 regex_* 系列相同：同一标签出现多次时取第一次出现的内容，
+    内容去除首尾空白；外层标签内部的标签同样会被提取（如 <thinking> 中的 <conclusion>）
+    
+    Args:
+        text: 待解析的文本
+        tags: 只提取这些标签；为 None 时提取全部标签
+        
+    Returns:
+        {标签名: 内容}，只包含找到的标签
+    """
+    if not text:
+        return {}
+    parser = TagStreamParser(tags)
+    parser.feed(text)
+    return parser.tags
+
+
 def regex_conclusion(text: str) -> Optional[str]:
     """
     提取 <conclusion> 标签中的内容
@@ -15,10 +61,7 @@ def regex_conclusion(text: str) -> Optional[str]:
     Returns:
         结论文本，如果未找到则返回None
     """
-    matches = re.findall(r"<conclusion>(.*?)</conclusion>", text, re.DOTALL)
-    if matches:
-        return matches[0].strip()
-    return None
+    return _first_tag(text, "conclusion")
 
 
 def regex_reason(text: str) -> Optional[str]:
@@ -31,10 +74,7 @@ def regex_reason(text: str) -> Optional[str]:
     Returns:
         原因文本，如果未找到则返回None
     """
-    matches = re.findall(r"<reason>(.*?)</reason>", text, re.DOTALL)
-    if matches:
-        return matches[0].strip()
-    return None
+    return _first_tag(text, "reason")
 
 
 def regex_thinking(text: str) -> Optional[str]:
@@ -47,10 +87,7 @@ def regex_thinking(text: str) -> Optional[str]:
     Returns:
         思考过程文本，如果未找到则返回None
     """
-    matches = re.findall(r"<thinking>(.*?)</thinking>", text, re.DOTALL)
-    if matches:
-        return matches[0].strip()
-    return None
+    return _first_tag(text, "thinking")
 
 
 def regex_content(text: str) -> Optional[str]:
@@ -63,10 +100,7 @@ def regex_content(text: str) -> Optional[str]:
     Returns:
         内容文本，如果未找到则返回None
     """
-    matches = re.findall(r"<content>(.*?)</content>", text, re.DOTALL)
-    if matches:
-        return matches[0].strip()
-    return None
+    return _first_tag(text, "content")
 
 
 def regex_times(text: str) -> Optional[str]:
@@ -79,8 +113,86 @@ def regex_times(text: str) -> Optional[str]:
     Returns:
         时间信息文本，如果未找到则返回None
     """
-    matches = re.findall(r"<times>(.*?)</times>", text, re.DOTALL)
-    if matches:
-        return matches[0].strip()
-    return None
+    return _first_tag(text, "times")
+
+
+class TagStreamParser:
+    """
+    流式标签解析器
+
+    逐段喂入 LLM 的流式输出，标签一闭合即可取到内容，不必等待完整响应。
+    与 regex_* 系列一致：每个标签取第一次出现的内容并去除首尾空白；
+    外层标签内部的标签同样会被提取（如 <thinking> 中的 <conclusion>）
+
+    用法：
+        parser = TagStreamParser()
+        for chunk in stream:
+            parser.feed(chunk)
+            if parser.has_all(["conclusion"]):
+                break
+        parser.tags["conclusion"]
+    """
+
+    _OPEN_PATTERN = re.compile(r"<([A-Za-z_][\w-]*)>")
+
+    def __init__(self, tags: Optional[Iterable[str]] = None):
+        """
+        Args:
+            tags: 只解析这些标签；为 None 时解析全部 <tag>...</tag>
+        """
+        if tags is None:
+            self._open_pattern = self._OPEN_PATTERN
+            self._max_open_len = 64
+        else:
+            names = tuple(sorted(set(tags)))
+            self._open_pattern = _open_tag_pattern(names)
+            self._max_open_len = max((len(name) for name in names), default=0) + 2
+        self.tags: Dict[str, str] = {}
+        self._buffer = ""
+        self._pos = 0
+        # 已遇到开始标签、尚未闭合的标签：{标签名: [内容起点, 下次查找结束标签的位置]}
+        self._open: Dict[str, List[int]] = {}
+
+    @property
+    def text(self) -> str:
+        """已接收的全部文本"""
+        return self._buffer
+
+    def feed(self, chunk: str) -> List[str]:
+        """
+        追加一段文本
+
+        设计思路：
+        1. 开始标签只向前扫描一次，每个标签名只记录第一次出现的位置
+        2. 未闭合的标签各自记录结束标签的查找位置，多个标签可同时处于打开状态，
+           因此嵌套在外层标签内部的标签也能在闭合时立即取到
+
+        Returns:
+            本次新闭合的标签名列表（按闭合位置排序）
+        """
+        self._buffer += chunk
+        buffer = self._buffer
+        for match in self._open_pattern.finditer(buffer, self._pos):
+            name = match.group(1)
+            if name not in self.tags and name not in self._open:
+                self._open[name] = [match.end(), match.end()]
+            self._pos = match.end()
+        # 末尾可能是被截断的开始标签，保留这部分下次重新扫描
+        self._pos = max(self._pos, len(buffer) - self._max_open_len)
+
+        closed = []
+        for name, state in list(self._open.items()):
+            start, search_from = state
+            closing = f"</{name}>"
+            end = buffer.find(closing, search_from)
+            if end < 0:
+                state[1] = max(start, len(buffer) - len(closing) + 1)
+                continue
+            self.tags[name] = buffer[start:end].strip()
+            del self._open[name]
+            closed.append((end, name))
+        return [name for _, name in sorted(closed)]
 
+    def has_all(self, tags: Iterable[str]) -> bool:
+        """指定标签是否都已解析完成"""
+        return all(tag in self.tags for tag in tags)
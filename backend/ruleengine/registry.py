@@ -16,7 +16,8 @@ def register_function(
     category: str = "通用",
     inputs: List[dict] = None,
     outputs: dict = None,
-    tags: List[str] = None
+    tags: List[str] = None,
+    pure: bool = False
 ):
     """
     函数注册装饰器
@@ -25,6 +26,8 @@ def register_function(
     1. 通过装饰器自动注册函数到全局注册表
     2. 记录函数的元数据（描述、输入输出、分类等）
     3. 支持前端动态获取可用函数列表
+    4. 支持协程函数（async def），引擎的异步执行路径直接 await，
+       同步执行路径在独立事件循环中运行
     
     使用示例：
         @register_function(
@@ -44,6 +47,8 @@ def register_function(
         inputs: 输入参数说明
         outputs: 输出结构说明
         tags: 标签列表
+        pure: 是否为纯函数（相同参数、同一份病历上结果恒定且无副作用）。
+            纯函数节点在同一病历的多条规则间按 (函数, 解析后参数) 去重，只执行一次
     """
     if inputs is None:
         inputs = []
@@ -70,6 +75,8 @@ def register_function(
             "inputs": inputs,
             "outputs": outputs,
             "tags": tags,
+            "pure": pure,
+            "is_async": inspect.iscoroutinefunction(func),
             "original_name": func.__name__
         }
 
@@ -0,0 +1,102 @@
+"""
+文本统计
+一次遍历得到总长度、中文字符、数字、标点、空白与行数，供计数类函数共用
+"""
+from collections import Counter
+from dataclasses import dataclass
+from itertools import islice
+from typing import Dict
+import re
+import unicodedata
+
+
+# 中文字符范围：CJK 统一表意文字、扩展 A、兼容表意文字
+CJK_RANGES = ((0x4E00, 0x9FFF), (0x3400, 0x4DBF), (0xF900, 0xFAFF))
+CJK_PATTERN = re.compile(r'[\u4e00-\u9fff\u3400-\u4dbf\uf900-\ufaff]')
+
+# 字符类别
+CHAR_CJK = "cjk"
+CHAR_DIGIT = "digit"
+CHAR_PUNCTUATION = "punctuation"
+CHAR_WHITESPACE = "whitespace"
+CHAR_OTHER = "other"
+
+# 字符 -> 类别 的缓存，进程内共享；只缓存基本多文种平面（BMP，含常用汉字与 CJK 范围）的字符，
+# 条目数不超过 65536，辅助平面字符（emoji、生僻字等）每次现场判断，避免任意输入使缓存无限增长
+_CACHE_MAX_CODE = 0xFFFF
+_char_classes: Dict[str, str] = {}
+
+
+def classify_char(ch: str) -> str:
+    """判断单个字符的类别（BMP 字符的结果缓存）"""
+    category = _char_classes.get(ch)
+    if category is None:
+        code = ord(ch)
+        if any(low <= code <= high for low, high in CJK_RANGES):
+            category = CHAR_CJK
+        elif ch.isdecimal():
+            # 与正则 \d 一致（十进制数字，含全角数字；不含上标 ²）
+            category = CHAR_DIGIT
+        elif unicodedata.category(ch).startswith("P"):
+            category = CHAR_PUNCTUATION
+        elif ch.isspace():
+            category = CHAR_WHITESPACE
+        else:
+            category = CHAR_OTHER
+        if code <= _CACHE_MAX_CODE:
+            _char_classes[ch] = category
+    return category
+
+
+@dataclass(frozen=True)
+class TextStats:
+    """文本统计结果"""
+    length: int
+    cjk: int
+    digits: int
+    punctuation: int
+    whitespace: int
+    lines: int
+
+    @property
+    def non_cjk(self) -> int:
+        return self.length - self.cjk
+
+
+def compute_text_stats(text: str) -> TextStats:
+    """
+    统计文本
+
+    设计思路：
+    1. Counter 在 C 层一次遍历文本，得到每个不同字符的出现次数，不生成匹配字符列表
+    2. 只对不同字符（通常几百到几千个）按缓存的类别累加，与文本长度无关
+    3. 行数为换行符数 + 1（空文本为 0）
+
+    Args:
+        text: 待统计的文本
+
+    Returns:
+        统计结果
+    """
+    if not text:
+        return TextStats(length=0, cjk=0, digits=0, punctuation=0, whitespace=0, lines=0)
+
+    totals = {CHAR_CJK: 0, CHAR_DIGIT: 0, CHAR_PUNCTUATION: 0, CHAR_WHITESPACE: 0, CHAR_OTHER: 0}
+    classes = _char_classes
+    for ch, count in Counter(text).items():
+        category = classes.get(ch) or classify_char(ch)
+        totals[category] += count
+
+    return TextStats(
+        length=len(text),
+        cjk=totals[CHAR_CJK],
+        digits=totals[CHAR_DIGIT],
+        punctuation=totals[CHAR_PUNCTUATION],
+        whitespace=totals[CHAR_WHITESPACE],
+        lines=text.count("\n") + 1,
+    )
+
+
+def cjk_preview(text: str, limit: int = 10) -> str:
+    """文本中前 limit 个中文字符（找到 limit 个即停止扫描）"""
+    return "".join(match.group() for match in islice(CJK_PATTERN.finditer(text), limit))
@@ -1,7 +1,9 @@
 import json
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 from pydantic import BaseModel, Field, field_validator
 
+from config import get_settings
+
 
 class RuleBase(BaseModel):
     name: str
@@ -64,10 +66,15 @@ class RuleOut(BaseModel):
         return v or {}
 
 
+# 执行证据级别（见 ruleengine.core.evidence），未指定时沿用规则配置或 Settings.EVIDENCE_LEVEL
+EvidenceLevel = Literal["none", "fail_only", "summary", "full"]
+
+
 class ExecuteRequest(BaseModel):
     rule_id: int
     medical_record: Dict[str, Any]
     medical_id: Optional[str] = None
+    evidence_level: Optional[EvidenceLevel] = None
 
 
 class ExecuteResponse(BaseModel):
@@ -82,4 +89,37 @@ class ExecuteResponse(BaseModel):
     explanation: str
     type: Optional[str] = None
     fields_name: List[List[str]] = Field(default_factory=list)
+    medical_id: Optional[str] = None
+
+
+class BatchExecuteItem(BaseModel):
+    medical_id: Optional[str] = None
+    medical_record: Dict[str, Any]
+
+
+class BatchExecuteRequest(BaseModel):
+    rule_id: int
+    # 单次请求的病历数上限：整批结果在内存中组装后一次返回，过大的请求应由调用方分批
+    records: List[BatchExecuteItem] = Field(..., max_length=get_settings().BATCH_MAX_RECORDS)
+    use_processes: bool = False  # CPU 密集型规则可使用进程池并行执行
+    evidence_level: Optional[EvidenceLevel] = None
+
+
+class BatchExecuteResponse(BaseModel):
+    rule_id: int
+    total: int
+    results: List[ExecuteResponse]
+
 
+class ExecuteAllRequest(BaseModel):
+    medical_record: Dict[str, Any]
+    medical_id: Optional[str] = None
+    module: Optional[str] = None  # 仅执行该模块下的已发布规则
+    evidence_level: Optional[EvidenceLevel] = None
+
+
+class ExecuteAllResponse(BaseModel):
+    medical_id: Optional[str] = None
+    total: int
+    total_deduct: int
+    results: List[ExecuteResponse]
@@ -1,43 +1,50 @@
+import asyncio
 import json
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from sqlalchemy.orm import Session
 
-from models.rule import Rule, RuleExecutionRecord
-from services.rule_service import get_rule
-from schemas.rule import ExecuteResponse
+from services.record_writer import commit_rows, is_buffered, record_writer
+from services.rule_cache import CachedRule, published_rule_cache
+from schemas.rule import BatchExecuteItem, ExecuteResponse
 from ruleengine.core.engine import RuleEngine  # 使用新的规则引擎
+from ruleengine.batch_runner import get_process_runner
+from ruleengine.llm.limiter import LANE_BATCH, llm_lane
 
 
-def execute_rule_by_id(
-    db: Session,
-    rule_id: int,
-    medical_record: Dict[str, Any],
-    medical_id: Optional[str] = None,
-) -> Optional[Dict[str, Any]]:
-    rule: Rule = get_rule(db, rule_id)
-    if not rule or rule.status != "published":
-        return None
+def _get_published_engine(db: Session, rule_id: int):
+    # 已发布规则及其执行计划来自进程内缓存，命中时不访问数据库
+    rule = published_rule_cache.get(db, rule_id)
+    if rule is None:
+        return None, None
+    return rule, RuleEngine.from_plan(rule.plan)
 
-    rule_config = rule.config_dict()
-    engine = RuleEngine(rule_config)
 
-    result = engine.execute(medical_record)
+async def _get_published_engine_async(db: Session, rule_id: int):
+    # 缓存命中时直接返回，未命中才到线程池查询数据库
+    rule = published_rule_cache.peek(rule_id)
+    if rule is None:
+        return await asyncio.to_thread(_get_published_engine, db, rule_id)
+    return rule, RuleEngine.from_plan(rule.plan)
 
-    record = RuleExecutionRecord(
+
+def _execution_record_row(rule: CachedRule, result: Dict[str, Any], medical_id: Optional[str]) -> Dict[str, Any]:
+    answer = result.get("answer")
+    return dict(
         rule_id=rule.id,
         rule_version=rule.version,
         medical_id=medical_id,
         passed=result.get("passed"),
         flag=result.get("flag", 0),
         deduct=result.get("deduct", 0),
+        duration_ms=result.get("duration_ms", 0),
         explanation=result.get("explanation"),
-        answer=json.dumps(result.get("answer"), ensure_ascii=False) if result.get("answer") else None,
-        error=result.get("answer", {}).get("error") if isinstance(result.get("answer"), dict) else None,
+        answer=json.dumps(answer, ensure_ascii=False) if answer else None,
+        error=answer.get("error") if isinstance(answer, dict) else None,
     )
-    db.add(record)
-    db.commit()
 
+
+def _to_response(rule: CachedRule, result: Dict[str, Any], medical_id: Optional[str]) -> Dict[str, Any]:
     return ExecuteResponse(
         rule_id=rule.id,  # 使用数据库中的整数ID，而不是配置中的字符串ID
         rule_name=result.get("rule_name"),
@@ -50,5 +57,194 @@ def execute_rule_by_id(
         explanation=result.get("explanation"),
         type=result.get("type"),
         fields_name=result.get("fields_name") or [],
+        medical_id=medical_id,
     ).dict()
 
+
+def execute_rule_by_id(
+    db: Session,
+    rule_id: int,
+    medical_record: Dict[str, Any],
+    medical_id: Optional[str] = None,
+    evidence_level: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    rule, engine = _get_published_engine(db, rule_id)
+    if rule is None:
+        return None
+
+    result = engine.execute(medical_record, evidence_level=evidence_level)
+
+    response = _to_response(rule, result, medical_id)
+    save_execution_rows(db, [_execution_record_row(rule, result, medical_id)])
+    return response
+
+
+async def execute_rule_by_id_async(
+    db: Session,
+    rule_id: int,
+    medical_record: Dict[str, Any],
+    medical_id: Optional[str] = None,
+    evidence_level: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """execute_rule_by_id 的异步版本：数据库操作在线程池中执行，规则在事件循环中执行"""
+    rule, engine = await _get_published_engine_async(db, rule_id)
+    if rule is None:
+        return None
+
+    result = await engine.execute_async(medical_record, evidence_level=evidence_level)
+
+    response = _to_response(rule, result, medical_id)
+    await save_execution_rows_async(db, [_execution_record_row(rule, result, medical_id)])
+    return response
+
+
+def execute_rule_batch(
+    db: Session,
+    rule_id: int,
+    items: List[BatchExecuteItem],
+    evidence_level: Optional[str] = None,
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    对多份病历执行同一规则
+
+    规则只查询、编译一次，执行记录通过一次多行 INSERT 写入并统一提交；
+    规则中的 LLM 调用走批量通道，不挤占交互请求
+    """
+    rule, engine = _get_published_engine(db, rule_id)
+    if rule is None:
+        return None
+
+    with llm_lane(LANE_BATCH):
+        results = engine.execute_many((item.medical_record for item in items), evidence_level)
+    responses, rows = _build_batch(rule, items, results)
+    save_execution_rows(db, rows)
+    return responses
+
+
+async def execute_rule_batch_async(
+    db: Session,
+    rule_id: int,
+    items: List[BatchExecuteItem],
+    use_processes: bool = False,
+    evidence_level: Optional[str] = None,
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    execute_rule_batch 的异步版本
+
+    默认多份病历在事件循环中并发执行（适合 I/O 密集型规则）；
+    use_processes=True 时分块提交到共享进程池（适合 CPU 密集型规则）
+    """
+    rule, engine = await _get_published_engine_async(db, rule_id)
+    if rule is None:
+        return None
+
+    medical_records = [item.medical_record for item in items]
+    with llm_lane(LANE_BATCH):
+        if use_processes:
+            results = await asyncio.to_thread(
+                get_process_runner().execute_many,
+                rule.plan.config.to_dict(),
+                medical_records,
+                rule.id,
+                rule.version,
+                evidence_level,
+            )
+        else:
+            results = await engine.execute_many_async(medical_records, evidence_level=evidence_level)
+    responses, rows = _build_batch(rule, items, results)
+    await save_execution_rows_async(db, rows)
+    return responses
+
+
+def _build_batch(
+    rule: CachedRule,
+    items: List[BatchExecuteItem],
+    results: List[Dict[str, Any]],
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    responses = [_to_response(rule, result, item.medical_id) for item, result in zip(items, results)]
+    rows = [
+        _execution_record_row(rule, result, item.medical_id)
+        for item, result in zip(items, results)
+    ]
+    return responses, rows
+
+
+def execute_published_rules(
+    db: Session,
+    medical_record: Dict[str, Any],
+    medical_id: Optional[str] = None,
+    module: Optional[str] = None,
+    evidence_level: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    对一份病历执行全部已发布规则（可按模块过滤）
+
+    规则集一次查询得到；各规则共享同一个节点结果缓存，
+    相同的纯函数节点只执行一次；执行记录批量写入
+    """
+    rules = published_rule_cache.list_published(db, module)
+
+    shared_cache: Dict[Any, Any] = {}
+    results = [
+        RuleEngine.from_plan(rule.plan).execute(medical_record, shared_cache, evidence_level)
+        for rule in rules
+    ]
+    responses, rows = _build_record_results(rules, results, medical_id)
+    save_execution_rows(db, rows)
+    return responses
+
+
+async def execute_published_rules_async(
+    db: Session,
+    medical_record: Dict[str, Any],
+    medical_id: Optional[str] = None,
+    module: Optional[str] = None,
+    evidence_level: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """execute_published_rules 的异步版本，各规则在事件循环中并发执行"""
+    if published_rule_cache.is_complete():
+        rules = published_rule_cache.list_published(db, module)
+    else:
+        rules = await asyncio.to_thread(published_rule_cache.list_published, db, module)
+
+    shared_cache: Dict[Any, Any] = {}
+    results = await asyncio.gather(*(
+        RuleEngine.from_plan(rule.plan).execute_async(medical_record, shared_cache, evidence_level)
+        for rule in rules
+    ))
+    responses, rows = _build_record_results(rules, results, medical_id)
+    await save_execution_rows_async(db, rows)
+    return responses
+
+
+def _build_record_results(
+    rules: List[CachedRule],
+    results: List[Dict[str, Any]],
+    medical_id: Optional[str],
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    responses = []
+    rows = []
+    for rule, result in zip(rules, results):
+        responses.append(_to_response(rule, result, medical_id))
+        rows.append(_execution_record_row(rule, result, medical_id))
+    return responses, rows
+
+
+def save_execution_rows(db: Session, rows: List[Dict[str, Any]]):
+    """
+    保存执行记录
+
+    RECORD_DURABILITY=buffered 时放入后台写入器的缓冲（已满时等待）；
+    否则以一条多行 INSERT 写入并提交后返回
+    """
+    if is_buffered():
+        record_writer.submit(rows)
+    else:
+        commit_rows(db, rows)
+
+
+async def save_execution_rows_async(db: Session, rows: List[Dict[str, Any]]):
+    """save_execution_rows 的异步版本：缓冲未满时直接放入，不占用线程池"""
+    if is_buffered() and record_writer.submit(rows, block=False):
+        return
+    await asyncio.to_thread(save_execution_rows, db, rows)
@@ -0,0 +1,189 @@
+"""
+执行记录后台批量写入
+将 RuleExecutionRecord 行缓冲在有界队列中，由后台线程按数量/时间阈值以多行 INSERT 批量写入
+"""
+import collections
+import logging
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from config import get_settings
+from db import SessionLocal
+from metrics import registry
+from models.rule import RuleExecutionRecord
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_SYNC = "sync"  # 提交后再响应
+DURABILITY_BUFFERED = "buffered"  # 进入缓冲队列即响应，后台批量提交
+
+
+def commit_rows(db: Session, rows: List[Dict[str, Any]]):
+    """以一条多行 INSERT 写入执行记录并提交"""
+    if rows:
+        db.execute(insert(RuleExecutionRecord), rows)
+        db.commit()
+
+
+class ExecutionRecordWriter:
+    """
+    执行记录批量写入器
+
+    设计思路：
+    1. 有界缓冲（按行数计），写满时 submit 阻塞，形成背压，内存占用可控
+    2. 后台线程在缓冲达到 flush_size 行或距上次写入超过 flush_interval 秒时写入
+    3. stop() 时写完缓冲中的全部记录再退出
+    4. stats() 提供队列深度、写入耗时等运行指标
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_queue_rows: Optional[int] = None,
+        flush_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+    ):
+        settings = get_settings()
+        self._session_factory = session_factory
+        self.max_queue_rows = max_queue_rows or settings.RECORD_QUEUE_SIZE
+        self.flush_size = flush_size or settings.RECORD_FLUSH_SIZE
+        self.flush_interval = (
+            flush_interval if flush_interval is not None else settings.RECORD_FLUSH_INTERVAL_MS / 1000
+        )
+
+        self._buffer: Deque[Dict[str, Any]] = collections.deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+        # 运行指标
+        self._flush_count = 0
+        self._flushed_rows = 0
+        self._failed_rows = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and not self._stopping
+
+    def start(self):
+        """启动后台写入线程"""
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="record-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 30):
+        """停止后台线程，退出前写完缓冲中的记录"""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def submit(self, rows: List[Dict[str, Any]], block: bool = True) -> bool:
+        """
+        提交执行记录行
+
+        Args:
+            rows: 执行记录行（RuleExecutionRecord 的列字典）
+            block: 缓冲已满时是否等待
+
+        Returns:
+            是否已放入缓冲；block=False 且缓冲已满时返回 False
+        """
+        if not rows:
+            return True
+        with self._cond:
+            # 缓冲为空时允许一次放入超过上限的批次，避免大批量请求永远无法写入
+            while self._buffer and len(self._buffer) + len(rows) > self.max_queue_rows:
+                if not block:
+                    return False
+                self._cond.wait()
+            self._buffer.extend(rows)
+            if len(self._buffer) >= self.flush_size:
+                self._cond.notify_all()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """运行指标：队列深度、累计写入、写入耗时（毫秒）"""
+        return {
+            "queue_depth": len(self._buffer),
+            "queue_capacity": self.max_queue_rows,
+            "flush_count": self._flush_count,
+            "flushed_rows": self._flushed_rows,
+            "failed_rows": self._failed_rows,
+            "last_flush_ms": round(self._last_flush_ms, 2),
+            "max_flush_ms": round(self._max_flush_ms, 2),
+            "avg_flush_ms": round(self._total_flush_ms / self._flush_count, 2) if self._flush_count else 0.0,
+        }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.flush_interval
+                while not self._stopping and len(self._buffer) < self.flush_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if not self._buffer and self._stopping:
+                    return
+                batch = [self._buffer.popleft() for _ in range(min(self.flush_size, len(self._buffer)))]
+                # 释放出空间，唤醒等待中的提交方
+                self._cond.notify_all()
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch: List[Dict[str, Any]]):
+        start = time.perf_counter()
+        db = self._session_factory()
+        try:
+            commit_rows(db, batch)
+            self._flushed_rows += len(batch)
+        except Exception:
+            db.rollback()
+            self._failed_rows += len(batch)
+            logger.exception("执行记录批量写入失败，丢弃 %d 条记录", len(batch))
+        finally:
+            db.close()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._flush_count += 1
+        self._last_flush_ms = elapsed_ms
+        self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+        self._total_flush_ms += elapsed_ms
+
+
+record_writer = ExecutionRecordWriter()
+
+
+def _collect_metrics():
+    """抓取时读取缓冲写入的队列深度与累计写入"""
+    stats = record_writer.stats()
+    return [
+        ("qc_record_writer_queue_depth", "gauge", "执行记录缓冲队列中待写入的行数", [({}, stats["queue_depth"])]),
+        ("qc_record_writer_rows_total", "counter", "缓冲写入的执行记录行数（result=flushed/failed）", [
+            ({"result": "flushed"}, stats["flushed_rows"]),
+            ({"result": "failed"}, stats["failed_rows"]),
+        ]),
+        ("qc_record_writer_flushes_total", "counter", "缓冲写入的批次数", [({}, stats["flush_count"])]),
+        ("qc_record_writer_last_flush_seconds", "gauge", "最近一次批量写入耗时（秒）",
+         [({}, stats["last_flush_ms"] / 1000)]),
+    ]
+
+
+registry.register_collector(_collect_metrics)
+
+
+def is_buffered() -> bool:
+    """当前是否使用缓冲写入（RECORD_DURABILITY=buffered 且后台线程已启动）"""
+    return get_settings().RECORD_DURABILITY == DURABILITY_BUFFERED and record_writer.running
@@ -0,0 +1,248 @@
+"""
+已发布规则缓存
+进程内缓存已发布规则及其编译后的执行计划，执行接口读取规则元数据时不访问数据库
+"""
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from config import get_settings
+from db import SessionLocal
+from metrics import CACHE_REQUESTS
+from models.rule import Rule, RuleStatus
+from ruleengine.core.plan import ExecutionPlan, get_cached_plan, invalidate_plan
+
+logger = logging.getLogger(__name__)
+
+_RULE_CACHE_HITS = CACHE_REQUESTS.labels("published_rule", "hit")
+_RULE_CACHE_MISSES = CACHE_REQUESTS.labels("published_rule", "miss")
+
+
+@dataclass(frozen=True)
+class CachedRule:
+    """已发布规则的只读快照（与会话无关，可跨请求、跨线程共享）"""
+    id: int
+    name: str
+    module: Optional[str]
+    version: int
+    updated_at: Optional[datetime]
+    plan: ExecutionPlan
+
+    @classmethod
+    def from_rule(cls, rule: Rule) -> "CachedRule":
+        return cls(
+            id=rule.id,
+            name=rule.name,
+            module=rule.module,
+            version=rule.version,
+            updated_at=rule.updated_at,
+            plan=get_cached_plan(rule.id, rule.version, rule.config_dict),
+        )
+
+
+def _load_rule(rule: Rule) -> Optional[CachedRule]:
+    """
+    编译并加载单条已发布规则；配置无法编译（如引用了未注册的函数）时记录日志并返回 None，
+    该规则不进入缓存，不影响其他规则
+    """
+    try:
+        return CachedRule.from_rule(rule)
+    except Exception:
+        logger.exception("已发布规则 %s（版本 %s）编译失败，未加入缓存", rule.id, rule.version)
+        return None
+
+
+class PublishedRuleCache:
+    """
+    已发布规则缓存
+
+    设计思路：
+    1. 已发布规则不可编辑（update_rule 拒绝修改），缓存内容只会因发布、下线、重新发布而变化
+    2. 本进程内的发布/状态变更直接更新缓存（refresh_rule）
+    3. 后台线程定期比对数据库中已发布规则的 (版本, updated_at)，
+       使多个 worker 进程在 RULE_CACHE_REFRESH_SECONDS 内收敛
+    4. 命中时只读内存；未命中（首次访问）才查询数据库
+    5. 批量加载与同步时逐条编译，编译失败的规则记录日志后不进入缓存；
+       按 (版本, updated_at) 记住失败的规则，规则未变化时同步不再重复编译
+    """
+
+    def __init__(self):
+        self._rules: Dict[int, CachedRule] = {}
+        self._complete = False  # 是否已加载全部已发布规则（供按模块列举使用）
+        self._invalid: Dict[int, Tuple[int, Optional[datetime]]] = {}  # 编译失败的规则及其 (版本, updated_at)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def peek(self, rule_id: int) -> Optional[CachedRule]:
+        """只查内存，不访问数据库（未命中时调用方转入 get，由 get 记录未命中）"""
+        cached = self._rules.get(rule_id)
+        if cached is not None:
+            _RULE_CACHE_HITS.inc()
+        return cached
+
+    def is_complete(self) -> bool:
+        """是否已加载全部已发布规则（为 True 时 list_published 不访问数据库）"""
+        return self._complete
+
+    def get(self, db: Session, rule_id: int) -> Optional[CachedRule]:
+        """获取已发布规则；规则不存在或未发布时返回 None"""
+        cached = self._rules.get(rule_id)
+        if cached is not None:
+            _RULE_CACHE_HITS.inc()
+            return cached
+
+        _RULE_CACHE_MISSES.inc()
+        rule = db.query(Rule).filter(Rule.id == rule_id).first()
+        if not rule or rule.status != RuleStatus.published.value:
+            return None
+        cached = CachedRule.from_rule(rule)
+        with self._lock:
+            self._rules[rule_id] = cached
+        return cached
+
+    def list_published(self, db: Session, module: Optional[str] = None) -> List[CachedRule]:
+        """列出已发布规则（按 id 排序，可按模块过滤）"""
+        if not self._complete:
+            rules = (
+                db.query(Rule)
+                .filter(Rule.status == RuleStatus.published.value)
+                .order_by(Rule.id)
+                .all()
+            )
+            loaded = {}
+            invalid = {}
+            for rule in rules:
+                cached = _load_rule(rule)
+                if cached is None:
+                    invalid[rule.id] = (rule.version, rule.updated_at)
+                else:
+                    loaded[rule.id] = cached
+            with self._lock:
+                self._rules = loaded
+                self._invalid = invalid
+                self._complete = True
+
+        rules = sorted(list(self._rules.values()), key=lambda r: r.id)
+        if module:
+            rules = [r for r in rules if r.module == module]
+        return rules
+
+    def refresh_rule(self, rule: Rule):
+        """规则发布或状态变更后，在本进程内立即更新缓存"""
+        cached = _load_rule(rule) if rule.status == RuleStatus.published.value else None
+        with self._lock:
+            if cached is not None:
+                self._rules[rule.id] = cached
+                self._invalid.pop(rule.id, None)
+            else:
+                self._rules.pop(rule.id, None)
+                invalidate_plan(rule.id)
+                if rule.status == RuleStatus.published.value:
+                    self._invalid[rule.id] = (rule.version, rule.updated_at)
+                else:
+                    self._invalid.pop(rule.id, None)
+
+    def invalidate(self, rule_id: Optional[int] = None):
+        """使缓存失效；rule_id 为 None 时清空全部"""
+        with self._lock:
+            if rule_id is None:
+                self._rules = {}
+                self._invalid = {}
+                self._complete = False
+            else:
+                self._rules.pop(rule_id, None)
+                self._invalid.pop(rule_id, None)
+            invalidate_plan(rule_id)
+
+    def sync(self, db: Session):
+        """
+        与数据库同步：只查询已发布规则的 (id, 版本, updated_at)，
+        有变化的规则重新加载，已下线的规则移出缓存
+        """
+        rows = (
+            db.query(Rule.id, Rule.version, Rule.updated_at)
+            .filter(Rule.status == RuleStatus.published.value)
+            .all()
+        )
+        current: Dict[int, Tuple[int, Optional[datetime]]] = {
+            row.id: (row.version, row.updated_at) for row in rows
+        }
+
+        stale = [
+            rule_id for rule_id, cached in list(self._rules.items())
+            if current.get(rule_id) != (cached.version, cached.updated_at)
+        ]
+        # 缓存完整时才补充新发布的规则；否则新规则在首次访问时按需加载。
+        # 编译失败且未再变化的规则不重复加载
+        missing = [
+            rule_id for rule_id in current
+            if rule_id not in self._rules and self._invalid.get(rule_id) != current[rule_id]
+        ] if self._complete else []
+
+        changed = set(stale) | set(missing)
+        reload_ids = [rule_id for rule_id in changed if rule_id in current]
+        reloaded = {}
+        invalid = {}
+        if reload_ids:
+            for rule in db.query(Rule).filter(Rule.id.in_(reload_ids)).all():
+                if rule.status != RuleStatus.published.value:
+                    continue
+                cached = _load_rule(rule)
+                if cached is None:
+                    invalid[rule.id] = (rule.version, rule.updated_at)
+                else:
+                    reloaded[rule.id] = cached
+
+        with self._lock:
+            # 已下线的规则不再记为编译失败
+            for rule_id in [rule_id for rule_id in self._invalid if rule_id not in current]:
+                del self._invalid[rule_id]
+
+        if not changed:
+            return
+        with self._lock:
+            for rule_id in changed:
+                self._rules.pop(rule_id, None)
+                self._invalid.pop(rule_id, None)
+                if rule_id not in reloaded:
+                    invalidate_plan(rule_id)
+            self._rules.update(reloaded)
+            self._invalid.update(invalid)
+        logger.info("已发布规则缓存同步：%d 条规则变化", len(changed))
+
+    def start(self, interval: Optional[float] = None):
+        """启动后台同步线程；interval <= 0 时不启动"""
+        if interval is None:
+            interval = get_settings().RULE_CACHE_REFRESH_SECONDS
+        if interval <= 0 or self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(interval,), name="rule-cache-refresh", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """停止后台同步线程"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self, interval: float):
+        while not self._stop_event.wait(interval):
+            db = SessionLocal()
+            try:
+                self.sync(db)
+            except Exception:
+                logger.exception("已发布规则缓存同步失败")
+            finally:
+                db.close()
+
+
+published_rule_cache = PublishedRuleCache()
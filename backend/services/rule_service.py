@@ -5,6 +5,21 @@ from sqlalchemy.orm import Session
 
 from models.rule import Rule, RuleStatus
 from schemas.rule import RuleCreate, RuleUpdate
+from services.rule_cache import published_rule_cache
+from ruleengine.core.plan import compile_plan
+
+
+def validate_rule_config(config: dict):
+    """
+    发布前校验规则配置：编译执行计划（函数是否注册、证据级别、解释模板引用等）
+
+    Raises:
+        ValueError: 配置无效
+    """
+    try:
+        compile_plan(config)
+    except (ValueError, KeyError) as e:
+        raise ValueError(f"规则配置无效：{e}") from e
 
 
 def list_rules(db: Session) -> List[Rule]:
@@ -18,6 +33,8 @@ def get_rule(db: Session, rule_id: int) -> Optional[Rule]:
 def create_rule(db: Session, payload: RuleCreate) -> Rule:
     # 如果设置了自动发布，则创建为已发布状态
     status = RuleStatus.published.value if payload.auto_publish else RuleStatus.draft.value
+    if payload.auto_publish:
+        validate_rule_config(payload.config)
     
     rule = Rule(
         name=payload.name,
@@ -33,6 +50,8 @@ def create_rule(db: Session, payload: RuleCreate) -> Rule:
     db.add(rule)
     db.commit()
     db.refresh(rule)
+    if rule.status == RuleStatus.published.value:
+        published_rule_cache.refresh_rule(rule)
     return rule
 
 
@@ -41,6 +60,10 @@ def update_rule(db: Session, rule_id: int, payload: RuleUpdate) -> Optional[Rule
     if not rule:
         return None
 
+    # 通过 status 字段发布时与 publish_rule 一样先校验配置（含本次提交的新配置），校验失败不落库
+    if payload.status == RuleStatus.published.value and rule.status != RuleStatus.published.value:
+        validate_rule_config(payload.config if payload.config is not None else rule.config_dict())
+
     # 如果规则是已发布状态，只允许修改 status 字段（用于下线操作）
     # 不允许修改其他字段（name, module, description, type, deduct, fields_name, config）
     if rule.status == RuleStatus.published.value:
@@ -78,6 +101,8 @@ def update_rule(db: Session, rule_id: int, payload: RuleUpdate) -> Optional[Rule
     db.add(rule)
     db.commit()
     db.refresh(rule)
+    # 已发布规则下线（或重新上线）时同步本进程的已发布规则缓存
+    published_rule_cache.refresh_rule(rule)
     return rule
 
 
@@ -85,9 +110,11 @@ def publish_rule(db: Session, rule_id: int) -> Optional[Rule]:
     rule = get_rule(db, rule_id)
     if not rule:
         return None
+    validate_rule_config(rule.config_dict())
     rule.status = RuleStatus.published.value
     db.add(rule)
     db.commit()
     db.refresh(rule)
+    published_rule_cache.refresh_rule(rule)
     return rule
 
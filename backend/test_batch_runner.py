@@ -0,0 +1,124 @@
+"""
+进程池批量执行测试
+use_processes=True（spawn 进程池）与线程 / 事件循环路径的结果一致，顺序与输入一致；
+工作进程内的计划按 (规则ID, 版本) 缓存，新版本替换旧版本
+"""
+import copy
+
+from fastapi.testclient import TestClient
+
+from benchmarks.corpus import RecordGenerator
+from config import get_settings
+from ruleengine.batch_runner import ProcessBatchRunner, _execute_chunk
+from ruleengine.core import plan as plan_module
+from ruleengine.core.engine import RuleEngine
+import main
+
+
+RULE_CONFIG = {
+    "rule_id": "batch_001",
+    "rule_name": "测试规则-批量",
+    "module": "入院记录",
+    "function_list": {
+        "nodes": [
+            {"id": 1, "function": "extract_field_content",
+             "params": {"field_name": ["入院记录", "主诉"]},
+             "outputs": {"text": "result", "is_empty": "is_empty"}},
+            {"id": 2, "function": "count_characters",
+             "params": {"text": {"source": 1, "output": "text"}, "count_chinese_only": True},
+             "outputs": {"count": "result"}},
+            {"id": 3, "function": "is_number_in_range",
+             "params": {"value": {"source": 2, "output": "count"}, "min_value": 2, "max_value": 20},
+             "outputs": {"ok": "result"}},
+        ],
+        "result_rule": {
+            "pass": {"source": 3, "output": "ok", "expect": True},
+            "skipped_1": {"source": 1, "output": "is_empty", "expect": True},
+        },
+        "explanation_template": {
+            "pass": "主诉{{node_2.count}}个中文字符",
+            "fail": "主诉{{node_2.count}}个中文字符，不在2-20范围内",
+        },
+    },
+    "deduct": 5,
+}
+
+
+def _records(count: int):
+    records = [item["medical_record"] for item in RecordGenerator(seed=7).iter_records(count)]
+    # 加入主诉为空（跳过）的病历，覆盖不同 flag
+    records[3] = {"入院记录": {"主诉": ""}}
+    return records
+
+
+def _without_timing(results):
+    return [{k: v for k, v in result.items() if k != "duration_ms"} for result in results]
+
+
+def test_process_runner_matches_engine():
+    """进程池结果与单进程执行一致，分块后顺序不变"""
+    records = _records(23)
+    expected = RuleEngine(RULE_CONFIG).execute_many(records)
+
+    with ProcessBatchRunner(max_workers=2, chunk_size=4) as runner:
+        assert runner.start_method == "spawn"
+        actual = runner.execute_many(RULE_CONFIG, records)
+
+    assert _without_timing(actual) == _without_timing(expected)
+    assert {result["flag"] for result in actual} >= {2}
+
+
+def _with_max_value(max_value: int):
+    config = copy.deepcopy(RULE_CONFIG)
+    config["function_list"]["nodes"][2]["params"]["max_value"] = max_value
+    return config
+
+
+def test_worker_plan_cache_replaces_old_version():
+    """工作进程的执行函数按 (规则ID, 版本) 取计划：新版本替换旧版本，不再保留旧计划"""
+    records = [{"入院记录": {"主诉": "头痛三天伴发热"}}]
+    rule_id = "batch_version_001"
+    plan_module.invalidate_plan(rule_id)
+
+    assert _execute_chunk(rule_id, 1, _with_max_value(20), records)[0]["flag"] == 1
+    assert _execute_chunk(rule_id, 2, _with_max_value(3), records)[0]["flag"] == 0
+    assert [key for key in plan_module._plan_cache if key[0] == rule_id] == [(rule_id, 2)]
+    plan_module.invalidate_plan(rule_id)
+
+
+def test_process_runner_uses_new_version():
+    """同一规则ID传入新版本时，进程池按新版本的配置执行"""
+    records = [{"入院记录": {"主诉": "头痛三天伴发热"}}]
+    with ProcessBatchRunner(max_workers=1) as runner:
+        assert runner.execute_many(_with_max_value(20), records, rule_id=7, version=1)[0]["flag"] == 1
+        assert runner.execute_many(_with_max_value(3), records, rule_id=7, version=2)[0]["flag"] == 0
+
+
+def test_batch_api_use_processes_matches_threads():
+    """POST /api/qc/execute/batch：use_processes=True 与默认路径返回相同结果与顺序"""
+    records = _records(12)
+    items = [{"medical_id": f"m{i}", "medical_record": record} for i, record in enumerate(records)]
+    with TestClient(main.app) as client:
+        rule_id = client.post("/api/rules/", json={
+            "name": "批量", "module": "入院记录", "config": RULE_CONFIG, "auto_publish": True,
+        }).json()["id"]
+
+        threaded = client.post("/api/qc/execute/batch", json={"rule_id": rule_id, "records": items})
+        processed = client.post(
+            "/api/qc/execute/batch", json={"rule_id": rule_id, "records": items, "use_processes": True}
+        )
+
+    assert threaded.status_code == processed.status_code == 200
+    threaded_results = threaded.json()["results"]
+    assert [r["medical_id"] for r in threaded_results] == [item["medical_id"] for item in items]
+    assert processed.json()["results"] == threaded_results
+
+
+def test_batch_api_rejects_too_many_records():
+    """POST /api/qc/execute/batch：病历数超过 BATCH_MAX_RECORDS 时返回 422"""
+    limit = get_settings().BATCH_MAX_RECORDS
+    items = [{"medical_record": {}}] * (limit + 1)
+    with TestClient(main.app) as client:
+        response = client.post("/api/qc/execute/batch", json={"rule_id": 1, "records": items})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "records"]
@@ -0,0 +1,143 @@
+"""
+LLM 请求合并测试
+单飞：并发的相同请求只执行一次，异常传递给所有等待者；微批：按批大小或等待时间发送
+"""
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
+import time
+
+import pytest
+
+from ruleengine.llm.coalesce import AsyncSingleFlight, MicroBatcher, SingleFlight
+
+
+def _wait_until(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "等待超时"
+        time.sleep(0.005)
+
+
+def _run_concurrently(flight: SingleFlight, fn, callers: int):
+    """callers 个线程同时以同一 key 调用（线程池在调用全部完成后自行退出）"""
+    pool = ThreadPoolExecutor(callers)
+    futures = [pool.submit(flight.do, "key", fn) for _ in range(callers)]
+    pool.shutdown(wait=False)
+    return futures
+
+
+def test_single_flight_shares_one_call():
+    """并发的相同请求只执行一次，所有调用方得到同一结果"""
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return "结果"
+
+    futures = _run_concurrently(flight, fn, 8)
+    _wait_until(lambda: flight.coalesced == 7)
+    release.set()
+    assert [future.result() for future in futures] == ["结果"] * 8
+    assert len(calls) == 1
+
+    # 调用结束后 key 释放，下一次调用重新执行
+    assert flight.do("key", lambda: "新结果") == "新结果"
+
+
+def test_single_flight_propagates_exception():
+    """leader 的异常传递给每个等待者"""
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fn():
+        release.wait(5)
+        raise ValueError("上游失败")
+
+    futures = _run_concurrently(flight, fn, 5)
+    _wait_until(lambda: flight.coalesced == 4)
+    release.set()
+    for future in futures:
+        with pytest.raises(ValueError, match="上游失败"):
+            future.result()
+
+
+def test_async_single_flight_shares_one_call():
+    """异步单飞：并发任务共享一次调用，等待者被取消不影响其他等待者"""
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "结果"
+
+    async def run():
+        tasks = [asyncio.ensure_future(flight.do("key", upstream)) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        tasks[0].cancel()
+        results = await asyncio.gather(*tasks[1:])
+        return results, tasks[0].cancelled()
+
+    results, cancelled = asyncio.run(run())
+    assert results == ["结果"] * 4
+    assert cancelled
+    assert len(calls) == 1
+    assert flight.coalesced == 4
+
+
+def test_micro_batcher_flushes_on_size():
+    """凑满 max_batch 个提示词立即发送，不等待 wait_ms"""
+    batches = []
+
+    def send_batch(prompts):
+        batches.append(list(prompts))
+        return [prompt.upper() for prompt in prompts]
+
+    batcher = MicroBatcher(send_batch, max_batch=4, wait_ms=10_000)
+    try:
+        start = time.monotonic()
+        futures = [batcher.submit(prompt) for prompt in ["a", "b", "c", "d"]]
+        assert [future.result(timeout=5) for future in futures] == ["A", "B", "C", "D"]
+        assert time.monotonic() - start < 5
+        assert batches == [["a", "b", "c", "d"]]
+    finally:
+        batcher.stop()
+
+
+def test_micro_batcher_flushes_on_delay():
+    """未凑满时在第一个提示词到达后 wait_ms 毫秒发送"""
+    batches = []
+
+    def send_batch(prompts):
+        batches.append(list(prompts))
+        return [prompt.upper() for prompt in prompts]
+
+    batcher = MicroBatcher(send_batch, max_batch=100, wait_ms=100)
+    try:
+        start = time.monotonic()
+        futures = [batcher.submit(prompt) for prompt in ["a", "b"]]
+        assert [future.result(timeout=5) for future in futures] == ["A", "B"]
+        assert time.monotonic() - start >= 0.09
+        assert batches == [["a", "b"]]
+        assert batcher.stats()["batches"] == 1
+    finally:
+        batcher.stop()
+
+
+def test_micro_batcher_propagates_batch_error():
+    """批请求失败时该批所有提示词都收到同一异常"""
+    def send_batch(prompts):
+        raise RuntimeError("批量请求失败")
+
+    batcher = MicroBatcher(send_batch, max_batch=3, wait_ms=10_000)
+    try:
+        futures = [batcher.submit(prompt) for prompt in ["a", "b", "c"]]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="批量请求失败"):
+                future.result(timeout=5)
+    finally:
+        batcher.stop()
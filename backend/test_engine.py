@@ -6,6 +6,7 @@
 from ruleengine import functions
 
 from ruleengine.core.engine import RuleEngine
+from ruleengine.core.plan import compile_plan
 from ruleengine.registry import get_registered_functions
 
 
@@ -171,6 +172,57 @@ def test_empty_field():
         return False
 
 
+def test_skip_condition():
+    """测试跳过条件与执行计划复用"""
+    print("\n" + "=" * 50)
+    print("测试跳过条件")
+    print("=" * 50)
+    
+    test_rule_config = {
+        "rule_id": "test_003",
+        "rule_name": "测试规则-跳过",
+        "function_list": {
+            "nodes": [
+                {
+                    "id": 1,
+                    "function": "extract_field_content",
+                    "params": {"field_name": ["入院记录", "主诉"]},
+                    "outputs": {"text": "result", "is_empty": "is_empty"}
+                },
+                {
+                    "id": 2,
+                    "function": "count_characters",
+                    "params": {"text": {"source": 1, "output": "text"}},
+                    "outputs": {"count": "result"}
+                }
+            ],
+            "result_rule": {
+                "pass": {"source": 1, "output": "is_empty", "expect": False},
+                "skipped_1": {"source": 1, "output": "is_empty", "expect": True}
+            },
+            "explanation_template": {
+                "skipped_1": "主诉为空，无需检查"
+            }
+        }
+    }
+    
+    plan = compile_plan(test_rule_config)
+    engine = RuleEngine.from_plan(plan)
+    
+    skipped = engine.execute({"入院记录": {"主诉": ""}})
+    print(f"   - 空主诉: flag={skipped.get('flag')}, 解释={skipped.get('explanation')}")
+    assert skipped["passed"] is None
+    assert skipped["explanation"] == "主诉为空，无需检查"
+    assert "node_2.count" not in skipped["answer"]
+    
+    # 同一计划/引擎再次执行，不应残留上一次的跳过状态
+    passed = engine.execute({"入院记录": {"主诉": "头痛3天"}})
+    print(f"   - 非空主诉: flag={passed.get('flag')}, 证据={passed.get('answer')}")
+    assert passed["passed"] is True
+    assert "node_2.count" in passed["answer"]
+    print("   ✅ 跳过条件测试通过")
+
+
 if __name__ == "__main__":
     print("\n开始测试规则引擎...\n")
     
@@ -180,6 +232,9 @@ if __name__ == "__main__":
     # 空字段测试
     success2 = test_empty_field()
     
+    # 跳过条件测试
+    test_skip_condition()
+    
     print("\n" + "=" * 50)
     if success1 and success2:
         print("✅ 所有测试通过！引擎工作正常。")
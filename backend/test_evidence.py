@@ -0,0 +1,115 @@
+"""
+执行证据级别测试
+none / fail_only / summary / full 与 通过 / 不通过 / 跳过 的组合，以及级别的优先级
+"""
+import copy
+
+from fastapi.testclient import TestClient
+import pytest
+
+from ruleengine import functions  # noqa: F401  确保函数注册
+from ruleengine.core.engine import RuleEngine
+from services.rule_service import validate_rule_config
+import main
+
+
+MAX_LENGTH = 100
+
+RULE_CONFIG = {
+    "rule_id": "evidence_001",
+    "rule_name": "测试规则-证据级别",
+    "module": "入院记录",
+    "function_list": {
+        "nodes": [
+            {"id": 1, "function": "extract_field_content",
+             "params": {"field_name": ["入院记录", "主诉"]},
+             "outputs": {"text": "result", "is_empty": "is_empty"}},
+            {"id": 2, "function": "count_characters",
+             "params": {"text": {"source": 1, "output": "text"}, "count_chinese_only": True},
+             "outputs": {"count": "result"}},
+            {"id": 3, "function": "is_number_in_range",
+             "params": {"value": {"source": 2, "output": "count"}, "min_value": 10, "max_value": 200},
+             "outputs": {"ok": "result"}},
+        ],
+        "result_rule": {
+            "pass": {"source": 3, "output": "ok", "expect": True},
+            "skipped_1": {"source": 1, "output": "is_empty", "expect": True},
+        },
+    },
+    "deduct": 5,
+}
+
+# 通过与不通过的病历主诉都超过截断长度
+RECORDS = {
+    "pass": {"入院记录": {"主诉": "头" * 150}},
+    "fail": {"入院记录": {"主诉": "痛" * 300}},
+    "skip": {"入院记录": {"主诉": ""}},
+}
+EXPECTED_FLAGS = {"pass": 1, "fail": 0, "skip": 2}
+
+
+def _truncate(evidence):
+    return {
+        key: value[:MAX_LENGTH] + "..." if isinstance(value, str) and len(value) > MAX_LENGTH else value
+        for key, value in evidence.items()
+    }
+
+
+def _full_evidence(outcome):
+    return RuleEngine(RULE_CONFIG).execute(RECORDS[outcome], evidence_level="full")["answer"]
+
+
+def _expected(level, outcome):
+    if level == "none" or (level == "fail_only" and outcome != "fail"):
+        return {}
+    full = _full_evidence(outcome)
+    return full if level == "full" else _truncate(full)
+
+
+@pytest.mark.parametrize("outcome", ["pass", "fail", "skip"])
+@pytest.mark.parametrize("level", ["none", "fail_only", "summary", "full"])
+def test_evidence_level_matrix(level, outcome):
+    """各证据级别在通过 / 不通过 / 跳过时的证据内容"""
+    result = RuleEngine(RULE_CONFIG).execute(RECORDS[outcome], evidence_level=level)
+    assert result["flag"] == EXPECTED_FLAGS[outcome]
+    assert result["answer"] == _expected(level, outcome)
+    # 证据级别不影响结论与扣分
+    assert result["deduct"] == (5 if outcome == "fail" else 0)
+
+
+def test_full_is_untruncated_and_summary_truncates():
+    """full 保留长文本原文，summary 截断到 EVIDENCE_MAX_LENGTH"""
+    text = RECORDS["fail"]["入院记录"]["主诉"]
+    full = _full_evidence("fail")
+    assert full["node_1.text"] == f"入院记录.主诉>>>{text}\n"
+
+    summary = RuleEngine(RULE_CONFIG).execute(RECORDS["fail"], evidence_level="summary")["answer"]
+    assert len(summary["node_1.text"]) == MAX_LENGTH + len("...")
+    assert summary["node_2.count"] == full["node_2.count"]  # 非字符串输出不截断
+
+
+def test_level_precedence():
+    """请求参数 > 规则配置 > Settings（默认 summary）；规则可配置截断长度"""
+    record = RECORDS["pass"]
+    assert RuleEngine(RULE_CONFIG).execute(record)["answer"] == _truncate(_full_evidence("pass"))
+
+    config = copy.deepcopy(RULE_CONFIG)
+    config["evidence_level"] = "none"
+    config["evidence_max_length"] = 10
+    engine = RuleEngine(config)
+    assert engine.execute(record)["answer"] == {}
+    assert engine.execute(record, evidence_level="summary")["answer"]["node_1.text"] == "入院记录.主诉>>>..."
+
+
+def test_unknown_level_rejected():
+    """未知级别：规则配置校验报错，接口返回 422"""
+    config = copy.deepcopy(RULE_CONFIG)
+    config["evidence_level"] = "verbose"
+    with pytest.raises(ValueError, match="verbose"):
+        validate_rule_config(config)
+
+    with TestClient(main.app) as client:
+        response = client.post("/api/qc/execute", json={
+            "rule_id": 1, "medical_record": RECORDS["pass"], "evidence_level": "verbose",
+        })
+    assert response.status_code == 422
@@ -0,0 +1,93 @@
+"""
+LLM 准入控制测试
+通道并发上限、交互通道优先于批量通道获得令牌、异步等待取消
+"""
+import asyncio
+import threading
+import time
+
+from ruleengine.llm.limiter import LANE_BATCH, LANE_INTERACTIVE, AdmissionController
+
+
+def _wait_until(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "等待超时"
+        time.sleep(0.005)
+
+
+def _lane(controller: AdmissionController, lane: str):
+    return controller.stats()["lanes"][lane]
+
+
+def test_lane_concurrency_caps():
+    """各通道在途数不超过自身上限，批量通道占满也不影响交互通道"""
+    controller = AdmissionController({LANE_INTERACTIVE: 2, LANE_BATCH: 1})
+    controller.acquire(LANE_BATCH)
+    controller.acquire(LANE_INTERACTIVE)
+    controller.acquire(LANE_INTERACTIVE)
+
+    admitted = []
+    threads = [
+        threading.Thread(target=lambda lane=lane: admitted.append(controller.acquire(lane)))
+        for lane in (LANE_BATCH, LANE_INTERACTIVE)
+    ]
+    for thread in threads:
+        thread.start()
+    _wait_until(lambda: _lane(controller, LANE_BATCH)["queued"] == 1
+                and _lane(controller, LANE_INTERACTIVE)["queued"] == 1)
+    assert _lane(controller, LANE_BATCH)["in_flight"] == 1
+    assert _lane(controller, LANE_INTERACTIVE)["in_flight"] == 2
+    assert admitted == []
+
+    # 释放交互通道只放行交互通道的等待者
+    controller.release(LANE_INTERACTIVE)
+    _wait_until(lambda: admitted == [LANE_INTERACTIVE])
+    assert _lane(controller, LANE_BATCH)["queued"] == 1
+
+    controller.release(LANE_BATCH)
+    _wait_until(lambda: admitted == [LANE_INTERACTIVE, LANE_BATCH])
+    for thread in threads:
+        thread.join()
+
+
+def test_interactive_gets_tokens_before_batch():
+    """令牌不足时，后到的交互请求先于先到的批量请求放行"""
+    controller = AdmissionController({LANE_INTERACTIVE: 4, LANE_BATCH: 4}, rate=10, burst=1)
+    controller.acquire(LANE_BATCH)  # 用掉唯一的令牌
+
+    order = []
+
+    def call(lane):
+        controller.acquire(lane)
+        order.append(lane)
+
+    batch = threading.Thread(target=call, args=(LANE_BATCH,))
+    batch.start()
+    _wait_until(lambda: _lane(controller, LANE_BATCH)["queued"] == 1)
+    interactive = threading.Thread(target=call, args=(LANE_INTERACTIVE,))
+    interactive.start()
+    batch.join(5)
+    interactive.join(5)
+
+    assert order == [LANE_INTERACTIVE, LANE_BATCH]
+
+
+def test_async_cancel_leaves_queue():
+    """异步等待被取消时退出队列，不占用许可"""
+    controller = AdmissionController({LANE_INTERACTIVE: 1, LANE_BATCH: 1})
+
+    async def run():
+        async with controller.aslot(LANE_INTERACTIVE):
+            waiter = asyncio.ensure_future(controller.acquire_async(LANE_INTERACTIVE))
+            await asyncio.sleep(0.01)
+            assert _lane(controller, LANE_INTERACTIVE)["queued"] == 1
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            assert _lane(controller, LANE_INTERACTIVE)["queued"] == 0
+        # 许可已全部归还，可再次获取
+        async with controller.aslot(LANE_INTERACTIVE) as lane:
+            return lane
+
+    assert asyncio.run(run()) == LANE_INTERACTIVE
+    assert _lane(controller, LANE_INTERACTIVE)["in_flight"] == 0
@@ -0,0 +1,95 @@
+"""
+LLM 响应缓存测试
+过期、内存层 LRU 淘汰、磁盘层超限后淘汰到 90%、磁盘访问不阻塞内存层读取，以及 /health 不创建缓存
+"""
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from ruleengine.llm.cache import LLMResponseCache, close_llm_cache, make_cache_key, peek_llm_cache
+import main
+
+
+def test_cache_key_depends_on_model_params():
+    """模型参数不同的相同提示词得到不同的键"""
+    assert make_cache_key("你好", model="a") == make_cache_key("你好", model="a")
+    assert make_cache_key("你好", model="a") != make_cache_key("你好", model="b")
+
+
+def test_ttl_expiry(tmp_path):
+    """超过 ttl_seconds 的条目在内存层与磁盘层都视为未命中"""
+    cache = LLMResponseCache(path=str(tmp_path / "cache.sqlite3"), ttl_seconds=0.05)
+    cache.put("k", "v")
+    assert cache.get("k") == "v"
+
+    time.sleep(0.1)
+    assert cache.get("k") is None
+    stats = cache.stats()
+    assert stats["expired"] == 2  # 内存层与磁盘层各一次
+    assert stats["disk_entries"] == 0
+    cache.close()
+
+
+def test_disk_hit_after_reopen(tmp_path):
+    """磁盘层在重新打开后仍可命中，并回填内存层"""
+    path = str(tmp_path / "cache.sqlite3")
+    cache = LLMResponseCache(path=path)
+    cache.put("k", "v")
+    cache.close()
+
+    cache = LLMResponseCache(path=path)
+    assert cache.get("k") == "v"
+    assert cache.peek("k") == "v"
+    assert cache.stats()["disk_hits"] == 1
+    cache.close()
+
+
+def test_memory_lru_eviction():
+    """内存层超过 memory_size 时淘汰最久未访问的条目"""
+    cache = LLMResponseCache(memory_size=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"  # a 变为最近访问
+    cache.put("c", "3")
+    assert cache.peek("b") is None
+    assert cache.peek("a") == "1"
+    assert cache.peek("c") == "3"
+    assert cache.stats()["memory_evictions"] == 1
+
+
+def test_peek_not_blocked_by_disk_access(tmp_path):
+    """磁盘读写期间（持有连接锁）peek 仍可读取内存层"""
+    cache = LLMResponseCache(path=str(tmp_path / "cache.sqlite3"))
+    cache.put("k", "v")
+    results = []
+    with cache._disk_lock:
+        reader = threading.Thread(target=lambda: results.append(cache.peek("k")))
+        reader.start()
+        reader.join(timeout=2)
+        assert results == ["v"]
+    cache.close()
+
+
+def test_disk_eviction_to_ninety_percent(tmp_path):
+    """磁盘层超过 max_entries 时按写入时间淘汰最旧的条目，降到 90%"""
+    cache = LLMResponseCache(path=str(tmp_path / "cache.sqlite3"), memory_size=0, max_entries=20)
+    for i in range(21):
+        cache.put(f"k{i}", str(i))
+
+    stats = cache.stats()
+    assert stats["disk_entries"] == 18
+    assert stats["disk_evictions"] == 3
+    assert [cache.get(f"k{i}") for i in range(3)] == [None, None, None]
+    assert cache.get("k3") == "3"
+    assert cache.get("k20") == "20"
+    cache.close()
+
+
+def test_health_does_not_create_cache():
+    """/health 只读取已创建的缓存，探活请求不创建缓存"""
+    close_llm_cache()
+    with TestClient(main.app) as client:
+        body = client.get("/health").json()
+    assert body["llm_cache"] is None
+    assert peek_llm_cache() is None
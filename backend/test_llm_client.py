@@ -0,0 +1,200 @@
+"""
+LLM HTTP 客户端测试
+对接本地替身服务（ThreadingHTTPServer）：重试、Retry-After、超时、在途上限、非法 JSON
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import asyncio
+import collections
+import json
+import threading
+import time
+
+import pytest
+
+from ruleengine.llm.client import LLMClient, LLMRequestError
+
+
+def _ok(content: str = "好的"):
+    return 200, {}, json.dumps({"choices": [{"message": {"content": content}}]}).encode("utf-8"), 0.0
+
+
+class StubLLMServer:
+    """
+    本地替身 LLM 服务
+
+    按顺序返回预设的响应 (状态码, 响应头, 响应体, 延迟秒数)，预设用完后返回正常响应；
+    记录请求次数与最大并发数
+    """
+
+    def __init__(self):
+        self.responses = collections.deque()
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with stub.lock:
+                    stub.calls += 1
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                    status, headers, body, delay = stub.responses.popleft() if stub.responses else _ok()
+                try:
+                    time.sleep(delay)
+                    self.send_response(status)
+                    for key, value in headers.items():
+                        self.send_header(key, value)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with stub.lock:
+                        stub.active -= 1
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}/v1"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = StubLLMServer()
+    yield server
+    server.close()
+
+
+def _client(stub: StubLLMServer, **overrides) -> LLMClient:
+    options = dict(
+        base_url=stub.base_url, model="test", max_retries=2,
+        backoff_base=0.001, backoff_max=2.0, read_timeout=2.0, connect_timeout=1.0,
+    )
+    options.update(overrides)
+    return LLMClient(**options)
+
+
+def test_chat_and_achat(stub):
+    """同步与异步调用返回模型输出"""
+    client = _client(stub)
+    assert client.chat("你好") == "好的"
+    assert asyncio.run(client.achat("你好")) == "好的"
+    client.close()
+
+
+@pytest.mark.parametrize("status", [429, 500, 502, 503])
+def test_retries_retryable_status(stub, status):
+    """限流与服务端临时错误按退避重试，之后成功"""
+    stub.responses.extend([(status, {}, b"", 0.0), (status, {}, b"", 0.0), _ok("重试成功")])
+    client = _client(stub)
+    assert client.chat("你好") == "重试成功"
+    assert stub.calls == 3
+    client.close()
+
+
+def test_retries_exhausted(stub):
+    """重试耗尽后抛出 LLMRequestError"""
+    stub.responses.extend([(503, {}, b"", 0.0)] * 3)
+    client = _client(stub)
+    with pytest.raises(LLMRequestError, match="503"):
+        client.chat("你好")
+    assert stub.calls == 3
+    client.close()
+
+
+def test_non_retryable_status(stub):
+    """不可重试的状态码直接失败"""
+    stub.responses.append((400, {}, b"{}", 0.0))
+    client = _client(stub)
+    with pytest.raises(LLMRequestError, match="400"):
+        client.chat("你好")
+    assert stub.calls == 1
+    client.close()
+
+
+def test_retry_after_is_honoured(stub):
+    """响应带 Retry-After 时至少等待该时长再重试（同步与异步）"""
+    client = _client(stub)
+
+    stub.responses.append((429, {"Retry-After": "0.3"}, b"", 0.0))
+    start = time.perf_counter()
+    assert client.chat("你好") == "好的"
+    assert time.perf_counter() - start >= 0.3
+
+    stub.responses.append((429, {"Retry-After": "0.3"}, b"", 0.0))
+    start = time.perf_counter()
+    assert asyncio.run(client.achat("你好")) == "好的"
+    assert time.perf_counter() - start >= 0.3
+    client.close()
+
+
+def test_read_timeout_maps_to_request_error(stub):
+    """读取超时按网络错误重试，耗尽后抛出 LLMRequestError"""
+    stub.responses.extend([(200, {}, b"{}", 0.5)] * 2)
+    client = _client(stub, read_timeout=0.1, max_retries=1)
+    with pytest.raises(LLMRequestError, match="Timeout"):
+        client.chat("你好")
+    assert stub.calls == 2
+    client.close()
+
+
+def test_invalid_json_raises_request_error(stub):
+    """响应体不是合法 JSON 时抛出 LLMRequestError，不重试（同步与异步）"""
+    client = _client(stub)
+
+    stub.responses.append((200, {}, b"not json", 0.0))
+    with pytest.raises(LLMRequestError, match="JSON"):
+        client.chat("你好")
+
+    stub.responses.append((200, {}, b"not json", 0.0))
+    with pytest.raises(LLMRequestError, match="JSON"):
+        asyncio.run(client.achat("你好"))
+    assert stub.calls == 2
+    client.close()
+
+
+def test_max_in_flight_sync(stub):
+    """同步调用的在途请求数不超过 max_in_flight"""
+    stub.responses.extend([_ok()[:3] + (0.1,)] * 6)
+    client = _client(stub, max_in_flight=2)
+    threads = [threading.Thread(target=client.chat, args=(f"p{i}",)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert stub.calls == 6
+    assert stub.max_active == 2
+    client.close()
+
+
+def test_max_in_flight_async(stub):
+    """异步调用的在途请求数不超过 max_in_flight"""
+    stub.responses.extend([_ok()[:3] + (0.1,)] * 6)
+    client = _client(stub, max_in_flight=2)
+
+    async def run():
+        try:
+            return await asyncio.gather(*(client.achat(f"p{i}") for i in range(6)))
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()) == ["好的"] * 6
+    assert stub.max_active == 2
@@ -0,0 +1,70 @@
+"""
+LLM 标签提取测试
+extract_tags 与 regex_* 系列结果一致（含嵌套标签），extract_llm_tags 的输出字段
+"""
+import pytest
+
+from ruleengine.functions.text_extract import extract_llm_tags
+from ruleengine.regex_tools import (
+    KNOWN_TAGS,
+    extract_tags,
+    regex_conclusion,
+    regex_content,
+    regex_reason,
+    regex_thinking,
+    regex_times,
+)
+
+
+REGEX_FUNCTIONS = {
+    "conclusion": regex_conclusion,
+    "reason": regex_reason,
+    "thinking": regex_thinking,
+    "content": regex_content,
+    "times": regex_times,
+}
+
+SAMPLES = [
+    "<conclusion>是</conclusion><reason>主诉完整</reason>",
+    "<thinking>\n先看主诉\n</thinking>\n<conclusion> 否 </conclusion>\n<reason>缺少持续时间</reason>",
+    "<thinking>分析：<conclusion>是</conclusion>，<times>3次</times></thinking><reason>已记录</reason>",
+    "<conclusion>是</conclusion><conclusion>否</conclusion>",
+    "<content><content>内层</content></content>",
+    "<conclusion>未闭合 <reason>原因</reason>",
+    "<conclusion></conclusion><times>1</times>",
+    "没有任何标签",
+    "",
+]
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_extract_tags_matches_regex(text):
+    """每个标签的提取结果与对应 regex_* 函数相同"""
+    expected = {tag: REGEX_FUNCTIONS[tag](text) for tag in KNOWN_TAGS}
+    expected = {tag: value for tag, value in expected.items() if value is not None}
+    assert extract_tags(text, KNOWN_TAGS) == expected
+    assert extract_tags(text) == expected
+
+
+def test_nested_conclusion_inside_thinking():
+    """<thinking> 内部的 <conclusion> 同样被提取"""
+    text = "<thinking>综合判断<conclusion>否</conclusion></thinking>"
+    assert extract_tags(text, ["conclusion"]) == {"conclusion": "否"}
+    assert extract_tags(text)["conclusion"] == regex_conclusion(text) == "否"
+
+
+def test_extract_llm_tags_outputs():
+    """各标签作为同名输出字段返回，未找到的为 None 并列入 missing"""
+    output = extract_llm_tags("<thinking><conclusion>是</conclusion></thinking>", ["conclusion", "reason"])
+    assert output["conclusion"] == "是"
+    assert output["reason"] is None
+    assert output["missing"] == ["reason"]
+    assert output["result"] == {"conclusion": "是"}
+    assert output["details"] == {"tags": ["conclusion", "reason"], "found": 1}
+
+
+@pytest.mark.parametrize("tag", ["result", "missing", "evidence", "details"])
+def test_extract_llm_tags_rejects_reserved_names(tag):
+    """标签名与固定输出字段重名时报错，而不是被固定字段覆盖"""
+    with pytest.raises(ValueError, match=tag):
+        extract_llm_tags(f"<{tag}>x</{tag}>", ["conclusion", tag])
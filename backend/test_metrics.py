@@ -0,0 +1,93 @@
+"""
+运行指标测试
+Prometheus 文本格式输出，以及请求耗时指标的路由模板标签
+"""
+import re
+
+from fastapi.testclient import TestClient
+import pytest
+
+from metrics import CONTENT_TYPE, MetricsRegistry
+import main
+
+
+def test_render_format():
+    """计数器 / 仪表 / 直方图与采集器的文本格式"""
+    registry = MetricsRegistry()
+    counter = registry.counter("t_requests_total", "请求次数", ("code",))
+    gauge = registry.gauge("t_in_flight", "在途数")
+    histogram = registry.histogram("t_seconds", "耗时", ("op",), buckets=(0.1, 1.0))
+    counter.labels(200).inc()
+    counter.labels(200).inc(2)
+    counter.labels('a"b\n').inc()
+    gauge.inc(3)
+    gauge.dec()
+    histogram.labels("read").observe(0.05)
+    histogram.labels("read").observe(0.5)
+    histogram.labels("read").observe(5)
+    registry.register_collector(lambda: [("t_ratio", "gauge", "比例", [({"cache": "x"}, 0.25)])])
+
+    assert registry.render() == "\n".join([
+        "# HELP t_requests_total 请求次数",
+        "# TYPE t_requests_total counter",
+        't_requests_total{code="200"} 3',
+        't_requests_total{code="a\\"b\\n"} 1',
+        "# HELP t_in_flight 在途数",
+        "# TYPE t_in_flight gauge",
+        "t_in_flight 2",
+        "# HELP t_seconds 耗时",
+        "# TYPE t_seconds histogram",
+        't_seconds_bucket{op="read",le="0.1"} 1',
+        't_seconds_bucket{op="read",le="1"} 2',
+        't_seconds_bucket{op="read",le="+Inf"} 3',
+        't_seconds_sum{op="read"} 5.55',
+        't_seconds_count{op="read"} 3',
+        "# HELP t_ratio 比例",
+        "# TYPE t_ratio gauge",
+        't_ratio{cache="x"} 0.25',
+    ]) + "\n"
+
+
+def test_registry_reuses_metrics_and_checks_labels():
+    """同名指标复用；标签数量不符时报错；采集器出错不影响其他指标"""
+    registry = MetricsRegistry()
+    first = registry.counter("t_total", "次数", ("a",))
+    assert registry.counter("t_total", "次数", ("a",)) is first
+    with pytest.raises(ValueError):
+        first.labels("x", "y")
+
+    def broken():
+        raise RuntimeError("boom")
+
+    registry.register_collector(broken)
+    text = registry.render()
+    assert text.startswith("# HELP t_total 次数\n")
+    assert "# 采集器 broken 出错: RuntimeError('boom')" in text
+
+
+def _sample(text: str, name: str, **labels) -> float:
+    label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf"^{re.escape(name)}\{{{re.escape(label_text)}\}} (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_metrics_endpoint_route_labels():
+    """路由标签为路由模板；未匹配的路径记为 unmatched，不按实际路径产生标签"""
+    count = "qc_http_request_duration_seconds_count"
+    with TestClient(main.app) as client:
+        before = client.get("/metrics").text
+        client.get("/api/rules/12345")
+        client.get("/api/rules/67890")
+        client.get("/no/such/path/1")
+        response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == CONTENT_TYPE
+    text = response.text
+    labels = {"method": "GET", "route": "/api/rules/{rule_id}", "status": "404"}
+    assert _sample(text, count, **labels) == _sample(before, count, **labels) + 2
+    unmatched = {"method": "GET", "route": "unmatched", "status": "404"}
+    assert _sample(text, count, **unmatched) == _sample(before, count, **unmatched) + 1
+    assert "12345" not in text and "/no/such/path" not in text
+    assert "# TYPE qc_rule_executions_total counter" in text
+    assert "# TYPE qc_cache_hit_ratio gauge" in text
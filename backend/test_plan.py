@@ -0,0 +1,32 @@
+"""
+执行计划测试
+纯函数节点的共享缓存键：等价参数得到相同的键，不同类型的容器不会混淆
+"""
+import pytest
+
+from ruleengine.core.plan import make_shared_key
+
+
+def test_equal_params_share_key():
+    """字典键顺序不同、嵌套结构相同的参数得到相同的键"""
+    first = make_shared_key("f", {"a": [1, {"x": 2, "y": 3}], "b": "t"})
+    second = make_shared_key("f", {"b": "t", "a": [1, {"y": 3, "x": 2}]})
+    assert first == second
+    assert hash(first) == hash(second)
+
+
+@pytest.mark.parametrize("left, right", [
+    ([1, 2], (1, 2)),
+    ({"a": 1}, [("a", 1)]),
+    ({"a": 1}, (("a", 1),)),
+    ([], {}),
+    ([[1]], [(1,)]),
+])
+def test_container_types_not_confused(left, right):
+    """列表与元组、字典与键值对序列的键不同"""
+    assert make_shared_key("f", {"v": left}) != make_shared_key("f", {"v": right})
+
+
+def test_unhashable_params_disable_sharing():
+    """含不可哈希的值时不去重"""
+    assert make_shared_key("f", {"v": [{1, 2}]}) is None
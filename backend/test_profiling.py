@@ -0,0 +1,71 @@
+"""
+规则剖析测试
+profile_rule 的输出结构，以及剖析中的执行不计入进程内统计
+"""
+from ruleengine import functions  # noqa: F401  确保函数注册
+
+from ruleengine.core.engine import RULE_EXECUTIONS, RuleEngine
+from ruleengine.core.profiling import function_stats, profile_rule, recording_disabled, recording_enabled
+
+
+RULE_CONFIG = {
+    "rule_id": "profile_001",
+    "rule_name": "测试规则-剖析",
+    "function_list": {
+        "nodes": [
+            {"id": 1, "function": "extract_field_content",
+             "params": {"field_name": ["入院记录", "主诉"]},
+             "outputs": {"text": "result", "is_empty": "is_empty"}},
+            {"id": 2, "function": "count_characters",
+             "params": {"text": {"source": 1, "output": "text"}},
+             "outputs": {"count": "result"}},
+        ],
+        "result_rule": {"pass": {"source": 1, "output": "is_empty", "expect": False}},
+    },
+}
+RECORD = {"入院记录": {"主诉": "患者因头痛3天入院"}}
+
+
+def _pass_count() -> float:
+    return RULE_EXECUTIONS.labels("pass").value
+
+
+def test_profile_rule_report():
+    """剖析结果包含热点函数与折叠栈"""
+    engine = RuleEngine(RULE_CONFIG, concurrent=False)
+    report = profile_rule(engine, RECORD, runs=3, top=5, sample_seconds=0.2)
+
+    assert report["runs"] == 3
+    assert report["sample_runs"] >= 3
+    assert 0 < len(report["top_functions"]) <= 5
+    assert report["top_functions"][0]["function"] == "execute"
+    for line in report["collapsed"].splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert stack.startswith("RuleEngine.execute (")
+        assert int(count) > 0
+
+
+def test_profile_rule_does_not_record_stats():
+    """剖析中的执行不计入规则执行次数与函数耗时聚合"""
+    engine = RuleEngine(RULE_CONFIG, concurrent=False)
+    engine.execute(RECORD)
+    passes = _pass_count()
+    calls = function_stats.snapshot()["count_characters"]["count"]
+
+    profile_rule(engine, RECORD, runs=3, sample_seconds=0.1)
+
+    assert _pass_count() == passes
+    assert function_stats.snapshot()["count_characters"]["count"] == calls
+    assert recording_enabled()
+
+    # 剖析之外的执行照常记录
+    engine.execute(RECORD)
+    assert _pass_count() == passes + 1
+
+
+def test_recording_disabled_is_scoped():
+    """recording_disabled 只在 with 块内生效"""
+    assert recording_enabled()
+    with recording_disabled():
+        assert not recording_enabled()
+    assert recording_enabled()
@@ -0,0 +1,132 @@
+"""
+病历字段索引测试
+extract_field_content 经 RecordIndex 的输出与引入索引前的实现逐字段一致
+"""
+from typing import Any, Dict, List
+
+import pytest
+
+from ruleengine.core.record_index import RecordIndex
+from ruleengine.functions.text_extract import extract_field_content
+
+
+def _baseline_extract_field_content(field_name: List[str], medical_record: Dict[str, Any]) -> Dict[str, Any]:
+    """引入 RecordIndex 之前的 extract_field_content 实现（对照基准）"""
+    if not isinstance(field_name, list) or len(field_name) != 2:
+        raise ValueError("field_name must be a list of two strings: [section, field]")
+
+    section, field = field_name
+    text = ""
+    is_empty = True
+    found = False
+    details_data = {"section": section, "field": field}
+
+    try:
+        if section in medical_record and isinstance(medical_record[section], dict):
+            if field == "":
+                section_dict = medical_record[section]
+                if section_dict:
+                    lines = []
+                    for k, v in section_dict.items():
+                        v_str = str(v).strip() if isinstance(v, str) else repr(v)
+                        lines.append(f"{k}: {v_str}")
+                    text = "\n".join(lines)
+                    is_empty = False
+                else:
+                    text = ""
+                    is_empty = True
+                found = True
+                details_data["extract_mode"] = "full_section"
+            else:
+                if field in medical_record[section]:
+                    raw_value = medical_record[section][field]
+                    if isinstance(raw_value, str):
+                        text = raw_value.strip()
+                    else:
+                        text = str(raw_value).strip()
+                    is_empty = text == ""
+                    found = True
+                    details_data["extract_mode"] = "specific_field"
+    except Exception as e:
+        text = ""
+        is_empty = True
+        found = False
+        details_data["error"] = str(e)
+
+    if text == "":
+        is_empty = True
+        found = False
+    else:
+        text = ".".join(field_name) + ">>>" + text + "\n"
+
+    return {
+        "result": text,
+        "is_empty": is_empty,
+        "evidence": {"raw_text": text},
+        "details": {
+            **details_data,
+            "found": found
+        }
+    }
+
+
+RECORD = {
+    "入院记录": {
+        "主诉": "  头痛3天，加重1天  ",
+        "现病史": "患者3天前无明显诱因出现头痛。\n伴恶心。",
+        "体温": 36.5,
+        "既往史": None,
+        "过敏史": "   ",
+        "用药": ["阿司匹林", "布洛芬"],
+        "婚育史": {"婚姻": "已婚"},
+        "个人史": "",
+    },
+    "空段": {},
+    "出院记录": "不是字典的段",
+    "手术记录": {"手术名称": "阑尾切除术"},
+}
+
+FIELD_NAMES = [
+    ["入院记录", "主诉"],
+    ["入院记录", "现病史"],
+    ["入院记录", "体温"],
+    ["入院记录", "既往史"],
+    ["入院记录", "过敏史"],
+    ["入院记录", "用药"],
+    ["入院记录", "婚育史"],
+    ["入院记录", "个人史"],
+    ["入院记录", "不存在"],
+    ["入院记录", ""],
+    ["空段", ""],
+    ["空段", "主诉"],
+    ["出院记录", ""],
+    ["出院记录", "诊断"],
+    ["不存在的段", "主诉"],
+    ["不存在的段", ""],
+    ["手术记录", ""],
+    ["入院记录", ["不可哈希"]],
+]
+
+
+@pytest.mark.parametrize("field_name", FIELD_NAMES, ids=lambda name: repr(name))
+def test_extract_field_content_matches_baseline(field_name):
+    """不传索引（函数内部新建）时与基准实现一致"""
+    assert extract_field_content(field_name, RECORD) == _baseline_extract_field_content(field_name, RECORD)
+
+
+def test_shared_index_matches_baseline():
+    """多个节点共享同一个索引、重复访问同一路径时，输出仍与基准一致"""
+    index = RecordIndex(RECORD)
+    for _ in range(2):
+        for field_name in FIELD_NAMES:
+            expected = _baseline_extract_field_content(field_name, RECORD)
+            assert extract_field_content(field_name, RECORD, record_index=index) == expected
+
+
+def test_invalid_field_name_raises():
+    """field_name 不是两段路径时两种实现都报错"""
+    for field_name in (["入院记录"], "入院记录.主诉", ["a", "b", "c"]):
+        with pytest.raises(ValueError):
+            _baseline_extract_field_content(field_name, RECORD)
+        with pytest.raises(ValueError):
+            extract_field_content(field_name, RECORD)
@@ -0,0 +1,98 @@
+"""
+并发调度测试
+纯函数节点在调用线程就地执行，只有阻塞节点（非纯函数 / 协程函数）转到线程池；
+异步执行路径中输入规模大的纯函数节点同样转到线程池
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from config import get_settings
+from ruleengine import functions  # noqa: F401  确保函数注册
+from ruleengine.core.engine import RuleEngine
+from ruleengine.registry import register_function
+
+
+WAIT_SECONDS = 0.05
+threads = []
+
+
+@register_function(name="_test_record_thread", inputs=[{"name": "text", "type": "str", "desc": "任意文本"}], pure=True)
+def _test_record_thread(text: str):
+    threads.append(threading.current_thread())
+    return {"result": len(text)}
+
+
+@register_function(name="_test_blocking_wait", inputs=[{"name": "text", "type": "str", "desc": "任意文本"}])
+def _test_blocking_wait(text: str):
+    time.sleep(WAIT_SECONDS)
+    return {"result": True}
+
+
+def _rule_config(*functions_):
+    """节点 1 提取主诉，其后的节点都只依赖节点 1（同一层级）"""
+    nodes = [{"id": 1, "function": "extract_field_content",
+              "params": {"field_name": ["入院记录", "主诉"]},
+              "outputs": {"text": "result"}}]
+    for i, name in enumerate(functions_, start=2):
+        nodes.append({"id": i, "function": name,
+                      "params": {"text": {"source": 1, "output": "text"}},
+                      "outputs": {"value": "result"}})
+    return {
+        "rule_id": "scheduling_001",
+        "rule_name": "测试规则-并发调度",
+        "function_list": {
+            "nodes": nodes,
+            "result_rule": {"pass": {"source": len(nodes), "output": "value", "expect": True}},
+        },
+    }
+
+
+RECORD = {"入院记录": {"主诉": "头痛3天"}}
+
+
+def test_pure_only_plan_is_sequential():
+    """只含纯函数的规则即使有同层节点也不并发"""
+    engine = RuleEngine(_rule_config("_test_record_thread", "_test_record_thread", "count_characters"))
+    assert engine.plan.concurrent is False
+
+
+def test_pure_nodes_run_inline_beside_blocking_nodes():
+    """同层有阻塞节点时并发：阻塞节点相互重叠，纯函数节点仍在调用线程执行"""
+    threads.clear()
+    engine = RuleEngine(_rule_config(
+        "_test_record_thread", "_test_blocking_wait", "_test_record_thread", "_test_blocking_wait",
+    ))
+    assert engine.plan.concurrent is True
+
+    start = time.perf_counter()
+    result = engine.execute(RECORD)
+    elapsed = time.perf_counter() - start
+
+    assert result["passed"] is True
+    assert threads == [threading.current_thread()] * 2
+    assert elapsed < WAIT_SECONDS * 2
+
+
+@pytest.mark.parametrize("concurrent", [False, True])
+def test_node_order_unchanged(concurrent):
+    """并发与顺序执行的证据顺序一致"""
+    config = _rule_config("_test_blocking_wait", "_test_record_thread", "_test_blocking_wait")
+    result = RuleEngine(config, concurrent=concurrent).execute(RECORD, evidence_level="full")
+    assert list(result["answer"]) == ["node_1.text", "node_2.value", "node_3.value", "node_4.value"]
+
+
+@pytest.mark.parametrize("limit, inline", [(-1, True), (10000, True), (3, False)])
+def test_async_offloads_large_pure_nodes(monkeypatch, limit, inline):
+    """异步执行路径：输入规模超过 ENGINE_ASYNC_INLINE_MAX_SIZE 的纯函数节点转到线程池，不占用事件循环"""
+    monkeypatch.setattr(get_settings(), "ENGINE_ASYNC_INLINE_MAX_SIZE", limit)
+    threads.clear()
+
+    async def run():
+        await RuleEngine(_rule_config("_test_record_thread")).execute_async(RECORD)
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(run())
+    assert (threads == [loop_thread]) is inline
@@ -0,0 +1,74 @@
+"""
+流式标签解析测试
+标签被拆分在多个分片中、嵌套标签、与 regex_* 系列的一致性
+"""
+import pytest
+
+from ruleengine.regex_tools import TagStreamParser, regex_conclusion, regex_reason, regex_thinking
+
+
+def _feed_all(parser: TagStreamParser, chunks):
+    return [parser.feed(chunk) for chunk in chunks]
+
+
+def test_tag_split_across_chunks():
+    """开始标签、内容、结束标签被拆在不同分片中，闭合时才返回"""
+    parser = TagStreamParser()
+    assert _feed_all(parser, ["前言<conc", "lusion> 是 </concl", "usion>"]) == [[], [], ["conclusion"]]
+    assert parser.tags == {"conclusion": "是"}
+    assert parser.text == "前言<conclusion> 是 </conclusion>"
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7])
+def test_every_chunk_size_gives_same_tags(size):
+    """任意分片大小的解析结果与一次性解析相同"""
+    text = "<thinking>先看主诉</thinking>\n<conclusion>否</conclusion><reason>主诉缺少持续时间</reason>"
+    whole = TagStreamParser()
+    whole.feed(text)
+
+    parser = TagStreamParser()
+    completed = []
+    for i in range(0, len(text), size):
+        completed.extend(parser.feed(text[i:i + size]))
+
+    assert parser.tags == whole.tags == {"thinking": "先看主诉", "conclusion": "否", "reason": "主诉缺少持续时间"}
+    assert completed == ["thinking", "conclusion", "reason"]
+
+
+def test_has_all_and_first_occurrence_wins():
+    """has_all 在所需标签都闭合后为 True；同名标签只取第一次出现"""
+    parser = TagStreamParser(["conclusion", "reason"])
+    parser.feed("<conclusion>是</conclusion>")
+    assert parser.has_all(["conclusion"])
+    assert not parser.has_all(["conclusion", "reason"])
+
+    assert parser.feed("<conclusion>否</conclusion><reason>无</reason><content>忽略</content>") == ["reason"]
+    assert parser.has_all(["conclusion", "reason"])
+    assert parser.tags == {"conclusion": "是", "reason": "无"}
+
+
+@pytest.mark.parametrize("size", [1, 4, 1000])
+def test_nested_tag_matches_regex(size):
+    """外层标签内部的标签与 regex_* 一样能取到，且在外层闭合前即可返回"""
+    text = "<thinking>分析：<conclusion>是</conclusion>，继续<reason>已记录</reason></thinking>"
+    parser = TagStreamParser()
+    for i in range(0, len(text), size):
+        parser.feed(text[i:i + size])
+        if parser.has_all(["conclusion"]):
+            break
+
+    assert parser.tags["conclusion"] == regex_conclusion(text) == "是"
+    assert "thinking" not in parser.tags or size == 1000
+
+    parser.feed(text[len(parser.text):])
+    assert parser.tags["reason"] == regex_reason(text)
+    assert parser.tags["thinking"] == regex_thinking(text)
+
+
+def test_unclosed_tag_is_not_reported():
+    """未闭合的标签不出现在结果中"""
+    parser = TagStreamParser()
+    parser.feed("<conclusion>是")
+    parser.feed("，但缺少结束标签")
+    assert parser.tags == {}
+    assert not parser.has_all(["conclusion"])
@@ -0,0 +1,133 @@
+"""
+解释模板测试
+预编译模板的渲染结果与以往逐个正则替换一致；引用不存在的节点 / 输出时编译报错
+"""
+import copy
+import re
+
+from fastapi.testclient import TestClient
+import pytest
+
+from ruleengine import functions  # noqa: F401  确保函数注册
+from ruleengine.core.context import ExecutionContext
+from ruleengine.core.engine import RuleEngine
+from ruleengine.core.evaluator import compile_template
+from ruleengine.core.plan import compile_plan
+import main
+
+
+def _baseline_render(template: str, context: ExecutionContext) -> str:
+    """预编译之前的 _render_template（对照基准）"""
+    result = template
+    pattern = r'\{\{node_(\d+)\.(\w+)\}\}'
+    matches = re.findall(pattern, result)
+    for node_id_str, key in matches:
+        node_id = int(node_id_str)
+        node_output = context.get_node_output(str(node_id))
+        if key in node_output:
+            value = str(node_output[key])
+            placeholder = f"{{{{node_{node_id}.{key}}}}}"
+            result = result.replace(placeholder, value)
+    return result
+
+
+def _context() -> ExecutionContext:
+    context = ExecutionContext()
+    context.set_node_output("1", {"text": "入院记录.主诉>>>头痛\n", "is_empty": False})
+    context.set_node_output("2", {"count": 2, "items": ["头", "痛"], "none": None})
+    return context
+
+
+TEMPLATES = [
+    "",
+    "没有占位符",
+    "{{node_2.count}}",
+    "主诉{{node_2.count}}个字符，内容：{{node_1.text}}",
+    "重复引用 {{node_2.count}} / {{node_2.count}}",
+    "不存在的输出保留原文 {{node_2.missing}} {{node_9.count}}",
+    "非字符串 {{node_1.is_empty}} {{node_2.items}} {{node_2.none}}",
+    "前导零不替换 {{node_02.count}}，正常 {{node_2.count}}",
+    "不完整 {{node_2.count} {node_2.count}} {{ node_2.count }}",
+    "{{node_1.text}}{{node_2.count}}",
+]
+
+
+@pytest.mark.parametrize("template", TEMPLATES)
+def test_render_matches_baseline(template):
+    """预编译模板的渲染结果与原实现相同"""
+    context = _context()
+    assert compile_template(template).render(context) == _baseline_render(template, context)
+
+
+def test_placeholders():
+    """placeholders 列出模板引用的 (节点, 输出)"""
+    template = compile_template("{{node_1.text}} 与 {{node_2.count}}，{{node_02.count}}")
+    assert template.placeholders() == [("1", "text"), ("2", "count")]
+
+
+def test_unknown_node_or_output_rejected():
+    """提供节点输出时，引用不存在的节点或输出报错并指明模板名"""
+    outputs = {"1": {"text", "is_empty"}, "2": {"count"}}
+    compile_template("{{node_1.text}}{{node_2.count}}", outputs, "pass")
+
+    with pytest.raises(ValueError, match=r"'fail'.*不存在的节点.*node_3\.count"):
+        compile_template("{{node_3.count}}", outputs, "fail")
+    with pytest.raises(ValueError, match=r"'pass'.*节点 2 不存在的输出 'total'"):
+        compile_template("共{{node_2.total}}个", outputs, "pass")
+
+
+RULE_CONFIG = {
+    "rule_id": "template_001",
+    "rule_name": "测试规则-模板",
+    "module": "入院记录",
+    "function_list": {
+        "nodes": [
+            {"id": 1, "function": "extract_field_content",
+             "params": {"field_name": ["入院记录", "主诉"]},
+             "outputs": {"text": "result", "is_empty": "is_empty"}},
+            {"id": 2, "function": "count_characters",
+             "params": {"text": {"source": 1, "output": "text"}},
+             "outputs": {"count": "result"}},
+        ],
+        "result_rule": {"pass": {"source": 1, "output": "is_empty", "expect": False}},
+        "explanation_template": {
+            "pass": "共{{node_2.count}}个字符",
+            "fail": "主诉为空",
+        },
+    },
+}
+
+
+def _with_template(template: str):
+    config = copy.deepcopy(RULE_CONFIG)
+    config["function_list"]["explanation_template"]["pass"] = template
+    return config
+
+
+@pytest.mark.parametrize("template", ["共{{node_3.count}}个字符", "共{{node_2.total}}个字符"])
+def test_compile_plan_strict_and_lenient(template):
+    """发布校验（strict）报错；已入库规则的执行计划只告警，渲染时保留占位符原文"""
+    config = _with_template(template)
+    with pytest.raises(ValueError):
+        compile_plan(config)
+
+    plan = compile_plan(config, strict_templates=False)
+    result = RuleEngine.from_plan(plan).execute({"入院记录": {"主诉": "头痛"}})
+    assert result["passed"] is True
+    assert result["explanation"] == template
+
+
+def test_publish_with_invalid_template_returns_400():
+    """创建并自动发布引用错误的规则返回 400；草稿可保存，发布时返回 400"""
+    config = _with_template("共{{node_2.total}}个字符")
+    with TestClient(main.app) as client:
+        response = client.post("/api/rules/", json={
+            "name": "模板错误", "module": "入院记录", "config": config, "auto_publish": True,
+        })
+        assert response.status_code == 400
+        assert "node_2.total" in response.json()["detail"]
+
+        draft = client.post("/api/rules/", json={"name": "模板错误", "module": "入院记录", "config": config})
+        assert draft.status_code == 201
+        response = client.post(f"/api/rules/{draft.json()['id']}/publish")
+        assert response.status_code == 400
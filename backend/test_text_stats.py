@@ -0,0 +1,125 @@
+"""
+文本统计测试
+text_stats 的计数与原正则实现一致，count_characters 输出与改造前相同
+"""
+from typing import Any, Dict
+import random
+import re
+import unicodedata
+
+import pytest
+
+from ruleengine.core.record_index import RecordIndex
+from ruleengine.functions.numeric_check import count_characters, count_chinese_characters, text_statistics
+from ruleengine.text_stats import _char_classes, compute_text_stats
+
+
+CHINESE_PATTERN = r'[\u4e00-\u9fff\u3400-\u4dbf\uf900-\ufaff]'
+
+
+def _baseline_count_characters(text: str, count_chinese_only: bool = False) -> Dict[str, Any]:
+    """改造前基于 re.findall 的 count_characters（对照基准）"""
+    if not isinstance(text, str):
+        text = str(text) if text is not None else ""
+
+    if count_chinese_only:
+        matches = re.findall(CHINESE_PATTERN, text)
+        count = len(matches)
+        evidence = {
+            "chinese_count": count,
+            "total_length": len(text),
+            "chinese_chars": "".join(matches[:10]) + ("..." if len(matches) > 10 else "")
+        }
+    else:
+        count = len(text)
+        chinese_matches = re.findall(CHINESE_PATTERN, text)
+        chinese_count = len(chinese_matches)
+        evidence = {
+            "total_count": count,
+            "chinese_count": chinese_count,
+            "non_chinese_count": count - chinese_count
+        }
+
+    return {
+        "result": count,
+        "evidence": evidence,
+        "details": {
+            "text_length": len(text),
+            "count_mode": "chinese_only" if count_chinese_only else "all",
+            "count": count
+        }
+    }
+
+
+# 覆盖各类字符：常用汉字、扩展 A、兼容表意文字、中英文标点、全角/阿拉伯-印度数字、
+# 上标数字、各种空白、拉丁字母、emoji
+ALPHABET = (
+    "患者头痛三天入院㐀㑇豈更，。！？、；：“”（）《》,.!?;:()-"
+    "0123456789１２３٣²"
+    " \t\n\r\u3000\xa0\x0b"
+    "abcXYZ😀\u200b"
+)
+
+
+def _random_texts(count: int = 60, seed: int = 17):
+    rng = random.Random(seed)
+    return [
+        "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 80)))
+        for _ in range(count)
+    ]
+
+
+TEXTS = [
+    "",
+    "头痛3天，加重1天。",
+    "患者因\n发热 3 天\n入院",
+    "no chinese at all 123",
+    "豈更㐀" * 5,
+    "一二三四五六七八九十甲乙丙",
+] + _random_texts()
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_stats_match_regex_counts(text):
+    """各项计数与正则 / 逐字符判断得到的结果一致"""
+    stats = compute_text_stats(text)
+    assert stats.length == len(text)
+    assert stats.cjk == len(re.findall(CHINESE_PATTERN, text))
+    assert stats.non_cjk == len(text) - stats.cjk
+    assert stats.digits == len(re.findall(r"\d", text))
+    assert stats.punctuation == sum(1 for ch in text if unicodedata.category(ch).startswith("P"))
+    assert stats.whitespace == len(re.findall(r"\s", text))
+    assert stats.lines == (text.count("\n") + 1 if text else 0)
+
+
+@pytest.mark.parametrize("text", TEXTS + [None, 12345])
+@pytest.mark.parametrize("chinese_only", [False, True])
+def test_count_characters_matches_baseline(text, chinese_only):
+    """count_characters 输出与改造前逐字段一致（有无病历索引）"""
+    expected = _baseline_count_characters(text, chinese_only)
+    assert count_characters(text, count_chinese_only=chinese_only) == expected
+    index = RecordIndex({})
+    assert count_characters(text, count_chinese_only=chinese_only, record_index=index) == expected
+    if chinese_only:
+        assert count_chinese_characters(text, record_index=index) == expected
+
+
+def test_text_statistics_outputs():
+    """text_statistics 的各项输出"""
+    output = text_statistics("头痛3天，\n加重1天。")
+    assert output["result"] == 11
+    assert output["chinese_count"] == 6
+    assert output["digit_count"] == 2
+    assert output["punctuation_count"] == 2
+    assert output["whitespace_count"] == 1
+    assert output["line_count"] == 2
+
+
+def test_char_class_cache_only_holds_bmp():
+    """字符类别缓存只收录 BMP 字符，辅助平面字符照常分类但不进入缓存"""
+    text = "头痛😀𠀀" + "".join(chr(0x1F600 + i) for i in range(50))
+    stats = compute_text_stats(text)
+    assert stats.cjk == 2
+    assert stats.length == len(text)
+    assert "头" in _char_classes
+    assert all(ord(ch) <= 0xFFFF for ch in _char_classes)
@@ -0,0 +1,139 @@
+"""
+节点耗时测试
+执行结果中的逐节点耗时明细（timings）与进程内按函数的耗时聚合（function_stats）
+"""
+import asyncio
+import copy
+
+from fastapi.testclient import TestClient
+import pytest
+
+from ruleengine import functions  # noqa: F401  确保函数注册
+from ruleengine.core.engine import RuleEngine
+from ruleengine.core.profiling import FunctionStats, function_stats, order_timings
+import main
+
+
+RULE_CONFIG = {
+    "rule_id": "timings_001",
+    "rule_name": "测试规则-耗时",
+    "function_list": {
+        "nodes": [
+            {"id": 1, "function": "extract_field_content",
+             "params": {"field_name": ["入院记录", "主诉"]},
+             "outputs": {"text": "result", "is_empty": "is_empty"}},
+            {"id": 2, "function": "count_characters",
+             "params": {"text": {"source": 1, "output": "text"}, "count_chinese_only": True},
+             "outputs": {"count": "result"}},
+            {"id": 3, "function": "is_number_in_range",
+             "params": {"value": {"source": 2, "output": "count"}, "min_value": 2, "max_value": 20},
+             "outputs": {"ok": "result"}},
+        ],
+        "result_rule": {"pass": {"source": 3, "output": "ok", "expect": True}},
+    },
+}
+RECORD = {"入院记录": {"主诉": "头痛3天"}}
+TEXT = "入院记录.主诉>>>头痛3天\n"
+
+
+def _calls(function: str) -> int:
+    return function_stats.snapshot().get(function, {}).get("count", 0)
+
+
+def test_no_timings_by_default():
+    """未请求时结果不含 timings"""
+    assert "timings" not in RuleEngine(RULE_CONFIG).execute(RECORD)
+
+
+@pytest.mark.parametrize("concurrent", [False, True])
+def test_node_timings(concurrent):
+    """timings 按节点顺序列出各节点耗时与输入 / 输出规模"""
+    result = RuleEngine(RULE_CONFIG, concurrent=concurrent).execute(RECORD, timings=True)
+    timings = result["timings"]
+    nodes = timings["nodes"]
+
+    assert [(n["node_id"], n["function"]) for n in nodes] == [
+        ("1", "extract_field_content"), ("2", "count_characters"), ("3", "is_number_in_range"),
+    ]
+    # 规模为各值规模之和（字符串为字符数，标量为 1）；输入按注入病历前的参数计算
+    assert [n["input_size"] for n in nodes] == [2, len(TEXT) + 1, 3]
+    assert [n["output_size"] for n in nodes] == [len(TEXT) + 1, 1, 1]
+    assert not any(n["cached"] for n in nodes)
+    assert all(n["duration_ms"] >= 0 and "error" not in n for n in nodes)
+    assert timings["nodes_ms"] == pytest.approx(sum(n["duration_ms"] for n in nodes), abs=0.01)
+    assert timings["total_ms"] >= 0
+
+
+def test_async_node_timings():
+    """异步执行路径同样返回 timings"""
+    result = asyncio.run(RuleEngine(RULE_CONFIG).execute_async(RECORD, timings=True))
+    assert [n["node_id"] for n in result["timings"]["nodes"]] == ["1", "2", "3"]
+
+
+def test_shared_cache_hits_are_marked_and_not_aggregated():
+    """命中共享缓存的节点标记 cached，且不计入 function_stats"""
+    shared_cache = {}
+    RuleEngine(RULE_CONFIG).execute(RECORD, shared_cache=shared_cache)
+    calls = _calls("extract_field_content")
+
+    result = RuleEngine(RULE_CONFIG).execute(RECORD, shared_cache=shared_cache, timings=True)
+    nodes = result["timings"]["nodes"]
+    assert nodes[0]["cached"] is True
+    assert nodes[0]["input_size"] is None
+    assert _calls("extract_field_content") == calls
+
+
+def test_error_node_timing():
+    """节点出错时结果仍带 timings，出错节点记录错误并计入错误次数"""
+    config = copy.deepcopy(RULE_CONFIG)
+    config["function_list"]["nodes"][0]["params"]["field_name"] = ["入院记录"]
+    errors = function_stats.snapshot().get("extract_field_content", {}).get("errors", 0)
+
+    result = RuleEngine(config).execute(RECORD, timings=True)
+    assert result["flag"] == -1
+    nodes = result["timings"]["nodes"]
+    assert len(nodes) == 1
+    assert "field_name" in nodes[0]["error"]
+    assert nodes[0]["output_size"] is None
+    assert nodes[0]["cached"] is False
+    assert function_stats.snapshot()["extract_field_content"]["errors"] == errors + 1
+
+
+def test_function_stats_aggregates():
+    """count / errors / mean / p95 / max，p95 只看最近 window 次"""
+    stats = FunctionStats(window=20)
+    for i in range(1, 41):
+        stats.record("slow", i / 1000, error=(i % 10 == 0))
+    snapshot = stats.snapshot()["slow"]
+    assert snapshot["count"] == 40
+    assert snapshot["errors"] == 4
+    assert snapshot["mean_ms"] == pytest.approx(20.5)
+    assert snapshot["max_ms"] == pytest.approx(40.0)
+    # 最近 20 次为 21..40 ms
+    assert snapshot["p95_ms"] == pytest.approx(40.0)
+
+    stats.reset()
+    assert stats.snapshot() == {}
+
+
+def test_order_timings():
+    """按节点顺序排列，不在顺序表中的排最后"""
+    timings = [{"node_id": "3"}, {"node_id": "x"}, {"node_id": "1"}]
+    assert [t["node_id"] for t in order_timings(timings, ["1", "2", "3"])] == ["1", "3", "x"]
+
+
+def test_rule_dev_api_timings_and_function_stats():
+    """POST /api/rule-dev/test 返回 timings；GET /api/rule-dev/function-stats 返回聚合"""
+    with TestClient(main.app) as client:
+        response = client.post("/api/rule-dev/test", json={
+            "rule_config": RULE_CONFIG, "medical_record": RECORD, "timings": True,
+        })
+        assert response.status_code == 200
+        assert [n["node_id"] for n in response.json()["timings"]["nodes"]] == ["1", "2", "3"]
+
+        response = client.post("/api/rule-dev/test", json={"rule_config": RULE_CONFIG, "medical_record": RECORD})
+        assert response.json()["timings"] is None
+
+        stats = client.get("/api/rule-dev/function-stats").json()
+    assert set(stats["count_characters"]) == {"count", "errors", "mean_ms", "p95_ms", "max_ms"}
+    assert stats["count_characters"]["count"] >= 2